@@ -0,0 +1,202 @@
+"""
+Answer Cache Module for تبيّن Chatbot
+In-process cache of Gemini answers keyed by normalized question text, with an
+optional embedding-similarity lookup for near-duplicate questions.
+"""
+
+import os
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Harakat, Quranic annotation marks, superscript alef and tatweel
+_ARABIC_DIACRITICS = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+_ALEF_VARIANTS = re.compile(r'[\u0622\u0623\u0625\u0671]')
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_arabic(text: str) -> str:
+    """
+    Normalize question text so that trivially different spellings share a key.
+
+    Strips diacritics and tatweel, folds alef variants to 'ا', alef maqsura to
+    'ي' and ta marbuta to 'ه', drops punctuation, lowercases Latin text and
+    collapses whitespace.
+    """
+    text = _ARABIC_DIACRITICS.sub('', text)
+    text = _ALEF_VARIANTS.sub('\u0627', text)
+    text = text.replace('\u0649', '\u064A').replace('\u0629', '\u0647')
+    text = _PUNCTUATION.sub(' ', text)
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+class _Entry:
+    __slots__ = ('answer', 'created_at', 'embedding')
+
+    def __init__(self, answer: str, created_at: float, embedding: Optional[np.ndarray]):
+        self.answer = answer
+        self.created_at = created_at
+        self.embedding = embedding
+
+
+class AnswerCache:
+    """
+    LRU + TTL cache of answers keyed by normalized question text.
+
+    Lookups try an exact match on the normalized text first. When a
+    similarity threshold and an embedding function are configured, a miss
+    falls back to the cached question with the highest cosine similarity.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 86400,
+        similarity_threshold: float = 0.0,
+        embed_fn: Optional[Callable[[str], List[float]]] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Embeddings of recent lookups, so put() does not embed the same text twice
+        self._recent_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, embed_fn: Optional[Callable[[str], List[float]]] = None) -> "AnswerCache":
+        """Build a cache configured from ANSWER_CACHE_* environment variables."""
+        return cls(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+            similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0")),
+            embed_fn=embed_fn
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.similarity_threshold > 0 and self.embed_fn is not None
+
+    def get(self, question: str) -> Optional[str]:
+        """Return a cached answer for question, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        key = normalize_arabic(question)
+        now = time.monotonic()
+
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.answer
+
+        if self.semantic_enabled:
+            embedding = self._embed(key)
+            if embedding is not None:
+                with self._lock:
+                    match = self._most_similar(embedding)
+                    if match is not None:
+                        match_key, score = match
+                        self._entries.move_to_end(match_key)
+                        self.semantic_hits += 1
+                        logger.info(f"Semantic cache hit (similarity={score:.3f})")
+                        return self._entries[match_key].answer
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str) -> None:
+        """Store answer for question, evicting the least recently used entry if full."""
+        if not self.enabled:
+            return
+
+        key = normalize_arabic(question)
+        embedding = self._embed(key) if self.semantic_enabled else None
+
+        with self._lock:
+            self._entries[key] = _Entry(answer, time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._recent_embeddings.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'exact_hits': self.exact_hits,
+                'semantic_hits': self.semantic_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
+
+    def _expire(self, now: float) -> None:
+        # Entries are ordered by last use, not age, so scan them all
+        expired = [key for key, entry in self._entries.items()
+                   if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def _most_similar(self, embedding: np.ndarray):
+        candidates = [(key, entry.embedding) for key, entry in self._entries.items()
+                      if entry.embedding is not None]
+        if not candidates:
+            return None
+
+        matrix = np.stack([candidate[1] for candidate in candidates])
+        scores = matrix @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return candidates[best][0], float(scores[best])
+        return None
+
+    def _embed(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._recent_embeddings.get(key)
+        if embedding is not None:
+            return embedding
+
+        try:
+            vector = np.asarray(self.embed_fn(key), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Failed to embed question for cache lookup: {e}")
+            return None
+
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        embedding = vector / norm
+
+        with self._lock:
+            self._recent_embeddings[key] = embedding
+            while len(self._recent_embeddings) > 256:
+                self._recent_embeddings.popitem(last=False)
+        return embedding
@@ -1,12 +1,27 @@
+import io
 import os
-import uuid
-import base64
-from flask import Flask, render_template, request, jsonify, session, send_file, redirect, url_for, flash
-import google.generativeai as genai
-import tempfile
+import json
+import time
+import threading
+from flask import Flask, Response, g, render_template, request, jsonify, session, send_file, redirect, url_for, flash, stream_with_context
+from flask_sock import Sock
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy.exc import IntegrityError
+from simple_websocket import ConnectionClosed
 import voice_service
+import voice_pipeline
+from voice_jobs import VoiceJobStore
+from streaming_asr import StreamingTranscriber
+from transcription_pool import TranscriptionQueueFull, pool_from_env
+import gemini_service
+from gemini_service import init_gemini, ask_gemini, ask_gemini_stream, GeminiStreamError, GEMINI_ERROR_MESSAGE
+from metrics import metrics
 from dotenv import load_dotenv
-from database import db, User, init_db
+from database import db, User, AnswerRating, StaffQuestion, ChatEvent, configure_database, init_db
+from conversation_store import ConversationStore
+from event_log import EventLog
+from identity_cache import IdentityCache
+from chat_context import ChatContext
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 
 # Load environment variables
@@ -14,10 +29,14 @@ load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev_secret_key_change_in_production")
+sock = Sock(app)
 
-# Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Requests larger than this are refused from the Content-Length header,
+# before the body is read
+app.config['MAX_CONTENT_LENGTH'] = int(float(os.getenv("MAX_UPLOAD_MB", "10")) * 1024 * 1024)
+
+# Database Configuration (DATABASE_URL, SQLite in the instance folder by default)
+configure_database(app)
 db.init_app(app)
 
 # Login Manager Configuration
@@ -25,60 +44,222 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Logged-in users are resolved from a per-process cache (and optionally the
+# signed session) instead of a User query on every request
+identity_cache = IdentityCache.from_env()
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return identity_cache.load_user(user_id)
+
+# A multiprocessing child spawned from `python app.py` re-imports this file
+# as __mp_main__; it only needs the definitions, not the startup work below
+IN_SPAWNED_CHILD = __name__ == '__mp_main__'
 
 # Initialize Database
-init_db(app)
+if not IN_SPAWNED_CHILD:
+    init_db(app)
+
+# Chat history lives in the database; the session only holds a conversation id
+conversation_store = ConversationStore.from_env(app)
+
+# Bounded multi-turn history (recent turns + rolling summary) sent to Gemini
+chat_context = ChatContext.from_env(conversation_store)
+
+# Ratings, staff questions and chat telemetry are written behind the request
+event_log = EventLog.from_env(app)
 
 # Configure Gemini API securely from .env file
 API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=API_KEY)
+if not IN_SPAWNED_CHILD:
+    init_gemini(API_KEY)
 
 # Audio configuration
-UPLOAD_FOLDER = tempfile.gettempdir()
-ALLOWED_EXTENSIONS = {'webm', 'wav', 'mp3', 'm4a', 'ogg'}
+ALLOWED_EXTENSIONS = {'webm', 'wav', 'mp3', 'm4a', 'mp4', 'ogg'}
 
-def allowed_file(filename):
-    """Check if file has an allowed extension."""
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+# Length limits for the free-text fields of POST /rate-answer
+RATING_COMMENT_MAX_CHARS = 2000
+RATING_TEXT_MAX_CHARS = 20000
+
+# Optional dedicated Whisper worker processes: the host's transcription
+# service (WHISPER_POOL_ADDRESS) or an in-process pool (WHISPER_POOL_WORKERS > 0),
+# connected or started on first use so importing the app never spawns processes
+_transcription_pool = None
+_transcription_pool_started = False
+_transcription_pool_lock = threading.Lock()
+
+def get_transcription_pool():
+    """Return the transcription pool, starting it on first use (None when disabled)."""
+    global _transcription_pool, _transcription_pool_started
+    if not _transcription_pool_started:
+        with _transcription_pool_lock:
+            if not _transcription_pool_started:
+                _transcription_pool = pool_from_env()
+                _transcription_pool_started = True
+    return _transcription_pool
+
+def transcription_pool_stats():
+    return _transcription_pool.stats() if _transcription_pool else None
+
+# State of running /voice-to-text requests, shared by the worker processes
+voice_jobs = VoiceJobStore.from_env()
+
+# Seconds GET /audio/<id> waits for background TTS before answering 202
+AUDIO_LONG_POLL_SECONDS = float(os.getenv("AUDIO_LONG_POLL_SECONDS", "10"))
+
+# Live transcription over /ws/transcribe while the user is still recording
+STREAMING_ASR = os.getenv("STREAMING_ASR", "0") == "1"
 
-def ask_gemini(prompt):
+# GET /metrics is open unless METRICS_TOKEN is set (then: Authorization: Bearer <token>)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# stats() of every cache, pool and store, exported as gauges on /metrics
+metrics.register_collector('answer_cache', gemini_service.answer_cache.stats)
+metrics.register_collector('tts_cache', voice_service.tts_cache.stats)
+metrics.register_collector('scratch', voice_service.scratch.stats)
+metrics.register_collector('whisper_models', voice_service.whisper_models.stats)
+if voice_service.whisper_batcher:
+    metrics.register_collector('whisper_batcher', voice_service.whisper_batcher.stats)
+metrics.register_collector('transcription_pool', transcription_pool_stats)
+metrics.register_collector('conversation_store', conversation_store.stats)
+metrics.register_collector('chat_context', chat_context.stats)
+metrics.register_collector('identity_cache', identity_cache.stats)
+metrics.register_collector('event_log', event_log.stats)
+metrics.register_collector('voice_jobs', voice_jobs.stats)
+
+# Whisper warm-up and readiness (WHISPER_PRELOAD=1 loads the model at startup)
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "0") == "1"
+_voice_ready = threading.Event()
+_warm_up_pid = None
+
+def start_voice_warm_up():
     """
-    Sends a prompt to Gemini API and returns the text response.
+    Load and warm the Whisper model in a background thread of this process.
+    Called from the gunicorn post_fork hook, the __main__ block and, as a
+    fallback for other servers, before each request; only the first call in
+    a process does anything.
     """
+    global _voice_ready, _warm_up_pid
+    if _warm_up_pid == os.getpid():
+        return
+    _warm_up_pid = os.getpid()
+    _voice_ready = threading.Event()
+
+    if not WHISPER_PRELOAD:
+        # Lazy loading: nothing to wait for
+        _voice_ready.set()
+        return
+
+    threading.Thread(
+        target=_warm_up_voice,
+        args=(_voice_ready,),
+        name="whisper-warm-up",
+        daemon=True
+    ).start()
+
+def _warm_up_voice(ready_event):
     try:
-        model = genai.GenerativeModel("gemini-flash-latest")
-    
-        system_context = (
-            "أنت 'تبيّن'، مساعد قانوني ذكي ومحترف للمواطنين في السعودية. "
-            "\n\n"
-            "⚡ **قواعد الرد (مهم جداً):**\n"
-            "1. **إجابات واضحة ومتوازنة (4–6 جمل كحد أقصى)\n"
-            "2. **تجنب التفاصيل الإضافية تماماً** - اركز على الإجابة المباشرة فقط\n"
-            "3. **استخدم التنسيق البسيط**:\n"
-            "   - نقطة أو اثنين للإجابة الموجزة\n"
-            "   - عنوان واحد فقط إن لزم الحال\n"
-            "4. **ابدأ بالمعلومة الأهم مباشرة** - بدون مقدمات\n"
-            "\n"
-            "💰 **الغرامات والعقوبات:**\n"
-            "- المبلغ + السبب فقط\n"
-            "- مثال: 'الغرامة: 300 ريال لاستخدام الجوال أثناء القيادة'\n"
-            "\n"
-            "✅ **معايير عامة:**\n"
-            "- معلومات سعودية فقط\n"
-            "- بدون استشارات شخصية\n"
-            "- مهذب ومباشر\n"
-            "- رموز تعبيرية قليلة جداً\n"
-            "\n\n"
-        )
-        full_prompt = system_context + prompt
-        response = model.generate_content(full_prompt)
-        return response.text
+        pool = get_transcription_pool()
+        if pool:
+            pool.warm_up()
+        else:
+            voice_service.warm_up()
+        ready_event.set()
+        print("Voice services warmed up, worker is ready")
     except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        return "عذراً، حدث خطأ أثناء الاتصال بالخادم. يرجى المحاولة مرة أخرى لاحقاً."
+        print(f"Whisper warm-up failed: {e}")
+
+def allowed_file(filename):
+    """Check if file has an allowed extension."""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def session_conversation_id():
+    """Return the session's conversation id if it belongs to the current user, else None."""
+    conversation_id = session.get('conversation_id')
+    if not conversation_id:
+        return None
+    user_id = current_user.id if current_user.is_authenticated else None
+    if not conversation_store.belongs_to(conversation_id, user_id):
+        session.pop('conversation_id', None)
+        return None
+    return conversation_id
+
+def current_conversation_id():
+    """Return the conversation id from the session, starting a conversation if needed."""
+    conversation_id = session_conversation_id()
+    if not conversation_id:
+        user_id = current_user.id if current_user.is_authenticated else None
+        conversation_id = conversation_store.new_conversation(user_id)
+        session['conversation_id'] = conversation_id
+    # Drop history left in cookies by earlier versions
+    session.pop('history', None)
+    return conversation_id
+
+def record_chat_event(endpoint, conversation_id, started, question, answer):
+    """Queue a telemetry row for one answered chat or voice turn."""
+    event_log.record(
+        ChatEvent,
+        conversation_id=conversation_id,
+        endpoint=endpoint,
+        latency_ms=(time.perf_counter() - started) * 1000,
+        question_chars=len(question),
+        answer_chars=len(answer)
+    )
+
+def sse_event(data, event=None):
+    """Format a payload as a Server-Sent Events message."""
+    message = f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({
+        'error': 'Upload is too large',
+        'max_bytes': app.config['MAX_CONTENT_LENGTH']
+    }), 413
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    start_voice_warm_up()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streamed responses (SSE, chunked TTS) are measured up to their first byte
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.inc('requests_total', endpoint=endpoint, status=str(response.status_code))
+    if response.status_code >= 500:
+        metrics.inc('request_errors_total', endpoint=endpoint)
+    metrics.observe('request_seconds', elapsed, endpoint=endpoint)
+    server_timing = metrics.server_timing_header(elapsed)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (metrics of this worker process)."""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f"Bearer {METRICS_TOKEN}":
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness probe."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/healthz/ready')
+def healthz_ready():
+    """Readiness probe: only ready once the Whisper model has been warmed up."""
+    if _voice_ready.is_set():
+        return jsonify({'status': 'ready'})
+    return jsonify({'status': 'warming_up'}), 503
 
 @app.route('/')
 def index():
@@ -116,10 +297,12 @@ def profile():
 @login_required
 def delete_account():
     # Implement account deletion logic
-    user = User.query.get(current_user.id)
+    user = db.session.get(User, current_user.id)
     if user:
         db.session.delete(user)
         db.session.commit()
+        identity_cache.invalidate(user.id)
+        session.pop('conversation_id', None)
         logout_user()
     flash('تم حذف الحساب بنجاح', 'success')
     return redirect(url_for('index'))
@@ -132,7 +315,12 @@ def faqs():
 @login_required
 def contact_staff():
     if request.method == 'POST':
-        # Logic to save question
+        subject = (request.form.get('subject') or '').strip()
+        details = (request.form.get('details') or '').strip()
+        if not subject or not details:
+            flash('يرجى كتابة موضوع السؤال وتفاصيله', 'error')
+            return render_template('staff_question.html')
+        event_log.record(StaffQuestion, user_id=current_user.id, subject=subject[:200], details=details)
         flash('تم إرسال سؤالك للموظفين', 'success')
         return redirect(url_for('home'))
     return render_template('staff_question.html')
@@ -140,8 +328,29 @@ def contact_staff():
 @app.route('/rate-answer', methods=['POST'])
 def rate_answer():
     # API for rating
-    data = request.json
-    # save rating logic
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'status': 'error', 'message': 'Invalid request'}), 400
+    rating = data.get('rating')
+    if isinstance(rating, str) and rating.strip().isdigit():
+        rating = int(rating)
+    if isinstance(rating, bool) or not isinstance(rating, int) or not 1 <= rating <= 5:
+        return jsonify({'status': 'error', 'message': 'Invalid rating'}), 400
+    fields = {}
+    for name, max_chars in (('comment', RATING_COMMENT_MAX_CHARS),
+                            ('question', RATING_TEXT_MAX_CHARS),
+                            ('answer', RATING_TEXT_MAX_CHARS)):
+        value = data.get(name)
+        if value is not None and (not isinstance(value, str) or len(value) > max_chars):
+            return jsonify({'status': 'error', 'message': f'Invalid {name}'}), 400
+        fields[name] = value
+    event_log.record(
+        AnswerRating,
+        user_id=current_user.id if current_user.is_authenticated else None,
+        conversation_id=session.get('conversation_id'),
+        rating=rating,
+        **fields
+    )
     return jsonify({'status': 'success', 'message': 'Rating received'})
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -151,6 +360,7 @@ def login():
         password = request.form.get('password')
         user = User.query.filter((User.username == identifier) | (User.email == identifier)).first()
         if user and user.check_password(password):
+            session.pop('conversation_id', None)
             login_user(user)
             return redirect(url_for('home'))
         flash('اسم المستخدم أو كلمة المرور غير صحيحة', 'error')
@@ -163,15 +373,29 @@ def register():
         email = request.form.get('email')
         password = request.form.get('password')
         
-        if User.query.filter_by(username=username).first():
-            flash('اسم المستخدم موجود بالفعل', 'error')
-        elif User.query.filter_by(email=email).first():
-            flash('البريد الإلكتروني مسجل بالفعل', 'error')
+        existing = (
+            User.query
+            .with_entities(User.username)
+            .filter((User.username == username) | (User.email == email))
+            .first()
+        )
+        if existing:
+            if existing.username == username:
+                flash('اسم المستخدم موجود بالفعل', 'error')
+            else:
+                flash('البريد الإلكتروني مسجل بالفعل', 'error')
         else:
             new_user = User(username=username, email=email)
             new_user.set_password(password)
             db.session.add(new_user)
-            db.session.commit()
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent signup took the username or email after the check
+                db.session.rollback()
+                flash('اسم المستخدم أو البريد الإلكتروني مسجل بالفعل', 'error')
+                return render_template('register.html')
+            session.pop('conversation_id', None)
             login_user(new_user)
             return redirect(url_for('home'))
     return render_template('register.html')
@@ -179,6 +403,8 @@ def register():
 @app.route('/logout')
 @login_required
 def logout():
+    identity_cache.clear_snapshot()
+    session.pop('conversation_id', None)
     logout_user()
     return redirect(url_for('index'))
 
@@ -186,7 +412,11 @@ def logout():
 def chat_interface():
     if not current_user.is_authenticated and not session.get('is_guest'):
          return redirect(url_for('login'))
-    return render_template('chat.html', user=current_user if current_user.is_authenticated else {'username': session.get('guest_name', 'Guest')})
+    return render_template(
+        'chat.html',
+        user=current_user if current_user.is_authenticated else {'username': session.get('guest_name', 'Guest')},
+        streaming_asr=STREAMING_ASR
+    )
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -194,28 +424,85 @@ def chat():
     if not user_message:
         return jsonify({'error': 'No message provided'}), 400
 
-    # Store user message in session (optional, for simple history tracking in this demo)
-    if 'history' not in session:
-        session['history'] = []
-    session['history'].append({'role': 'user', 'content': user_message})
+    started = time.perf_counter()
+    conversation_id = current_conversation_id()
+    with metrics.span('chat_history'):
+        history = chat_context.history_for(conversation_id)
+    conversation_store.append(conversation_id, 'user', user_message)
 
     # Get bot response
-    bot_response = ask_gemini(user_message)
+    bot_response = ask_gemini(user_message, history)
 
-    # Store bot response
-    session['history'].append({'role': 'bot', 'content': bot_response})
-    session.modified = True
+    conversation_store.append(conversation_id, 'bot', bot_response)
+    chat_context.after_turn(conversation_id)
+    record_chat_event('chat', conversation_id, started, user_message, bot_response)
 
     return jsonify({'response': bot_response})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming variant of /chat. Forwards Gemini response chunks to the
+    browser as Server-Sent Events while they are generated, then sends a
+    final 'done' event carrying the complete response text. If Gemini fails
+    the stream ends with an 'error' event instead and no answer is saved.
+    """
+    user_message = request.json.get('message')
+    if not user_message:
+        return jsonify({'error': 'No message provided'}), 400
+
+    started = time.perf_counter()
+    conversation_id = current_conversation_id()
+    with metrics.span('chat_history'):
+        history = chat_context.history_for(conversation_id)
+    conversation_store.append(conversation_id, 'user', user_message)
+
+    def generate():
+        chunks = []
+        try:
+            for chunk in ask_gemini_stream(user_message, history):
+                chunks.append(chunk)
+                yield sse_event({'text': chunk})
+        except GeminiStreamError:
+            # The client drops the partial text; saving it would feed a cut-off answer back to Gemini
+            yield sse_event({'error': GEMINI_ERROR_MESSAGE}, event='error')
+            return
+        bot_response = ''.join(chunks)
+        conversation_store.append(conversation_id, 'bot', bot_response)
+        chat_context.after_turn(conversation_id)
+        record_chat_event('chat_stream', conversation_id, started, user_message, bot_response)
+        yield sse_event({'response': bot_response}, event='done')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+        }
+    )
+
+@app.route('/chat/history', methods=['GET'])
+def chat_history():
+    """Return the latest messages of the current conversation (?limit=N, bounded)."""
+    conversation_id = session_conversation_id()
+    if not conversation_id:
+        return jsonify({'messages': []})
+
+    limit = min(request.args.get('limit', conversation_store.window, type=int), 100)
+    return jsonify({'messages': conversation_store.get_window(conversation_id, max(limit, 1))})
+
 @app.route('/voice-to-text', methods=['POST'])
 def voice_to_text():
     """
     Endpoint for Speech-to-Text using Faster-Whisper (local processing).
-    Accepts audio file, transcribes it, generates bot response, and returns
-    both transcription and TTS audio response.
+    Accepts audio file, checks it and starts transcription and the bot
+    response in the background, answering 202 with a result_url right away
+    so no web worker waits on Whisper or Gemini. GET result_url returns the
+    transcription and response text once ready; the TTS audio follows and
+    is fetched from the result's audio_url.
     """
-    temp_path = None
+    started = time.perf_counter()
     try:
         # Check if audio file is in the request
         if 'audio' not in request.files:
@@ -229,89 +516,272 @@ def voice_to_text():
         if not allowed_file(audio_file.filename):
             return jsonify({'error': 'Invalid file format'}), 400
         
-        # Save the file temporarily with a unique name to avoid collisions
-        file_ext = os.path.splitext(audio_file.filename)[1]
-        if not file_ext:
-            file_ext = '.webm' # Default fallback
-            
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        temp_path = os.path.join(UPLOAD_FOLDER, unique_filename)
-        audio_file.save(temp_path)
+        # Optional language hint (the language selected in the UI) and decoding profile
+        language_hint = request.form.get('language')
+        profile = voice_service.resolve_transcription_profile(request.form.get('profile'))
         
-        # Check file size
-        file_size = os.path.getsize(temp_path)
-        print(f"Saved audio file: {temp_path}, Size: {file_size} bytes")
+        # Keep the upload in memory; it is streamed straight into FFmpeg
+        with metrics.span('upload_read'):
+            audio_bytes = audio_file.read()
+        print(f"Received audio file: {audio_file.filename}, Size: {len(audio_bytes)} bytes")
         
-        if file_size == 0:
+        if len(audio_bytes) == 0:
             return jsonify({'error': 'Uploaded file is empty'}), 400
         
-        # Transcribe using local Faster-Whisper
-        success, transcription, detected_language, error = voice_service.transcribe_audio(temp_path)
+        # Reject non-audio, unsupported codecs and over-long recordings from
+        # the container header, before any decoding or transcription work
+        try:
+            with metrics.span('audio_probe'):
+                audio_info = voice_service.check_audio_upload(audio_bytes)
+        except voice_service.AudioRejected as e:
+            return jsonify({'error': str(e)}), e.status_code
+        print(f"Audio upload: {audio_info}")
         
-        if not success:
-            return jsonify({'error': error or 'Transcription failed'}), 500
+        conversation_id = current_conversation_id()
+        with metrics.span('chat_history'):
+            history = chat_context.history_for(conversation_id)
         
-        # Generate bot response using Gemini
-        bot_response = ask_gemini(transcription)
-        
-        # Generate TTS audio response with speed-up
-        tts_success, audio_response_path, tts_error = voice_service.generate_speech(
-            bot_response, 
-            detected_language,
-            speed_up=True,
-            speed_factor=1.3
+        # Transcribe -> Gemini in the background; speech for the first
+        # sentences is already being generated while Gemini is still answering
+        job_id = voice_jobs.create(conversation_id)
+        pipeline_started = time.perf_counter()
+        future = voice_pipeline.start_voice_request(audio_bytes, get_transcription_pool(), language_hint, profile, history)
+        future.add_done_callback(
+            lambda future: finish_voice_job(job_id, conversation_id, started, pipeline_started, profile, future)
         )
         
-        if not tts_success:
-            print(f"TTS generation failed: {tts_error}")
-            # Still return transcription and text response even if TTS fails
-            return jsonify({
-                'success': True,
-                'transcription': transcription,
-                'language': detected_language,
-                'response': bot_response,
-                'audio_available': False
-            })
-        
-        # Return the audio file
-        response = send_file(
-            audio_response_path,
-            mimetype='audio/mpeg',
-            as_attachment=True,
-            download_name='response.mp3',
-            max_age=0
-        )
-        
-        # Add custom headers with transcription data
-        # Base64 encode to handle Arabic/Unicode text in HTTP headers
-        safe_transcription = base64.b64encode(transcription.encode('utf-8')).decode('ascii')
-        safe_response_text = base64.b64encode(bot_response.encode('utf-8')).decode('ascii')
-        
-        # Map language name to code for header (ASCII-safe)
-        language_code_map = {
-            'العربية': 'ar',
-            'English': 'en',
-            'हिंदी': 'hi',
-            'Filipino': 'tl'
-        }
-        lang_code = language_code_map.get(detected_language, detected_language)
-        
-        response.headers['X-Transcription'] = safe_transcription
-        response.headers['X-Response-Text'] = safe_response_text
-        response.headers['X-Language'] = lang_code  # Send language code, not name
-        response.headers['X-Encoding'] = 'base64'
-        
+        response = jsonify({
+            'status': 'pending',
+            'job_id': job_id,
+            'result_url': url_for('voice_result', job_id=job_id)
+        })
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
         return response
     
+    except RequestEntityTooLarge:
+        raise  # Answered by the 413 handler
     except Exception as e:
         print(f"Error in voice-to-text: {e}")
         return jsonify({'error': str(e)}), 500
+
+def finish_voice_job(job_id, conversation_id, started, pipeline_started, profile, future):
+    """Store the outcome of a voice request and save the turn (runs on the pipeline's loop)."""
+    metrics.observe_stage('voice_pipeline', time.perf_counter() - pipeline_started)
+    try:
+        success, transcription, detected_language, bot_response, audio_id, error = future.result()
+    except Exception as e:
+        metrics.inc('stage_errors_total', stage='voice_pipeline')
+        if isinstance(e, TranscriptionQueueFull):
+            pool = get_transcription_pool()
+            state = {
+                'http_status': 503,
+                'retry_after': e.retry_after,
+                'error': 'Voice service is busy, please try again shortly',
+                'queue_depth': pool.stats()['queue_depth'] if pool else 0
+            }
+        elif isinstance(e, voice_pipeline.VoicePipelineTimeout):
+            state = {'http_status': 504, 'error': str(e)}
+        else:
+            print(f"Error in voice-to-text: {e}")
+            state = {'http_status': 500, 'error': str(e)}
+        voice_jobs.finish(job_id, conversation_id, {'status': 'failed', **state})
+        return
+    
+    if not success:
+        state = {'status': 'failed', 'http_status': 500, 'error': error or 'Transcription failed'}
+        if transcription:
+            # Only the answer failed: keep the question, but not a failed reply
+            conversation_store.append(conversation_id, 'user', transcription)
+            state.update(http_status=502, transcription=transcription)
+        voice_jobs.finish(job_id, conversation_id, state)
+        return
+    
+    conversation_store.append(conversation_id, 'user', transcription)
+    conversation_store.append(conversation_id, 'bot', bot_response)
+    chat_context.after_turn(conversation_id)
+    record_chat_event('voice', conversation_id, started, transcription, bot_response)
+    
+    voice_jobs.finish(job_id, conversation_id, {
+        'status': 'done',
+        'transcription': transcription,
+        'language': detected_language,
+        'language_code': voice_service.TTS_LANGUAGE_CODES.get(detected_language, 'ar'),
+        'profile': profile,
+        'response': bot_response,
+        'audio_id': audio_id
+    })
+
+@app.route('/voice-to-text/<job_id>', methods=['GET'])
+def voice_result(job_id):
+    """
+    Result of a /voice-to-text request: 202 while it is still running, then
+    the transcription and response (or the error, with its status code).
+    """
+    job = voice_jobs.get(job_id) if VoiceJobStore.is_valid_id(job_id) else None
+    if job is None or job['conversation_id'] != session_conversation_id():
+        return jsonify({'error': 'Unknown voice request'}), 404
+    
+    if job['status'] == 'pending':
+        response = jsonify({'status': 'pending'})
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if job['status'] == 'failed':
+        body = {'error': job['error']}
+        if 'transcription' in job:
+            body['transcription'] = job['transcription']
+        if 'queue_depth' in job:
+            body['queue_depth'] = job['queue_depth']
+        response = jsonify(body)
+        response.status_code = job['http_status']
+        if 'retry_after' in job:
+            response.headers['Retry-After'] = str(job['retry_after'])
+        return response
+    
+    return jsonify({
+        'success': True,
+        'transcription': job['transcription'],
+        'language': job['language'],
+        'language_code': job['language_code'],
+        'profile': job['profile'],
+        'response': job['response'],
+        'audio_available': True,
+        'audio_id': job['audio_id'],
+        'audio_url': url_for('voice_audio', audio_id=job['audio_id'])
+    })
+
+def transcribe_samples(samples, language=None, profile=None, count_audio=True):
+    """Transcribe decoded PCM on the transcription pool when one is configured."""
+    pool = get_transcription_pool()
+    if pool:
+        return pool.transcribe(samples, language, profile, count_audio=count_audio)
+    return voice_service.transcribe_audio(samples, language, profile, count_audio=count_audio)
+
+def transcribe_partial_samples(samples, language=None, profile=None):
+    """
+    Transcribe a live partial, or return None to skip it when no pool worker
+    is idle: partials are optional and must not take slots from uploads.
+    """
+    pool = get_transcription_pool()
+    if pool and not pool.has_idle_worker():
+        return None
+    try:
+        return transcribe_samples(samples, language, profile, count_audio=False)
+    except TranscriptionQueueFull:
+        return None
+
+@sock.route('/ws/transcribe')
+def ws_transcribe(ws):
+    """
+    Live Speech-to-Text. The client sends MediaRecorder chunks as binary
+    messages while recording and {"type": "stop"} when done. Utterances are
+    transcribed as soon as they end, {"type": "partial"} messages are pushed
+    while the user speaks, and {"type": "final"} carries the full transcript.
+    The language hint and profile are passed as query parameters.
+    """
+    if not STREAMING_ASR:
+        ws.send(json.dumps({'type': 'error', 'error': 'Streaming transcription is disabled'}))
+        return
+    if not current_user.is_authenticated and not session.get('is_guest'):
+        ws.send(json.dumps({'type': 'error', 'error': 'Not logged in'}))
+        return
     
+    language_hint = request.args.get('language')
+    profile = voice_service.resolve_transcription_profile(request.args.get('profile'))
+    transcriber = StreamingTranscriber(
+        lambda samples: transcribe_samples(samples, language_hint, profile),
+        lambda samples: transcribe_partial_samples(samples, language_hint, profile)
+    )
+    received_bytes = 0
+    try:
+        while True:
+            message = ws.receive(timeout=0.1)
+            
+            for event, text in transcriber.events():
+                if event == 'error':
+                    # An utterance is lost; the client falls back to uploading the recording
+                    ws.send(json.dumps({'type': 'error', 'error': text}, ensure_ascii=False))
+                    return
+                ws.send(json.dumps({'type': event, 'text': text}, ensure_ascii=False))
+            
+            if message is None:
+                continue
+            if isinstance(message, bytes):
+                received_bytes += len(message)
+                if received_bytes > app.config['MAX_CONTENT_LENGTH']:
+                    ws.send(json.dumps({'type': 'error', 'error': 'Recording is too large'}))
+                    return
+                transcriber.feed(message)
+                continue
+            if json.loads(message).get('type') == 'stop':
+                break
+        
+        transcription, detected_language = transcriber.finish()
+        ws.send(json.dumps({
+            'type': 'final',
+            'text': transcription,
+            'language': detected_language,
+            'language_code': voice_service.TTS_LANGUAGE_CODES.get(detected_language, 'ar'),
+            'profile': profile
+        }, ensure_ascii=False))
+    
+    except ConnectionClosed:
+        pass  # Client went away; nothing left to send
+    except TranscriptionQueueFull as e:
+        try:
+            ws.send(json.dumps({
+                'type': 'error',
+                'error': 'Voice service is busy, please try again shortly',
+                'retry_after': e.retry_after
+            }))
+        except Exception:
+            pass
+    except Exception as e:
+        print(f"Error in streaming transcription: {e}")
+        try:
+            ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+        except Exception:
+            pass
     finally:
-        # Clean up temporary input file
-        if temp_path and os.path.exists(temp_path):
-            voice_service.cleanup_audio_file(temp_path)
-        # Note: audio_response_path cleanup happens after file is sent by Flask
+        transcriber.close()
+
+@app.route('/audio/<audio_id>', methods=['GET'])
+def voice_audio(audio_id):
+    """
+    Fetch the TTS audio of a /voice-to-text response. Long-polls for up to
+    AUDIO_LONG_POLL_SECONDS, then answers 202 while the audio is still
+    being generated.
+    """
+    if len(audio_id) != 64 or any(c not in '0123456789abcdef' for c in audio_id):
+        return jsonify({'error': 'Invalid audio id'}), 404
+    
+    status = voice_pipeline.wait_for_audio(audio_id, timeout=AUDIO_LONG_POLL_SECONDS)
+    
+    if status == 'ready':
+        audio_path = voice_service.tts_cache.get(audio_id)
+        if audio_path:
+            return send_file(
+                audio_path,
+                mimetype='audio/mpeg',
+                download_name='response.mp3',
+                etag=audio_id,
+                conditional=True,
+                max_age=3600
+            )
+        return jsonify({'error': 'Audio expired'}), 404
+    
+    if status == 'pending':
+        response = jsonify({'status': 'pending'})
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if status == 'failed':
+        return jsonify({'error': 'TTS generation failed'}), 500
+    
+    return jsonify({'error': 'Unknown audio id'}), 404
 
 @app.route('/text-to-speech', methods=['POST'])
 def text_to_speech():
@@ -320,7 +790,6 @@ def text_to_speech():
     Accepts text and language parameter.
     Returns generated audio file sped up by 1.3x.
     """
-    audio_path = None
     try:
         data = request.json
         text = data.get('text')
@@ -329,21 +798,25 @@ def text_to_speech():
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        # Generate speech with 1.3x speed-up
-        success, audio_path, error = voice_service.generate_speech(
+        # Audio is content-addressed: the TTS cache key identifies this file
+        etag = voice_service.speech_cache_key(text, language, speed_up=True, speed_factor=1.3)
+        
+        # Generate speech with 1.3x speed-up (served from the TTS cache when possible)
+        success, audio_data, error = voice_service.synthesize_speech(
             text, 
             language,
             speed_up=True,
             speed_factor=1.3
         )
         
-        if success and audio_path:
-            # Send file to client
+        if success and audio_data:
+            # Send audio to client straight from memory
             return send_file(
-                audio_path,
+                io.BytesIO(audio_data),
                 mimetype='audio/mpeg',
                 as_attachment=True,
                 download_name='response.mp3',
+                etag=etag,
                 max_age=0
             )
         else:
@@ -352,11 +825,32 @@ def text_to_speech():
     except Exception as e:
         print(f"Error in text-to-speech: {e}")
         return jsonify({'error': str(e)}), 500
+
+@app.route('/text-to-speech/stream', methods=['POST'])
+def text_to_speech_stream():
+    """
+    Chunked Text-to-Speech: synthesizes the text sentence by sentence on a
+    thread pool and streams the MP3 chunks in order as they become ready,
+    so playback can start after the first sentence.
+    """
+    data = request.json
+    text = data.get('text')
+    language = data.get('language', 'العربية')
     
-    finally:
-        # Note: We can't clean up immediately as the file needs to be sent
-        # Flask will handle this, but for production consider a cleanup task
-        pass
+    if not text:
+        return jsonify({'error': 'No text provided'}), 400
+    
+    return Response(
+        stream_with_context(voice_service.stream_speech(text, language, speed_up=True, speed_factor=1.3)),
+        mimetype='audio/mpeg',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+        }
+    )
 
 if __name__ == '__main__':
+    # With the reloader, only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_voice_warm_up()
     app.run(debug=True)
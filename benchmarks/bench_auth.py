@@ -0,0 +1,80 @@
+"""
+Benchmark: signup and login throughput under parallel load.
+
+Drives POST /register and POST /login of the real Flask app from
+--concurrency threads, each with its own test client, against a scratch
+database (a fresh SQLite file in a temporary directory unless DATABASE_URL
+is set). Password hashing dominates a single request; the interesting
+number is how throughput scales with concurrency, which is where commits
+serializing on the database lock show up.
+
+Compare journal modes by running it twice:
+    python benchmarks/bench_auth.py [--users 200] [--concurrency 16]
+    SQLITE_JOURNAL_MODE=DELETE python benchmarks/bench_auth.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from percentiles import percentile
+
+
+def run_phase(app, requests, concurrency):
+    latencies = []
+    failures = []
+
+    def timed(request):
+        path, form = request
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post(path, data=form)
+        latencies.append(time.perf_counter() - start)
+        # Successful signups and logins redirect to /home
+        if response.status_code != 302 or not response.location.endswith('/home'):
+            failures.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, requests))
+    return time.perf_counter() - start, latencies, failures
+
+
+def report(name, elapsed, latencies, failures):
+    latencies = sorted(latencies)
+    p95 = percentile(latencies, 95)
+    print(f"{name:<8} {len(latencies) / elapsed:8.1f} req/s  p50={percentile(latencies, 50) * 1000:7.1f}ms  "
+          f"p95={p95 * 1000:7.1f}ms  failed={len(failures)}  total={elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        scratch = tempfile.mkdtemp(prefix="tabyin-bench-auth-")
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(scratch, "bench.db")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-key")
+
+    from app import app
+
+    run_id = int(time.time())
+    users = [(f"bench{run_id}_{i}", f"bench{run_id}_{i}@example.com", f"password-{i}") for i in range(args.users)]
+    signups = [('/register', {'username': u, 'email': e, 'password': p}) for u, e, p in users]
+    logins = [('/login', {'identifier': u, 'password': p}) for u, _, p in users]
+
+    print(f"{args.users} users, concurrency={args.concurrency}, database={os.environ['DATABASE_URL']}, "
+          f"journal={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}")
+    report("signup", *run_phase(app, signups, args.concurrency))
+    report("login", *run_phase(app, logins, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
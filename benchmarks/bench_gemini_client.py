@@ -0,0 +1,96 @@
+"""
+Benchmark: per-request overhead of building a Gemini request.
+
+Compares the previous approach (a new GenerativeModel per call with the
+system prompt concatenated into the user prompt) with the cached model from
+gemini_service (system prompt passed once as system_instruction).
+
+The default mode never touches the network: it measures model construction
+and request preparation only. Pass --live to also time real round trips
+(requires GEMINI_API_KEY).
+
+Usage:
+    python benchmarks/bench_gemini_client.py [--iterations 2000] [--live 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+import gemini_service
+from percentiles import percentile
+
+PROMPT = "ما هي غرامة استخدام الجوال أثناء القيادة؟"
+
+
+def per_request_old(prompt):
+    model = genai.GenerativeModel(gemini_service.GEMINI_MODEL_NAME)
+    full_prompt = gemini_service.SYSTEM_CONTEXT + prompt
+    return model, model._prepare_request(contents=full_prompt, tools=None, tool_config=None)
+
+
+def per_request_new(prompt):
+    model = gemini_service.get_model()
+    return model, model._prepare_request(contents=prompt, tools=None, tool_config=None)
+
+
+def time_calls(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(PROMPT)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(name, samples, unit="us"):
+    samples = sorted(samples)
+    p95 = percentile(samples, 95)
+    print(f"{name:<28} mean={statistics.mean(samples):10.1f}{unit}  "
+          f"p50={percentile(samples, 50):10.1f}{unit}  p95={p95:10.1f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--live", type=int, default=0, help="number of real API calls per variant")
+    args = parser.parse_args()
+
+    load_dotenv()
+    gemini_service.init_gemini(os.getenv("GEMINI_API_KEY", "benchmark-key"))
+
+    # Warm up imports and the registry before measuring
+    per_request_old(PROMPT)
+    per_request_new(PROMPT)
+
+    print(f"Request preparation overhead ({args.iterations} iterations)")
+    report("new model per request", time_calls(per_request_old, args.iterations))
+    report("cached model", time_calls(per_request_new, args.iterations))
+
+    _, old_request = per_request_old(PROMPT)
+    _, new_request = per_request_new(PROMPT)
+    print(f"Serialized request size: per-request={old_request._pb.ByteSize()} bytes, "
+          f"cached={new_request._pb.ByteSize()} bytes")
+
+    if args.live:
+        def live_old(prompt):
+            model, _ = per_request_old(prompt)
+            return model.generate_content(gemini_service.SYSTEM_CONTEXT + prompt).text
+
+        def live_new(prompt):
+            return gemini_service.get_model().generate_content(prompt).text
+
+        print(f"\nLive round trips ({args.live} calls each)")
+        report("new model per request", [s / 1000 for s in time_calls(live_old, args.live)], "ms")
+        report("cached model", [s / 1000 for s in time_calls(live_new, args.live)], "ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: Whisper throughput for bursts of short clips, batched vs unbatched.
+
+Submits --clips clips from --concurrency threads at once, either straight to
+WhisperModel.transcribe (one clip per call, greedy, no timestamps) or through
+the WhisperBatcher used by voice_service when WHISPER_BATCH_SIZE > 1.
+
+Pass real recordings with --audio for meaningful numbers; without them the
+benchmark synthesizes 2-5 second tone bursts, which exercise the same code
+path but are not representative of speech.
+
+Usage:
+    python benchmarks/bench_whisper_batching.py --audio a.webm b.webm \
+        [--clips 64] [--concurrency 16] [--batch-size 8] [--wait-ms 20] [--model base]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import voice_service
+from whisper_batching import WhisperBatcher
+from percentiles import percentile
+
+
+def load_clips(paths, count, seed=0):
+    if paths:
+        decoded = []
+        for path in paths:
+            success, samples, error = voice_service.decode_audio(path)
+            if not success:
+                raise SystemExit(f"Cannot decode {path}: {error}")
+            decoded.append(samples[:voice_service.SAMPLE_RATE * 30])
+        return [decoded[i % len(decoded)] for i in range(count)]
+
+    rng = np.random.default_rng(seed)
+    clips = []
+    for _ in range(count):
+        seconds = rng.uniform(2, 5)
+        t = np.arange(int(seconds * voice_service.SAMPLE_RATE)) / voice_service.SAMPLE_RATE
+        tone = 0.3 * np.sin(2 * np.pi * rng.uniform(150, 400) * t) * (np.sin(2 * np.pi * 3 * t) > 0)
+        clips.append(tone.astype(np.float32))
+    return clips
+
+
+def run_burst(transcribe_one, clips, concurrency):
+    latencies = []
+
+    def timed(clip):
+        start = time.perf_counter()
+        transcribe_one(clip)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, clips))
+    return time.perf_counter() - start, latencies
+
+
+def report(name, clips, elapsed, latencies):
+    audio_seconds = sum(len(clip) for clip in clips) / voice_service.SAMPLE_RATE
+    latencies = sorted(latencies)
+    p95 = percentile(latencies, 95)
+    print(f"{name:<12} {len(clips) / elapsed:7.2f} clips/s  {audio_seconds / elapsed:7.2f} audio-s/s  "
+          f"p50={percentile(latencies, 50):6.2f}s  p95={p95:6.2f}s  total={elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", nargs="*", default=[], help="recordings to use as clips (first 30s of each)")
+    parser.add_argument("--clips", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=20)
+    parser.add_argument("--model", default=voice_service.WHISPER_SHORT_CLIP_MODEL_SIZE)
+    parser.add_argument("--language", default="ar", help="language hint, or 'auto' to detect")
+    args = parser.parse_args()
+
+    language = None if args.language == "auto" else args.language
+    model_spec = (args.model, voice_service.WHISPER_COMPUTE_TYPE, voice_service.WHISPER_CPU_THREADS)
+    model = voice_service.whisper_models.get(*model_spec)
+    batcher = WhisperBatcher(voice_service.whisper_models.get, args.batch_size, args.wait_ms)
+    clips = load_clips(args.audio, args.clips)
+
+    options = {'beam_size': 1, 'without_timestamps': True, 'vad_filter': True}
+
+    def unbatched(clip):
+        segments, _ = model.transcribe(clip, language=language, **options)
+        return " ".join(segment.text for segment in segments)
+
+    def batched(clip):
+        return batcher.transcribe(clip, model_spec, language, options)
+
+    # Warm up both paths before measuring
+    unbatched(clips[0])
+    batched(clips[0])
+
+    print(f"{len(clips)} clips, concurrency={args.concurrency}, model={args.model}, "
+          f"batch_size={args.batch_size}, wait={args.wait_ms}ms")
+    report("unbatched", clips, *run_burst(unbatched, clips, args.concurrency))
+    report("batched", clips, *run_burst(batched, clips, args.concurrency))
+    print(f"Batcher stats: {batcher.stats()}")
+
+
+if __name__ == "__main__":
+    main()
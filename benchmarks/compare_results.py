@@ -0,0 +1,83 @@
+"""
+Compare two loadtest.py result files, e.g. from two commits.
+
+Prints p50/p95/p99 and throughput for every endpoint and stage present in
+both runs, with the relative change. Exits with status 1 when any p95 (or
+throughput) got worse by more than --threshold percent, so it can gate a
+deploy.
+
+Usage:
+    python benchmarks/compare_results.py results/base.json results/new.json [--threshold 10]
+"""
+
+import argparse
+import json
+
+
+def change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def compare_rows(title, old_rows, new_rows, threshold):
+    regressions = []
+    names = [name for name in old_rows if name in new_rows]
+    if not names:
+        return regressions
+
+    print(f"\n{title}")
+    print(f"  {'name':<22} {'p50 (ms)':>22} {'p95 (ms)':>22} {'p99 (ms)':>22} {'rps':>20}")
+    for name in names:
+        old, new = old_rows[name], new_rows[name]
+        cells = []
+        flag = ""
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            cells.append(f"{old[key]:>7.1f} -> {new[key]:>7.1f} {change(old[key], new[key]):+5.0f}%")
+        if 'throughput_rps' in old and 'throughput_rps' in new:
+            rps_change = change(old['throughput_rps'], new['throughput_rps'])
+            cells.append(f"{old['throughput_rps']:>6.1f} -> {new['throughput_rps']:>6.1f} {rps_change:+4.0f}%")
+            if rps_change < -threshold:
+                regressions.append(f"{title} / {name}: throughput {rps_change:+.0f}%")
+                flag = "  <-- regression"
+        else:
+            cells.append(f"{'-':>20}")
+        p95_change = change(old['p95_ms'], new['p95_ms'])
+        if p95_change > threshold:
+            regressions.append(f"{title} / {name}: p95 {p95_change:+.0f}%")
+            flag = "  <-- regression"
+        print(f"  {name:<22} " + " ".join(f"{cell:>22}" for cell in cells) + flag)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95/throughput change in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.candidate, encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"baseline:  {old.get('commit') or '?'} {old.get('label', '')} ({old.get('timestamp', '')})")
+    print(f"candidate: {new.get('commit') or '?'} {new.get('label', '')} ({new.get('timestamp', '')})")
+    for key in ('requests', 'concurrency', 'whisper', 'gemini_latency_ms', 'tts_latency_ms'):
+        if old['config'].get(key) != new['config'].get(key):
+            print(f"warning: runs differ in {key}: {old['config'].get(key)} vs {new['config'].get(key)}")
+
+    regressions = compare_rows("Endpoints", old['endpoints'], new['endpoints'], args.threshold)
+    for endpoint, stages in old['stages'].items():
+        if endpoint in new['stages']:
+            regressions += compare_rows(f"Stages during {endpoint}", stages, new['stages'][endpoint], args.threshold)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0f}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        raise SystemExit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
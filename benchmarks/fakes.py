@@ -0,0 +1,181 @@
+"""
+Local stand-ins for the Google services (and optionally Whisper) used by the
+load tests, so a benchmark run never touches the network and its numbers do
+not depend on remote latency.
+
+    import fakes
+    fakes.install(gemini_latency_ms=400, gemini_chars=600, tts_latency_ms=250)
+    import app  # now talks to the fakes
+
+install() must run before the application handles requests; patching
+before `import app` also keeps init_gemini() offline. The fakes reproduce
+the call shapes the app relies on (ChatSession.send_message[_async] with
+streaming, usage_metadata, embed_content, gTTS.write_to_fp and
+WhisperModel.transcribe), not the content.
+"""
+
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ANSWER_SENTENCE = "الغرامة: 300 ريال لاستخدام الجوال أثناء القيادة. "
+
+TRANSCRIPTS = (
+    ("ar", "كم غرامة استخدام الجوال أثناء القيادة"),
+    ("ar", "كيف أجدد جواز السفر"),
+    ("en", "How do I renew my residence permit"),
+    ("en", "What is the fine for running a red light"),
+)
+
+
+class FakeResponse:
+    """Response of a (possibly streamed) send_message call."""
+
+    def __init__(self, text, chunks, first_chunk_s, chunk_interval_s, prompt):
+        self.text = text
+        self._chunks = chunks
+        self._first_chunk_s = first_chunk_s
+        self._chunk_interval_s = chunk_interval_s
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=len(prompt) // 3 + 1,
+            candidates_token_count=len(text) // 3 + 1,
+            total_token_count=(len(prompt) + len(text)) // 3 + 2
+        )
+
+    def __iter__(self):
+        for i, chunk in enumerate(self._chunks):
+            time.sleep(self._first_chunk_s if i == 0 else self._chunk_interval_s)
+            yield SimpleNamespace(text=chunk)
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self._chunks):
+            await asyncio.sleep(self._first_chunk_s if i == 0 else self._chunk_interval_s)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeGemini:
+    """Configurable latency/size model standing in for genai.GenerativeModel."""
+
+    def __init__(self, latency_ms: float, chars: int, chunks: int, first_chunk_ms: float):
+        self.latency_s = latency_ms / 1000
+        self.first_chunk_s = first_chunk_ms / 1000
+        self.chars = chars
+        self.chunks = max(1, chunks)
+        self.calls = 0
+        self._numbers = itertools.count(1)
+
+    def answer(self, prompt):
+        # Numbered so every answer is new text (no accidental TTS cache hits)
+        self.calls = number = next(self._numbers)
+        repeats = self.chars // len(ANSWER_SENTENCE) + 1
+        text = (f"{number}. " + ANSWER_SENTENCE * repeats)[:self.chars]
+        size = len(text) // self.chunks + 1
+        chunks = [text[i:i + size] for i in range(0, len(text), size)]
+        interval = max(0.0, self.latency_s - self.first_chunk_s) / max(1, len(chunks) - 1)
+        return FakeResponse(text, chunks, self.first_chunk_s, interval, prompt)
+
+    def model_class(self):
+        fake = self
+
+        class GenerativeModel:
+            def __init__(self, model_name, system_instruction=None):
+                self.model_name = model_name
+
+            def start_chat(self, history=None):
+                return ChatSession(history)
+
+            def generate_content(self, prompt, stream=False):
+                response = fake.answer(str(prompt))
+                if not stream:
+                    time.sleep(fake.latency_s)
+                return response
+
+        class ChatSession:
+            def __init__(self, history):
+                self.history = list(history or [])
+
+            def send_message(self, prompt, stream=False):
+                response = fake.answer(prompt)
+                if not stream:
+                    time.sleep(fake.latency_s)
+                return response
+
+            async def send_message_async(self, prompt, stream=False):
+                response = fake.answer(prompt)
+                if not stream:
+                    await asyncio.sleep(fake.latency_s)
+                return response
+
+        return GenerativeModel
+
+
+def _silent_mp3(seconds: float) -> bytes:
+    import voice_service
+    result = subprocess.run(
+        [voice_service.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+         '-f', 'lavfi', '-i', f'aevalsrc=0:d={seconds}:s=24000', '-ac', '1', '-b:a', '32k', '-f', 'mp3', 'pipe:1'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    return result.stdout
+
+
+class FakeWhisperModel:
+    """Stand-in for faster_whisper.WhisperModel; takes realtime_factor x audio duration."""
+
+    def __init__(self, realtime_factor: float):
+        self.realtime_factor = realtime_factor
+
+    def transcribe(self, samples, language=None, **kwargs):
+        duration = len(samples) / 16000
+        time.sleep(duration * self.realtime_factor)
+        detected, text = TRANSCRIPTS[len(samples) % len(TRANSCRIPTS)]
+        info = SimpleNamespace(language=language or detected, duration=duration)
+        return iter([SimpleNamespace(text=text)]), info
+
+
+def install(
+    gemini_latency_ms: float = 400,
+    gemini_chars: int = 600,
+    gemini_chunks: int = 8,
+    gemini_first_chunk_ms: float = 150,
+    tts_latency_ms: float = 250,
+    tts_ms_per_char: float = 1.0,
+    whisper_realtime_factor: float = None
+) -> FakeGemini:
+    """
+    Patch google.generativeai and gtts in place (and Whisper when
+    whisper_realtime_factor is given). Returns the FakeGemini for call counts.
+    """
+    import google.generativeai as genai
+    import gtts
+
+    gemini = FakeGemini(gemini_latency_ms, gemini_chars, gemini_chunks, gemini_first_chunk_ms)
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = gemini.model_class()
+    genai.embed_content = lambda model, content, task_type=None: {
+        'embedding': [float((hash(content) >> shift) & 0xff) for shift in range(0, 64, 8)]
+    }
+
+    mp3 = _silent_mp3(1.0)
+
+    class FakeGTTS:
+        def __init__(self, text, lang='en', slow=False, **kwargs):
+            self.text = text
+
+        def write_to_fp(self, fp):
+            time.sleep((tts_latency_ms + tts_ms_per_char * len(self.text)) / 1000)
+            fp.write(mp3)
+
+    gtts.gTTS = FakeGTTS
+
+    if whisper_realtime_factor is not None:
+        import voice_service
+        voice_service.whisper_models.loader = lambda *spec: FakeWhisperModel(whisper_realtime_factor)
+
+    return gemini
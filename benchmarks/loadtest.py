@@ -0,0 +1,268 @@
+"""
+Offline end-to-end load test for /chat, /chat/stream, /voice-to-text and
+/text-to-speech.
+
+Gemini and gTTS are replaced by local fakes with configurable latency and
+response size (see fakes.py); Whisper runs for real unless --whisper fake.
+Each endpoint gets --requests requests from --concurrency threads, each
+thread holding its own guest session. Per-endpoint latency is measured at
+the client, per-stage latency from the app's metrics spans. Results are
+printed and saved as JSON for benchmarks/compare_results.py.
+
+Build an audio corpus first (see make_audio_corpus.py), then:
+    python benchmarks/loadtest.py --requests 100 --concurrency 16 --out results/base.json
+    python benchmarks/loadtest.py --endpoints chat,tts --gemini-latency-ms 800
+    python benchmarks/loadtest.py --whisper fake --audio-dir /tmp/synthetic-clips
+"""
+
+import argparse
+import glob
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from percentiles import percentile
+
+ENDPOINTS = ('chat', 'chat_stream', 'voice', 'tts')
+
+# Seconds the client waits for a voice result, or for its audio, before counting an error
+VOICE_RESULT_TIMEOUT = 300
+
+QUESTIONS = (
+    "كم غرامة استخدام الجوال أثناء القيادة؟",
+    "ما هي خطوات تجديد جواز السفر؟",
+    "What is the fine for running a red light?",
+    "How do I renew my residence permit?",
+)
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    values = sorted(latencies)
+    summary = {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+    }
+    if elapsed is not None:
+        summary['errors'] = errors
+        summary['throughput_rps'] = round(len(values) / elapsed, 2) if elapsed else 0.0
+    return summary
+
+
+class StageRecorder:
+    """Collects raw stage durations from metrics.observe_stage while a phase runs."""
+
+    def __init__(self, metrics):
+        self._lock = threading.Lock()
+        self.samples = {}
+        original = metrics.observe_stage
+
+        def observe_stage(stage, seconds):
+            original(stage, seconds)
+            with self._lock:
+                self.samples.setdefault(stage, []).append(seconds)
+
+        metrics.observe_stage = observe_stage
+
+    def take(self):
+        with self._lock:
+            samples, self.samples = self.samples, {}
+        return {stage: summarize(values) for stage, values in sorted(samples.items())}
+
+
+# Numbers every question of the run, so none is answered from the answer cache
+_question_numbers = itertools.count(1)
+
+
+def make_request(endpoint, client, index, audio_files):
+    """Send one request; returns (ok, audio_url) where audio_url is the voice answer's audio."""
+    question = f"{QUESTIONS[index % len(QUESTIONS)]} ({next(_question_numbers)})"
+    if endpoint == 'chat':
+        response = client.post('/chat', json={'message': question})
+        return response.status_code == 200, None
+    if endpoint == 'chat_stream':
+        response = client.post('/chat/stream', json={'message': question})
+        return response.status_code == 200 and b'event: done' in response.get_data(), None
+    if endpoint == 'tts':
+        response = client.post('/text-to-speech', json={'text': question, 'language': 'العربية'})
+        return response.status_code == 200, None
+    path = audio_files[index % len(audio_files)]
+    with open(path, 'rb') as f:
+        data = {'audio': (f, os.path.basename(path)), 'language': 'العربية'}
+        response = client.post('/voice-to-text', data=data, content_type='multipart/form-data')
+    if response.status_code == 202:
+        response = poll(client, response.get_json()['result_url'], VOICE_RESULT_TIMEOUT)
+        if response is None:
+            return False, None
+    body = response.get_json(silent=True) or {}
+    return response.status_code == 200, body.get('audio_url')
+
+
+def poll(client, url, timeout):
+    """GET url until it stops answering 202; None once timeout seconds have passed."""
+    deadline = time.perf_counter() + timeout
+    response = client.get(url)
+    while response.status_code == 202:
+        if time.perf_counter() >= deadline:
+            return None
+        time.sleep(0.05)
+        response = client.get(url)
+    return response
+
+
+def run_endpoint(app, endpoint, requests, concurrency, audio_files, fetch_audio):
+    local = threading.local()
+    latencies, audio_latencies = [], []
+    errors = [0, 0]
+    lock = threading.Lock()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+            local.client.post('/guest-login')
+        return local.client
+
+    def one(index):
+        start = time.perf_counter()
+        try:
+            ok, audio_url = make_request(endpoint, client(), index, audio_files)
+        except Exception:
+            ok, audio_url = False, None
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors[0] += not ok
+        if fetch_audio and audio_url:
+            start = time.perf_counter()
+            response = poll(client(), audio_url, VOICE_RESULT_TIMEOUT)
+            with lock:
+                audio_latencies.append(time.perf_counter() - start)
+                errors[1] += response is None or response.status_code != 200
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    results = {endpoint: summarize(latencies, elapsed, errors[0])}
+    if audio_latencies:
+        results['voice_audio'] = summarize(audio_latencies, elapsed, errors[1])
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"  {'name':<22} {'count':>6} {'rps':>8} {'err':>5} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, row in rows.items():
+        rps = f"{row['throughput_rps']:.1f}" if 'throughput_rps' in row else '-'
+        err = str(row['errors']) if 'errors' in row else '-'
+        print(f"  {name:<22} {row['count']:>6} {rps:>8} {err:>5} {row['mean_ms']:>7.1f}ms "
+              f"{row['p50_ms']:>7.1f}ms {row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="chat,voice,tts", help=f"comma-separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument("--requests", type=int, default=50, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--audio-dir", default=os.path.join(BENCH_DIR, "audio"))
+    parser.add_argument("--no-fetch-audio", action="store_true", help="do not GET the audio_url of voice responses")
+    parser.add_argument("--gemini-latency-ms", type=float, default=400, help="total Gemini answer time")
+    parser.add_argument("--gemini-first-chunk-ms", type=float, default=150, help="time to the first streamed chunk")
+    parser.add_argument("--gemini-chars", type=int, default=600, help="answer length")
+    parser.add_argument("--gemini-chunks", type=int, default=8, help="chunks per streamed answer")
+    parser.add_argument("--tts-latency-ms", type=float, default=250, help="gTTS time per call")
+    parser.add_argument("--tts-ms-per-char", type=float, default=1.0, help="extra gTTS time per character")
+    parser.add_argument("--whisper", choices=("real", "fake"), default="real")
+    parser.add_argument("--whisper-rtf", type=float, default=0.1, help="fake Whisper time per audio second")
+    parser.add_argument("--label", default="", help="free-form label stored with the results")
+    parser.add_argument("--out", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    audio_files = sorted(glob.glob(os.path.join(args.audio_dir, '*.*')))
+    if 'voice' in endpoints and not audio_files:
+        raise SystemExit(f"No audio clips in {args.audio_dir}; run benchmarks/make_audio_corpus.py first")
+
+    # Scratch database and caches, so runs start cold and leave nothing behind
+    scratch = tempfile.mkdtemp(prefix="tabyin-loadtest-")
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(scratch, "loadtest.db"))
+    os.environ.setdefault("TTS_CACHE_DIR", os.path.join(scratch, "tts-cache"))
+    os.environ.setdefault("VOICE_SCRATCH_DIR", scratch)
+    os.environ.setdefault("LEGAL_INDEX_DIR", os.path.join(scratch, "no-legal-index"))
+    os.environ["GEMINI_API_KEY"] = "loadtest"
+
+    import fakes
+    gemini = fakes.install(
+        gemini_latency_ms=args.gemini_latency_ms,
+        gemini_chars=args.gemini_chars,
+        gemini_chunks=args.gemini_chunks,
+        gemini_first_chunk_ms=args.gemini_first_chunk_ms,
+        tts_latency_ms=args.tts_latency_ms,
+        tts_ms_per_char=args.tts_ms_per_char,
+        whisper_realtime_factor=args.whisper_rtf if args.whisper == "fake" else None
+    )
+
+    from app import app
+    from metrics import metrics
+    recorder = StageRecorder(metrics)
+
+    print(f"Load test: {', '.join(endpoints)} x {args.requests} requests, concurrency={args.concurrency}, "
+          f"whisper={args.whisper}, gemini={args.gemini_latency_ms:.0f}ms/{args.gemini_chars} chars, "
+          f"tts={args.tts_latency_ms:.0f}ms")
+
+    results = {
+        'label': args.label,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': vars(args),
+        'endpoints': {},
+        'stages': {}
+    }
+    for endpoint in endpoints:
+        # Warm-up request (model loads, first connections) is not measured
+        run_endpoint(app, endpoint, 1, 1, audio_files, not args.no_fetch_audio)
+        recorder.take()
+        results['endpoints'].update(
+            run_endpoint(app, endpoint, args.requests, args.concurrency, audio_files, not args.no_fetch_audio)
+        )
+        results['stages'][endpoint] = recorder.take()
+
+    print_table("Endpoints", results['endpoints'])
+    for endpoint, stages in results['stages'].items():
+        print_table(f"Stages during {endpoint}", stages)
+    print(f"\nFake Gemini calls: {gemini.calls}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
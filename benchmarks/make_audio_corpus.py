@@ -0,0 +1,96 @@
+"""
+Generate the audio corpus used by benchmarks/loadtest.py.
+
+Clips are written as WebM/Opus, the format the browser's MediaRecorder
+uploads. Two sources:
+
+    gtts       Spoken Arabic and English questions synthesized with the real
+               gTTS service (needs network once; the clips are then reused
+               offline). Closest to real uploads.
+    synthetic  Modulated tone bursts of 2-8 seconds, generated locally.
+               Exercises decoding and upload checks, but Whisper output on
+               them is meaningless - pair with a fake Whisper model.
+
+Usage:
+    python benchmarks/make_audio_corpus.py [--source gtts] [--out benchmarks/audio] [--count 12]
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import voice_service
+
+QUESTIONS = (
+    ("ar", "كم غرامة استخدام الجوال أثناء القيادة؟"),
+    ("ar", "ما هي خطوات تجديد جواز السفر السعودي؟"),
+    ("ar", "كيف أستخرج بطاقة الهوية الوطنية لأول مرة؟"),
+    ("ar", "ما عقوبة الدخول غير المصرح به إلى حساب إلكتروني؟"),
+    ("ar", "متى يجب تجديد الإقامة قبل انتهائها؟"),
+    ("ar", "ما غرامة قطع الإشارة الحمراء؟"),
+    ("en", "What is the fine for using a phone while driving?"),
+    ("en", "How do I renew my residence permit?"),
+    ("en", "What documents do I need for a new passport?"),
+    ("en", "Is there a penalty for a late vehicle registration renewal?"),
+    ("en", "How can I report a cybercrime?"),
+    ("en", "Can I transfer my sponsorship to a new employer?"),
+)
+
+
+def encode_webm(source_args, stdin_data=None):
+    command = [voice_service.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error'] + source_args + [
+        '-ac', '1', '-ar', '48000', '-c:a', 'libopus', '-b:a', '32k', '-f', 'webm', 'pipe:1'
+    ]
+    result = subprocess.run(command, input=stdin_data, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise SystemExit(f"FFmpeg failed: {result.stderr.decode('utf-8', errors='replace').strip()}")
+    return result.stdout
+
+
+def gtts_clip(language, text):
+    from gtts import gTTS
+    buffer = io.BytesIO()
+    gTTS(text=text, lang=language, slow=False).write_to_fp(buffer)
+    return encode_webm(['-f', 'mp3', '-i', 'pipe:0'], buffer.getvalue())
+
+
+def synthetic_clip(rng):
+    seconds = rng.uniform(2, 8)
+    t = np.arange(int(seconds * 16000)) / 16000
+    pitch = 120 + 60 * np.sin(2 * np.pi * 0.7 * t) + rng.uniform(0, 80)
+    syllables = (np.sin(2 * np.pi * rng.uniform(3, 5) * t) > -0.2).astype(np.float32)
+    wave = 0.3 * np.sin(2 * np.pi * np.cumsum(pitch) / 16000) * syllables
+    return encode_webm(['-f', 'f32le', '-ar', '16000', '-ac', '1', '-i', 'pipe:0'], wave.astype(np.float32).tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=("gtts", "synthetic"), default="gtts")
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "audio"))
+    parser.add_argument("--count", type=int, default=len(QUESTIONS))
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    rng = np.random.default_rng(0)
+    for index in range(args.count):
+        language, text = QUESTIONS[index % len(QUESTIONS)]
+        if args.source == "gtts":
+            data = gtts_clip(language, text)
+            name = f"{index:02d}_{language}.webm"
+        else:
+            data = synthetic_clip(rng)
+            name = f"{index:02d}_synthetic.webm"
+        with open(os.path.join(args.out, name), 'wb') as f:
+            f.write(data)
+        print(f"{name}: {len(data)} bytes")
+    print(f"{args.count} clips written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""
+Percentile helper shared by the benchmark scripts, so every report computes
+p50/p95/p99 the same way.
+"""
+
+import math
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (0.0 when it is empty)."""
+    if not sorted_values:
+        return 0.0
+    # Nearest rank is ceil(q/100 * n); multiplying first keeps e.g. 95 * 20 / 100 exact
+    rank = max(1, math.ceil(q * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
@@ -0,0 +1,161 @@
+"""
+Chat Context Module for تبيّن Chatbot
+Builds the bounded multi-turn history sent to Gemini: the latest turns that
+fit a token budget, preceded by a rolling summary of older turns. Summaries
+are updated in the background after a turn, so they never add latency to
+the answer they follow.
+"""
+
+import os
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from database import db, ChatMessage, ConversationSummary
+from gemini_service import estimate_tokens, summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "ملخص المحادثة السابقة:\n"
+SUMMARY_ACK = "حسناً، سأراعي ذلك في إجاباتي."
+
+
+class ChatContext:
+    """
+    Selects the history for a conversation turn.
+
+    The messages not yet covered by the summary are kept verbatim, newest
+    first, until token_budget (estimated locally) is used up. Once
+    summary_batch messages older than the last recent_messages are not yet
+    covered by the summary, they are folded into it by a background Gemini
+    call and stored in ConversationSummary, where every later turn reuses it.
+    Between summaries up to recent_messages + summary_batch - 1 messages are
+    therefore sent verbatim, so none falls between summary and window.
+    """
+
+    def __init__(self, store, enabled: bool, token_budget: int, recent_messages: int, summary_batch: int):
+        self.store = store
+        self.enabled = enabled
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.summary_batch = summary_batch
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-summary")
+        self._lock = threading.Lock()
+        self._summarizing = set()
+
+        self.summaries_written = 0
+
+    @classmethod
+    def from_env(cls, store) -> "ChatContext":
+        """Build a context manager configured from GEMINI_HISTORY_* environment variables."""
+        return cls(
+            store,
+            enabled=os.getenv("GEMINI_MULTI_TURN", "1") == "1",
+            token_budget=int(os.getenv("GEMINI_HISTORY_TOKEN_BUDGET", "1500")),
+            recent_messages=int(os.getenv("GEMINI_HISTORY_MESSAGES", "8")),
+            summary_batch=int(os.getenv("GEMINI_SUMMARY_BATCH", "6"))
+        )
+
+    def history_for(self, conversation_id: str) -> List[Dict[str, str]]:
+        """
+        Return the history to send before the next user message (call it
+        before storing that message). Empty when multi-turn mode is off.
+        """
+        if not self.enabled:
+            return []
+
+        summary = db.session.get(ConversationSummary, conversation_id)
+        budget = self.token_budget
+        history = []
+        if summary:
+            budget -= estimate_tokens(summary.summary)
+
+        # Everything after the summary, newest first, until the budget is spent
+        window = self.store.get_window(
+            conversation_id,
+            self.recent_messages + self.summary_batch - 1,
+            after_id=summary.last_message_id if summary else 0
+        )
+        for message in reversed(window):
+            cost = estimate_tokens(message['content'])
+            if cost > budget:
+                break
+            budget -= cost
+            history.insert(0, message)
+
+        if summary:
+            history = [
+                {'role': 'user', 'content': SUMMARY_PREFIX + summary.summary},
+                {'role': 'bot', 'content': SUMMARY_ACK}
+            ] + history
+
+        logger.info(f"Chat context: {len(history)} messages, ~{self.token_budget - budget} tokens "
+                    f"(summary={'yes' if summary else 'no'})")
+        return history
+
+    def after_turn(self, conversation_id: str) -> None:
+        """Schedule a background summary update for the conversation if one is due."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if conversation_id in self._summarizing:
+                return
+            self._summarizing.add(conversation_id)
+        self._executor.submit(self._update_summary, conversation_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'summaries_written': self.summaries_written}
+
+    def _update_summary(self, conversation_id: str) -> None:
+        try:
+            with self.store.app.app_context():
+                self._summarize(conversation_id)
+        except Exception as e:
+            logger.error(f"Chat summary update failed: {e}")
+        finally:
+            with self._lock:
+                self._summarizing.discard(conversation_id)
+
+    def _summarize(self, conversation_id: str) -> None:
+        summary = db.session.get(ConversationSummary, conversation_id)
+        last_id = summary.last_message_id if summary else 0
+        unsummarized = self.store.count_messages(conversation_id, after_id=last_id)
+        if unsummarized - self.recent_messages < self.summary_batch:
+            return
+
+        # Write buffered messages so the query below sees the whole conversation
+        self.store.flush()
+        rows = (
+            ChatMessage.query
+            .with_entities(ChatMessage.id, ChatMessage.role, ChatMessage.content)
+            .filter(ChatMessage.conversation_id == conversation_id, ChatMessage.id > last_id)
+            .order_by(ChatMessage.id)
+            .all()
+        )
+        older = rows[:max(0, len(rows) - self.recent_messages)]
+        if len(older) < self.summary_batch:
+            return
+
+        new_summary = summarize_conversation(
+            summary.summary if summary else None,
+            [{'role': role, 'content': content} for _, role, content in older]
+        )
+        if not new_summary:
+            return
+
+        if summary:
+            summary.summary = new_summary
+            summary.last_message_id = older[-1][0]
+        else:
+            db.session.add(ConversationSummary(
+                conversation_id=conversation_id,
+                summary=new_summary,
+                last_message_id=older[-1][0]
+            ))
+        db.session.commit()
+        with self._lock:
+            self.summaries_written += 1
+        logger.info(f"Conversation {conversation_id} summary now covers messages up to {older[-1][0]}")
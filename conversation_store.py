@@ -0,0 +1,289 @@
+"""
+Conversation Store Module for تبيّن Chatbot
+Server-side chat history in the application database. The session cookie
+only carries a conversation id; messages are buffered in memory and written
+in batches by a background flusher thread.
+"""
+
+import os
+import uuid
+import atexit
+import threading
+import logging
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from database import db, Conversation, ChatMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """
+    Buffers new conversations and messages and flushes them with bulk
+    INSERTs once flush_size messages are waiting or every flush_interval
+    seconds. Reads merge the buffer with the database, so a conversation
+    always sees its own unflushed messages. At most max_buffered conversations
+    and max_buffered messages are held; beyond that (e.g. while the database
+    is unavailable) new rows are dropped and counted.
+    """
+
+    def __init__(self, app, window: int, flush_size: int, flush_interval: float,
+                 max_buffered: int = 10000):
+        self.app = app
+        self.window = window
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending_conversations: List[Dict] = []
+        self._pending_messages: List[Dict] = []
+        # Odd while a flush is moving rows from the buffer into the database
+        self._flush_generation = 0
+        self._pid = None
+
+        self.messages_written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    @classmethod
+    def from_env(cls, app) -> "ConversationStore":
+        """Build a store configured from CHAT_HISTORY_* environment variables."""
+        return cls(
+            app,
+            window=int(os.getenv("CHAT_HISTORY_WINDOW", "20")),
+            flush_size=int(os.getenv("CHAT_HISTORY_FLUSH_SIZE", "32")),
+            flush_interval=float(os.getenv("CHAT_HISTORY_FLUSH_INTERVAL", "1.0")),
+            max_buffered=int(os.getenv("CHAT_HISTORY_MAX_BUFFERED", "10000"))
+        )
+
+    def new_conversation(self, user_id: Optional[int] = None) -> str:
+        """Create a conversation and return its id."""
+        conversation_id = uuid.uuid4().hex
+        with self._lock:
+            if len(self._pending_conversations) >= self.max_buffered:
+                self.dropped += 1
+                return conversation_id
+            self._pending_conversations.append({
+                'id': conversation_id,
+                'user_id': user_id,
+                'created_at': datetime.utcnow()
+            })
+        self._ensure_flusher()
+        return conversation_id
+
+    def belongs_to(self, conversation_id: str, user_id: Optional[int]) -> bool:
+        """Whether the conversation exists and was started by user_id (None = a guest)."""
+        with self._lock:
+            for conversation in self._pending_conversations:
+                if conversation['id'] == conversation_id:
+                    return conversation['user_id'] == user_id
+        query = Conversation.query.with_entities(Conversation.user_id).filter_by(id=conversation_id)
+        row = query.first()
+        if row is None:
+            # It may be in a flush that is still committing; wait for it and look again
+            with self._flush_lock:
+                pass
+            row = query.first()
+        return row is not None and row.user_id == user_id
+
+    def append(self, conversation_id: str, role: str, content: str) -> bool:
+        """
+        Queue a message for the next batched write.
+
+        Returns:
+            False if the buffer is full and the message was dropped
+        """
+        with self._lock:
+            if len(self._pending_messages) >= self.max_buffered:
+                self.dropped += 1
+                return False
+            self._pending_messages.append({
+                'conversation_id': conversation_id,
+                'role': role,
+                'content': content,
+                'created_at': datetime.utcnow()
+            })
+            full = len(self._pending_messages) >= self.flush_size
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+        return True
+
+    def get_window(self, conversation_id: str, limit: Optional[int] = None,
+                   after_id: int = 0) -> List[Dict[str, str]]:
+        """
+        Return the latest `limit` messages of a conversation, oldest first,
+        leaving out stored messages with an id up to after_id.
+        """
+        limit = limit or self.window
+
+        def read_stored(pending: List[Dict]) -> List[Tuple[str, str]]:
+            if len(pending) >= limit:
+                return []
+            return (
+                ChatMessage.query
+                .with_entities(ChatMessage.role, ChatMessage.content)
+                .filter(ChatMessage.conversation_id == conversation_id, ChatMessage.id > after_id)
+                .order_by(ChatMessage.id.desc())
+                .limit(limit - len(pending))
+                .all()
+            )
+
+        pending, rows = self._read(conversation_id, read_stored)
+        pending = [{'role': message['role'], 'content': message['content']} for message in pending]
+        if len(pending) >= limit:
+            return pending[-limit:]
+        return [{'role': role, 'content': content} for role, content in reversed(rows)] + pending
+
+    def count_messages(self, conversation_id: str, after_id: int = 0) -> int:
+        """Count a conversation's buffered messages plus its stored ones with an id above after_id."""
+        def read_stored(pending: List[Dict]) -> int:
+            return (
+                ChatMessage.query
+                .filter(ChatMessage.conversation_id == conversation_id, ChatMessage.id > after_id)
+                .count()
+            )
+
+        pending, stored = self._read(conversation_id, read_stored)
+        return len(pending) + stored
+
+    def _read(self, conversation_id: str,
+              read_stored: Callable[[List[Dict]], object]) -> Tuple[List[Dict], object]:
+        """
+        Return a conversation's buffered messages and read_stored(buffered)
+        as one consistent view. The query runs without holding either lock; if
+        a flush moved rows into the database meanwhile (some messages would be
+        counted twice or missed), wait for it to finish and read again.
+        """
+        while True:
+            with self._lock:
+                generation = self._flush_generation
+                pending = [message for message in self._pending_messages
+                           if message['conversation_id'] == conversation_id]
+            if generation % 2 == 0:
+                stored = read_stored(pending)
+                with self._lock:
+                    if self._flush_generation == generation:
+                        return pending, stored
+            with self._flush_lock:
+                pass
+
+    def flush(self) -> None:
+        """Write all buffered conversations and messages."""
+        with self._flush_lock:
+            with self._lock:
+                conversations, self._pending_conversations = self._pending_conversations, []
+                messages, self._pending_messages = self._pending_messages, []
+                if not conversations and not messages:
+                    return
+                self._flush_generation += 1
+
+            try:
+                with self.app.app_context():
+                    if conversations:
+                        db.session.execute(insert(Conversation), conversations)
+                    if messages:
+                        db.session.execute(insert(ChatMessage), messages)
+                    db.session.commit()
+            except Exception as e:
+                logger.error(f"Chat history flush failed: {e}")
+                with self._lock:
+                    self.failed_flushes += 1
+                self._flush_one_by_one(conversations, messages)
+            else:
+                with self._lock:
+                    self.flushes += 1
+                    self.messages_written += len(messages)
+            finally:
+                with self._lock:
+                    self._flush_generation += 1
+
+    def _flush_one_by_one(self, conversations: List[Dict], messages: List[Dict]) -> None:
+        """
+        Retry a failed batch row by row. Rows the database rejects (e.g. a
+        conversation whose user was deleted before it was written, and that
+        conversation's messages) are discarded, so they cannot block everyone
+        else's history; if the database itself is unavailable, the rest are
+        requeued for the next attempt.
+        """
+        rows = [(Conversation, row) for row in conversations] + [(ChatMessage, row) for row in messages]
+        written = rejected = 0
+        rejected_conversations = set()
+        with self.app.app_context():
+            for index, (model, row) in enumerate(rows):
+                if model is ChatMessage and row['conversation_id'] in rejected_conversations:
+                    rejected += 1
+                    continue
+                try:
+                    db.session.execute(insert(model), [row])
+                    db.session.commit()
+                    if model is ChatMessage:
+                        written += 1
+                    continue
+                except DBAPIError as e:
+                    db.session.rollback()
+                    if e.connection_invalidated or isinstance(e, OperationalError):
+                        logger.error(f"Chat history unavailable, requeueing {len(rows) - index} rows: {e}")
+                        self._requeue(rows[index:])
+                        break
+                    logger.error(f"Discarding {model.__name__} row the database rejected: {e}")
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Discarding {model.__name__} row that could not be written: {e}")
+                rejected += 1
+                if model is Conversation:
+                    rejected_conversations.add(row['id'])
+        with self._lock:
+            self.messages_written += written
+            self.rejected += rejected
+
+    def _requeue(self, rows: List[Tuple[type, Dict]]) -> None:
+        conversations = [row for model, row in rows if model is Conversation]
+        messages = [row for model, row in rows if model is ChatMessage]
+        with self._lock:
+            # Keep the oldest rows for the next attempt, within the buffer limit
+            requeued_conversations = (conversations + self._pending_conversations)[:self.max_buffered]
+            requeued_messages = (messages + self._pending_messages)[:self.max_buffered]
+            self.dropped += (
+                len(conversations) + len(self._pending_conversations) - len(requeued_conversations)
+                + len(messages) + len(self._pending_messages) - len(requeued_messages)
+            )
+            self._pending_conversations = requeued_conversations
+            self._pending_messages = requeued_messages
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'buffered_messages': len(self._pending_messages),
+                'messages_written': self.messages_written,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes
+            }
+
+    def _ensure_flusher(self) -> None:
+        # (Re)start the flusher in each process; threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name="chat-history-flusher", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
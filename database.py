@@ -1,9 +1,20 @@
+import os
+import sqlite3
+import logging
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 
+logger = logging.getLogger(__name__)
+
 db = SQLAlchemy()
 
+# Relative SQLite paths are resolved against the Flask instance folder
+DEFAULT_DATABASE_URL = 'sqlite:///users.db'
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
@@ -16,6 +27,107 @@ class User(UserMixin, db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+class Conversation(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, stored in the session cookie
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ChatMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.String(32), db.ForeignKey('conversation.id', ondelete='CASCADE'), nullable=False)
+    role = db.Column(db.String(16), nullable=False)  # 'user' or 'bot'
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Windowed retrieval: latest N messages of one conversation
+        db.Index('ix_chat_message_conversation_id_id', 'conversation_id', 'id'),
+    )
+
+class ConversationSummary(db.Model):
+    # Rolling summary of the turns that no longer fit the Gemini context window
+    conversation_id = db.Column(db.String(32), db.ForeignKey('conversation.id', ondelete='CASCADE'), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    last_message_id = db.Column(db.Integer, nullable=False)  # Newest ChatMessage.id folded into the summary
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+# Write-behind event tables (filled in batches by event_log.EventLog). They
+# reference conversations by id only: a conversation may still be buffered
+# in ConversationStore when its events are written.
+
+class AnswerRating(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    conversation_id = db.Column(db.String(32), nullable=True, index=True)
+    rating = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text, nullable=True)
+    question = db.Column(db.Text, nullable=True)
+    answer = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class StaffQuestion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True, index=True)
+    subject = db.Column(db.String(200), nullable=False)
+    details = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class ChatEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.String(32), nullable=True, index=True)
+    endpoint = db.Column(db.String(32), nullable=False)  # 'chat', 'chat_stream' or 'voice'
+    latency_ms = db.Column(db.Float, nullable=False)
+    question_chars = db.Column(db.Integer, nullable=False)
+    answer_chars = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+def configure_database(app):
+    """
+    Set the database URI and engine options from the environment.
+
+    DATABASE_URL selects the database (SQLite by default; any SQLAlchemy URL,
+    e.g. postgresql://..., for deployments with several hosts). SQLite
+    connections get WAL journaling and the pragmas below on connect; server
+    databases get a sized connection pool.
+    """
+    uri = os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)
+    if uri.startswith("postgres://"):
+        # Heroku-style URLs; SQLAlchemy only accepts the postgresql:// scheme
+        uri = "postgresql://" + uri[len("postgres://"):]
+
+    if uri.startswith("sqlite"):
+        options = {'connect_args': {'timeout': _sqlite_busy_timeout_ms() / 1000}}
+    else:
+        options = {
+            'pool_size': int(os.getenv("DB_POOL_SIZE", "10")),
+            'max_overflow': int(os.getenv("DB_MAX_OVERFLOW", "20")),
+            'pool_recycle': int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            'pool_timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            'pool_pre_ping': True
+        }
+
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    logger.info(f"Database: {uri.split('://', 1)[0]} with {options}")
+
+def _sqlite_busy_timeout_ms():
+    return int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+@event.listens_for(Engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer; NORMAL only fsyncs at checkpoints
+    cursor.execute(f"PRAGMA journal_mode={os.getenv('SQLITE_JOURNAL_MODE', 'WAL')}")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={_sqlite_busy_timeout_ms()}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    # SQLite ignores foreign keys (and their ON DELETE actions) unless asked per connection
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 def init_db(app):
     with app.app_context():
         db.create_all()
@@ -0,0 +1,172 @@
+"""
+Event Log Module for تبيّن Chatbot
+Write-behind storage for ratings, staff questions and chat telemetry. Request
+handlers only append to an in-memory buffer; a background flusher thread
+writes the buffer with bulk INSERTs, so recording an event never waits on a
+database commit.
+"""
+
+import os
+import atexit
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+from database import db
+
+logger = logging.getLogger(__name__)
+
+
+class EventLog:
+    """
+    Bounded buffer of (model, row) events flushed once flush_size events are
+    waiting or every flush_interval seconds. When max_events are already
+    buffered (e.g. the database is unavailable), new events are dropped and
+    counted instead of growing memory or blocking the request.
+    """
+
+    def __init__(self, app, max_events: int, flush_size: int, flush_interval: float):
+        self.app = app
+        self.max_events = max_events
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: List[Tuple[type, Dict]] = []
+        self._pid = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    @classmethod
+    def from_env(cls, app) -> "EventLog":
+        """Build an event log configured from EVENT_LOG_* environment variables."""
+        return cls(
+            app,
+            max_events=int(os.getenv("EVENT_LOG_MAX_EVENTS", "10000")),
+            flush_size=int(os.getenv("EVENT_LOG_FLUSH_SIZE", "100")),
+            flush_interval=float(os.getenv("EVENT_LOG_FLUSH_INTERVAL", "2.0"))
+        )
+
+    def record(self, model, **fields) -> bool:
+        """
+        Queue a row for model (a db.Model class).
+
+        Returns:
+            False if the buffer is full and the event was dropped
+        """
+        fields.setdefault('created_at', datetime.utcnow())
+        with self._lock:
+            if len(self._pending) >= self.max_events:
+                self.dropped += 1
+                return False
+            self._pending.append((model, fields))
+            self.recorded += 1
+            full = len(self._pending) >= self.flush_size
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self) -> None:
+        """Write all buffered events, one bulk INSERT per table."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if not events:
+                return
+
+            rows_by_model: Dict[type, List[Dict]] = {}
+            for model, fields in events:
+                rows_by_model.setdefault(model, []).append(fields)
+
+            try:
+                with self.app.app_context():
+                    for model, rows in rows_by_model.items():
+                        db.session.execute(insert(model), rows)
+                    db.session.commit()
+            except Exception as e:
+                logger.error(f"Event log flush failed: {e}")
+                with self._lock:
+                    self.failed_flushes += 1
+                self._flush_one_by_one(events)
+                return
+
+            with self._lock:
+                self.flushes += 1
+                self.written += len(events)
+
+    def _flush_one_by_one(self, events: List[Tuple[type, Dict]]) -> None:
+        """
+        Retry a failed batch row by row. Rows the database rejects are
+        discarded, so one bad event cannot block the log; if the database
+        itself is unavailable, the rest are requeued for the next attempt.
+        """
+        written = rejected = 0
+        with self.app.app_context():
+            for index, (model, fields) in enumerate(events):
+                try:
+                    db.session.execute(insert(model), [fields])
+                    db.session.commit()
+                    written += 1
+                except DBAPIError as e:
+                    db.session.rollback()
+                    if e.connection_invalidated or isinstance(e, OperationalError):
+                        logger.error(f"Event log unavailable, requeueing {len(events) - index} events: {e}")
+                        self._requeue(events[index:])
+                        break
+                    logger.error(f"Discarding {model.__name__} event the database rejected: {e}")
+                    rejected += 1
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Discarding {model.__name__} event that could not be written: {e}")
+                    rejected += 1
+        with self._lock:
+            self.written += written
+            self.rejected += rejected
+
+    def _requeue(self, events: List[Tuple[type, Dict]]) -> None:
+        with self._lock:
+            # Keep the oldest events for the next attempt, within the buffer limit
+            requeued = (events + self._pending)[:self.max_events]
+            self.dropped += len(events) + len(self._pending) - len(requeued)
+            self._pending = requeued
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'buffered_events': len(self._pending),
+                'recorded': self.recorded,
+                'written': self.written,
+                'dropped': self.dropped,
+                'rejected': self.rejected,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes
+            }
+
+    def _ensure_flusher(self) -> None:
+        # (Re)start the flusher in each process; threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name="event-log-flusher", daemon=True).start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self) -> None:
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
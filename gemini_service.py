@@ -0,0 +1,323 @@
+"""
+Gemini Service Module for تبيّن Chatbot
+Keeps a process-wide registry of configured Gemini models so the API client,
+its transport and the system instruction are created once and reused by
+every request.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import logging
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import google.generativeai as genai
+
+from answer_cache import AnswerCache
+from legal_index import LegalIndex, format_passages
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-flash-latest")
+GEMINI_EMBEDDING_MODEL = os.getenv("GEMINI_EMBEDDING_MODEL", "models/text-embedding-004")
+
+SYSTEM_CONTEXT = (
+    "أنت 'تبيّن'، مساعد قانوني ذكي ومحترف للمواطنين في السعودية. "
+    "\n\n"
+    "⚡ **قواعد الرد (مهم جداً):**\n"
+    "1. **إجابات واضحة ومتوازنة (4–6 جمل كحد أقصى)\n"
+    "2. **تجنب التفاصيل الإضافية تماماً** - اركز على الإجابة المباشرة فقط\n"
+    "3. **استخدم التنسيق البسيط**:\n"
+    "   - نقطة أو اثنين للإجابة الموجزة\n"
+    "   - عنوان واحد فقط إن لزم الحال\n"
+    "4. **ابدأ بالمعلومة الأهم مباشرة** - بدون مقدمات\n"
+    "\n"
+    "💰 **الغرامات والعقوبات:**\n"
+    "- المبلغ + السبب فقط\n"
+    "- مثال: 'الغرامة: 300 ريال لاستخدام الجوال أثناء القيادة'\n"
+    "\n"
+    "✅ **معايير عامة:**\n"
+    "- معلومات سعودية فقط\n"
+    "- بدون استشارات شخصية\n"
+    "- مهذب ومباشر\n"
+    "- رموز تعبيرية قليلة جداً\n"
+)
+
+GEMINI_ERROR_MESSAGE = "عذراً، حدث خطأ أثناء الاتصال بالخادم. يرجى المحاولة مرة أخرى لاحقاً."
+
+
+class GeminiStreamError(Exception):
+    """
+    Raised by the streaming calls when Gemini fails, possibly after some
+    chunks were already yielded; partial is the text yielded so far.
+    """
+
+    def __init__(self, partial: str):
+        super().__init__("Gemini stream failed")
+        self.partial = partial
+
+SUMMARY_INSTRUCTION = (
+    "You maintain a running summary of a conversation between a user and 'تبيّن', "
+    "a legal assistant for citizens in Saudi Arabia. Merge the previous summary with "
+    "the new turns into one concise summary (at most 120 words) written in the "
+    "conversation's language. Keep the user's situation, the questions asked, and any "
+    "facts, amounts or procedures already given. Reply with the summary only."
+)
+
+# Model registry - one GenerativeModel per (model name, system instruction) for the whole process
+_models: Dict[Tuple[str, str], genai.GenerativeModel] = {}
+_models_lock = threading.Lock()
+
+# Conversation history as stored by conversation_store: [{'role': 'user'|'bot', 'content': str}]
+History = List[Dict[str, str]]
+
+
+def embed_text(text: str) -> List[float]:
+    """Return the Gemini embedding vector for text (used for semantic cache lookups)."""
+    result = genai.embed_content(model=GEMINI_EMBEDDING_MODEL, content=text, task_type="semantic_similarity")
+    return result['embedding']
+
+
+# Answers to repeated questions are served from here instead of the API
+answer_cache = AnswerCache.from_env(embed_fn=embed_text)
+
+# Local retrieval over regulations and fine schedules (None until ingest_corpus.py has run)
+legal_index = LegalIndex.from_env()
+
+
+def init_gemini(api_key: Optional[str], transport: Optional[str] = None) -> None:
+    """
+    Configure the Gemini API client and create the default model.
+
+    The underlying API client (gRPC channel or REST session) is created once
+    by the SDK and reused by the cached model, so connections stay alive
+    between requests instead of being re-established per call.
+
+    Args:
+        api_key: Gemini API key
+        transport: 'grpc' (default) or 'rest'; falls back to GEMINI_TRANSPORT
+    """
+    transport = transport or os.getenv("GEMINI_TRANSPORT") or None
+    genai.configure(api_key=api_key, transport=transport)
+    get_model()
+    logger.info(f"Gemini model registry initialized ({GEMINI_MODEL_NAME}, transport={transport or 'grpc'})")
+
+
+def get_model(model_name: str = GEMINI_MODEL_NAME, system_instruction: str = SYSTEM_CONTEXT) -> genai.GenerativeModel:
+    """Return the process-wide GenerativeModel for model_name, creating it on first use."""
+    key = (model_name, system_instruction)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+                _models[key] = model
+    return model
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~3 characters per token for Arabic and English text)."""
+    return len(text) // 3 + 1
+
+
+def _to_contents(history: Optional[History]) -> List[Dict]:
+    """
+    Convert stored history to Gemini chat contents. Consecutive messages of
+    the same role are merged and the history starts with a user turn, as
+    multi-turn requests must alternate between user and model.
+    """
+    contents = []
+    for message in history or []:
+        role = 'model' if message['role'] == 'bot' else 'user'
+        if not contents and role == 'model':
+            continue
+        if contents and contents[-1]['role'] == role:
+            contents[-1]['parts'][0] += "\n\n" + message['content']
+        else:
+            contents.append({'role': role, 'parts': [message['content']]})
+    # The new prompt is the next user turn
+    if contents and contents[-1]['role'] == 'user':
+        contents.pop()
+    return contents
+
+
+def _log_usage(kind: str, response, history_messages: int) -> None:
+    """Log the token counts Gemini reports for a request."""
+    usage = getattr(response, 'usage_metadata', None)
+    if not usage:
+        return
+    call = kind.replace(' ', '_')
+    metrics.inc('llm_tokens_total', usage.prompt_token_count or 0, type='prompt', call=call)
+    metrics.inc('llm_tokens_total', usage.candidates_token_count or 0, type='response', call=call)
+    logger.info(
+        f"Gemini {kind}: prompt_tokens={usage.prompt_token_count} "
+        f"response_tokens={usage.candidates_token_count} total_tokens={usage.total_token_count} "
+        f"history_messages={history_messages}"
+    )
+
+
+def ground_prompt(prompt: str) -> Tuple[Optional[str], str]:
+    """
+    Look the question up in the local legal index.
+
+    Returns:
+        Tuple of (direct_answer, prompt_to_send). A direct answer means the
+        index matched a fine-schedule row confidently and Gemini is skipped;
+        otherwise the top passages are prepended to the prompt.
+    """
+    if legal_index is None:
+        return None, prompt
+    try:
+        with metrics.span('legal_index'):
+            direct_answer, passages = legal_index.retrieve(prompt)
+    except Exception as e:
+        logger.error(f"Legal index lookup failed: {e}")
+        return None, prompt
+    if direct_answer:
+        metrics.inc('legal_index_lookups_total', outcome='direct')
+        logger.info("Answered from the legal index without calling Gemini")
+        return direct_answer, prompt
+    if passages:
+        metrics.inc('legal_index_lookups_total', outcome='grounded')
+        return None, f"{format_passages(passages)}\n\nالسؤال: {prompt}"
+    metrics.inc('legal_index_lookups_total', outcome='none')
+    return None, prompt
+
+
+def ask_gemini(prompt: str, history: Optional[History] = None) -> str:
+    """
+    Sends a prompt to Gemini API and returns the text response.
+    With history, the prompt is sent as the next turn of a ChatSession.
+    Repeated first-turn questions are answered from the answer cache;
+    follow-ups depend on their context and are never cached.
+    """
+    contents = _to_contents(history)
+    if not contents:
+        cached = answer_cache.get(prompt)
+        if cached is not None:
+            return cached
+
+    direct_answer, grounded_prompt = ground_prompt(prompt)
+    if direct_answer:
+        return direct_answer
+
+    try:
+        with metrics.span('gemini'):
+            response = get_model().start_chat(history=contents).send_message(grounded_prompt)
+            answer = response.text
+        _log_usage('chat', response, len(contents))
+    except Exception as e:
+        logger.error(f"Error calling Gemini API: {e}")
+        return GEMINI_ERROR_MESSAGE
+
+    if not contents:
+        answer_cache.put(prompt, answer)
+    return answer
+
+
+def ask_gemini_stream(prompt: str, history: Optional[History] = None) -> Iterator[str]:
+    """
+    Sends a prompt to Gemini API and yields the text response chunk by chunk
+    as it is generated. A cached answer is yielded as a single chunk.
+    
+    Raises:
+        GeminiStreamError: if the call fails; the error text is never
+        yielded, so the chunks joined are always (part of) a real answer
+    """
+    contents = _to_contents(history)
+    if not contents:
+        cached = answer_cache.get(prompt)
+        if cached is not None:
+            yield cached
+            return
+
+    direct_answer, grounded_prompt = ground_prompt(prompt)
+    if direct_answer:
+        yield direct_answer
+        return
+
+    chunks = []
+    started = time.perf_counter()
+    try:
+        response = get_model().start_chat(history=contents).send_message(grounded_prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                if not chunks:
+                    metrics.observe_stage('gemini_first_chunk', time.perf_counter() - started)
+                chunks.append(chunk.text)
+                yield chunk.text
+        metrics.observe_stage('gemini_stream', time.perf_counter() - started)
+        _log_usage('chat stream', response, len(contents))
+    except Exception as e:
+        metrics.inc('stage_errors_total', stage='gemini_stream')
+        logger.error(f"Error streaming from Gemini API: {e}")
+        raise GeminiStreamError(''.join(chunks)) from e
+
+    if not contents:
+        answer_cache.put(prompt, ''.join(chunks))
+
+
+async def ask_gemini_stream_async(prompt: str, history: Optional[History] = None) -> AsyncIterator[str]:
+    """
+    Async variant of ask_gemini_stream for the voice pipeline. Awaits the
+    Gemini stream without blocking a thread; cache lookups (which may call
+    the embedding API) run in the loop's executor. Raises GeminiStreamError
+    like ask_gemini_stream.
+    """
+    loop = asyncio.get_running_loop()
+    contents = _to_contents(history)
+    if not contents:
+        cached = await loop.run_in_executor(None, answer_cache.get, prompt)
+        if cached is not None:
+            yield cached
+            return
+
+    direct_answer, grounded_prompt = ground_prompt(prompt)
+    if direct_answer:
+        yield direct_answer
+        return
+
+    chunks = []
+    started = time.perf_counter()
+    try:
+        response = await get_model().start_chat(history=contents).send_message_async(grounded_prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                if not chunks:
+                    metrics.observe_stage('gemini_first_chunk', time.perf_counter() - started)
+                chunks.append(chunk.text)
+                yield chunk.text
+        metrics.observe_stage('gemini_stream', time.perf_counter() - started)
+        _log_usage('chat stream', response, len(contents))
+    except Exception as e:
+        metrics.inc('stage_errors_total', stage='gemini_stream')
+        logger.error(f"Error streaming from Gemini API: {e}")
+        raise GeminiStreamError(''.join(chunks)) from e
+
+    if not contents:
+        await loop.run_in_executor(None, answer_cache.put, prompt, ''.join(chunks))
+
+
+def summarize_conversation(previous_summary: Optional[str], messages: History) -> Optional[str]:
+    """
+    Fold older turns into the rolling conversation summary.
+
+    Returns:
+        The new summary, or None if the Gemini call failed
+    """
+    transcript = "\n".join(
+        f"{'User' if message['role'] == 'user' else 'Assistant'}: {message['content']}"
+        for message in messages
+    )
+    prompt = f"Previous summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}"
+    try:
+        with metrics.span('gemini_summary'):
+            response = get_model(system_instruction=SUMMARY_INSTRUCTION).generate_content(prompt)
+        _log_usage('summary', response, len(messages))
+        return response.text.strip()
+    except Exception as e:
+        logger.error(f"Error summarizing conversation: {e}")
+        return None
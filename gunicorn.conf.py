@@ -0,0 +1,73 @@
+"""
+Gunicorn configuration for تبيّن.
+
+    gunicorn app:app -c gunicorn.conf.py
+
+Set WHISPER_PRELOAD=1 to load and warm the Whisper model before a worker
+reports ready on /healthz/ready. Whisper is always loaded in the worker,
+after fork: CTranslate2 models and the threads that load them are not
+fork-safe, so without a pool every worker loads its own copy.
+
+GUNICORN_PRELOAD=1 imports the application once in the master instead of
+in each worker, so workers boot faster and share import-time data such as
+the legal index copy-on-write. This is safe for the app as it stands:
+importing it loads no Whisper model, opens no Gemini connection and starts
+no threads (flushers, batcher, pipeline loop and warm-up start in the
+worker on first use), and post_fork discards the database connection the
+master opened. Leave it off if import-time work that is not fork-safe is
+added, and note that with it a HUP reload no longer picks up code changes.
+
+With WHISPER_POOL_WORKERS > 0 the master starts one transcription service
+for the host (python transcription_pool.py) before forking the workers, and
+every worker sends its transcriptions there: the host runs
+WHISPER_POOL_WORKERS Whisper processes however many web workers there are.
+Point WHISPER_POOL_ADDRESS at an already running service to skip this.
+"""
+
+import os
+import sys
+import secrets
+import tempfile
+import subprocess
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+_transcription_service = None
+
+
+def on_starting(server):
+    global _transcription_service
+    if int(os.getenv("WHISPER_POOL_WORKERS", "0")) <= 0 or os.getenv("WHISPER_POOL_ADDRESS"):
+        return
+    # Workers inherit the address and key from the master's environment
+    os.environ["WHISPER_POOL_ADDRESS"] = os.path.join(tempfile.gettempdir(), f"tabyin-whisper-{os.getpid()}.sock")
+    os.environ.setdefault("WHISPER_POOL_AUTHKEY", secrets.token_hex(16))
+    service_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "transcription_pool.py")
+    _transcription_service = subprocess.Popen([sys.executable, service_script])
+    server.log.info(f"Started transcription service (pid {_transcription_service.pid}) "
+                    f"on {os.environ['WHISPER_POOL_ADDRESS']}")
+
+
+def on_exit(server):
+    if _transcription_service and _transcription_service.poll() is None:
+        _transcription_service.terminate()
+        try:
+            _transcription_service.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _transcription_service.kill()
+
+
+def post_fork(server, worker):
+    from app import app, start_voice_warm_up
+    if preload_app:
+        # The master's pooled connections must not be shared with the workers
+        from database import db
+        with app.app_context():
+            db.engine.dispose(close=False)
+    # Start the warm-up as soon as the worker exists, before the first request
+    start_voice_warm_up()
@@ -0,0 +1,154 @@
+"""
+Identity Cache Module for تبيّن Chatbot
+Resolves the Flask-Login user of a request without a database query on every
+request: lightweight user records are kept in a per-process LRU + TTL cache
+and, optionally, as a snapshot in the signed session cookie.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from flask import session
+from flask_login import UserMixin
+
+from database import User
+
+logger = logging.getLogger(__name__)
+
+_SNAPSHOT_KEY = 'identity'
+
+
+class CachedUser(UserMixin):
+    """Detached, read-only view of a User row (no password hash, no ORM state)."""
+
+    __slots__ = ('id', 'username', 'email')
+
+    def __init__(self, id: int, username: str, email: str):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def __repr__(self):
+        return f"<CachedUser {self.id} {self.username!r}>"
+
+
+class IdentityCache:
+    """
+    LRU + TTL cache of CachedUser records keyed by user id.
+
+    The cache is per process, so a change made through another worker is
+    seen here after at most ttl_seconds; changes made through this process
+    are applied at once via invalidate(). With session_snapshot_ttl > 0 the
+    record is also stored in the (signed) session and trusted for that many
+    seconds, so hot endpoints resolve the user from the cookie alone.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, session_snapshot_ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.session_snapshot_ttl = session_snapshot_ttl
+
+        self._entries: "OrderedDict[int, tuple[CachedUser, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.snapshot_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "IdentityCache":
+        """Build a cache configured from IDENTITY_CACHE_* environment variables."""
+        return cls(
+            max_entries=int(os.getenv("IDENTITY_CACHE_SIZE", "4096")),
+            ttl_seconds=float(os.getenv("IDENTITY_CACHE_TTL", "300")),
+            session_snapshot_ttl=float(os.getenv("IDENTITY_SESSION_SNAPSHOT_TTL", "0"))
+        )
+
+    def load_user(self, user_id: str) -> Optional[CachedUser]:
+        """Flask-Login user_loader: session snapshot, then cache, then database."""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        if self.session_snapshot_ttl > 0:
+            user = self._from_snapshot(user_id)
+            if user is not None:
+                return user
+
+        user = self.get(user_id)
+        if user is not None and self.session_snapshot_ttl > 0:
+            session[_SNAPSHOT_KEY] = [user.id, user.username, user.email, time.time()]
+        return user
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        """Return the cached record for user_id, querying the database on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = (
+            User.query
+            .with_entities(User.id, User.username, User.email)
+            .filter_by(id=user_id)
+            .first()
+        )
+        if row is None:
+            with self._lock:
+                self._entries.pop(user_id, None)
+            return None
+
+        user = CachedUser(*row)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[user_id] = (user, now)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id: int) -> None:
+        """Drop a user's record and the request's session snapshot (after the account changed)."""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+        self.clear_snapshot()
+        logger.info(f"Identity cache entry for user {user_id} invalidated")
+
+    def clear_snapshot(self) -> None:
+        """Remove the identity snapshot from the current session (logout, account changes)."""
+        session.pop(_SNAPSHOT_KEY, None)
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters and the current hit rate."""
+        with self._lock:
+            hits = self.hits + self.snapshot_hits
+            lookups = hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'snapshot_hits': self.snapshot_hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
+
+    def _from_snapshot(self, user_id: int) -> Optional[CachedUser]:
+        snapshot = session.get(_SNAPSHOT_KEY)
+        if not snapshot or snapshot[0] != user_id:
+            return None
+        if time.time() - snapshot[3] > self.session_snapshot_ttl:
+            return None
+        with self._lock:
+            self.snapshot_hits += 1
+        return CachedUser(*snapshot[:3])
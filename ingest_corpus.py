@@ -0,0 +1,109 @@
+"""
+Build the legal retrieval index from a local corpus directory.
+
+Supported files (searched recursively):
+    *.txt, *.md   Regulations and guides. Split on blank lines into passages
+                  of about --chunk-chars characters; markdown headings and
+                  paragraphs starting with 'المادة' start a new passage and are
+                  kept as its title.
+    *.csv         Fine schedules with the header columns
+                  violation,amount[,sector][,notes][,source]
+                  Each row becomes a record that can be answered directly.
+
+Usage:
+    python ingest_corpus.py corpus/ [--out data/legal_index] [--chunk-chars 600]
+"""
+
+import argparse
+import csv
+import logging
+import os
+import re
+from typing import Dict, Iterator, List
+
+from legal_index import build_index
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_text(text: str, source: str, chunk_chars: int) -> Iterator[Dict]:
+    title = ''
+    buffer: List[str] = []
+
+    def flush():
+        if buffer:
+            yield {'kind': 'passage', 'title': title, 'text': ' '.join(buffer), 'source': source}
+            buffer.clear()
+
+    for paragraph in re.split(r'\n\s*\n', text):
+        paragraph = ' '.join(paragraph.split())
+        if not paragraph:
+            continue
+        if paragraph.startswith('#'):
+            yield from flush()
+            title = paragraph.lstrip('#').strip()
+            continue
+        if paragraph.startswith('المادة'):
+            yield from flush()
+            title = paragraph[:80]
+        if buffer and sum(len(part) for part in buffer) + len(paragraph) > chunk_chars:
+            yield from flush()
+        buffer.append(paragraph)
+    yield from flush()
+
+
+def read_fine_schedule(path: str, source: str) -> Iterator[Dict]:
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for line_number, row in enumerate(csv.DictReader(f), 2):
+            violation = (row.get('violation') or '').strip()
+            amount = (row.get('amount') or '').strip()
+            if not violation or not amount:
+                logger.warning(f"{path}:{line_number}: missing violation or amount, skipped")
+                continue
+            sector = (row.get('sector') or '').strip()
+            yield {
+                'kind': 'fine',
+                'title': sector,
+                'text': f"غرامة {violation}: {amount} ريال",
+                'violation': violation,
+                'amount': amount,
+                'notes': (row.get('notes') or '').strip(),
+                'source': (row.get('source') or '').strip() or source
+            }
+
+
+def load_corpus(corpus_dir: str, chunk_chars: int) -> List[Dict]:
+    records = []
+    for root, _, files in os.walk(corpus_dir):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            source = os.path.relpath(path, corpus_dir)
+            extension = name.rsplit('.', 1)[-1].lower()
+            if extension in ('txt', 'md'):
+                with open(path, encoding='utf-8') as f:
+                    records.extend(chunk_text(f.read(), source, chunk_chars))
+            elif extension == 'csv':
+                records.extend(read_fine_schedule(path, source))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="directory with .txt/.md regulations and .csv fine schedules")
+    parser.add_argument("--out", default=os.getenv("LEGAL_INDEX_DIR", os.path.join("data", "legal_index")))
+    parser.add_argument("--chunk-chars", type=int, default=600)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    records = load_corpus(args.corpus, args.chunk_chars)
+    if not records:
+        raise SystemExit(f"No .txt, .md or .csv documents found in {args.corpus}")
+
+    fines = sum(1 for record in records if record['kind'] == 'fine')
+    print(f"{len(records) - fines} passages and {fines} fine-schedule rows from {args.corpus}")
+    build_index(records, args.out)
+    print(f"Index written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
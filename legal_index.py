@@ -0,0 +1,223 @@
+"""
+Legal Index Module for تبيّن Chatbot
+BM25 retrieval over a local corpus of regulations and fine schedules. The
+index is built by ingest_corpus.py and stored as .npy arrays that are
+memory-mapped at startup, so every worker process shares the same pages.
+
+High-confidence hits on fine-schedule rows are answered directly; other
+questions get the top passages as reference material in the Gemini prompt.
+"""
+
+import os
+import re
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from answer_cache import normalize_arabic
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+# Definite article and attached prepositions, stripped once from the front
+_PREFIXES = ('وال', 'بال', 'كال', 'فال', 'لل', 'ال')
+
+# Common Arabic/English function words (in normalized spelling)
+_STOPWORDS = {
+    'في', 'من', 'علي', 'عن', 'الي', 'ما', 'ماذا', 'هي', 'هو', 'كم', 'هل', 'او', 'و', 'ان', 'اذا',
+    'مع', 'هذا', 'هذه', 'ذلك', 'التي', 'الذي', 'لا', 'لم', 'لن', 'قد', 'كل', 'بعد', 'قبل', 'عند',
+    'ثم', 'انا', 'نحن', 'انت', 'اريد', 'ممكن', 'لو', 'يا',
+    'the', 'a', 'an', 'of', 'for', 'to', 'in', 'on', 'is', 'what', 'how', 'much', 'and', 'or', 'my'
+}
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text: str) -> List[str]:
+    """Normalize text and split it into index terms."""
+    terms = []
+    for token in _TOKEN.findall(normalize_arabic(text)):
+        if token in _STOPWORDS:
+            continue
+        for prefix in _PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                token = token[len(prefix):]
+                break
+        if len(token) > 1 or token.isdigit():
+            terms.append(token)
+    return terms
+
+
+def build_index(records: List[Dict], directory: str) -> None:
+    """
+    Write a BM25 index of records to directory.
+
+    Each record needs 'text' and 'kind' ('passage' or 'fine'); everything
+    else is kept as metadata. Postings are stored term-major in flat arrays
+    (term_offsets[t]:term_offsets[t + 1] slices postings_docs/postings_tf).
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    vocab: Dict[str, int] = {}
+    postings: List[Dict[int, int]] = []
+    doc_lengths = np.zeros(len(records), dtype=np.float32)
+
+    for doc_id, record in enumerate(records):
+        terms = tokenize(record.get('title', '') + ' ' + record['text'])
+        doc_lengths[doc_id] = len(terms)
+        for term in terms:
+            term_id = vocab.setdefault(term, len(vocab))
+            if term_id == len(postings):
+                postings.append({})
+            postings[term_id][doc_id] = postings[term_id].get(doc_id, 0) + 1
+
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    for term_id, docs in enumerate(postings):
+        term_offsets[term_id + 1] = term_offsets[term_id] + len(docs)
+    postings_docs = np.zeros(term_offsets[-1], dtype=np.int32)
+    postings_tf = np.zeros(term_offsets[-1], dtype=np.float32)
+    for term_id, docs in enumerate(postings):
+        start = term_offsets[term_id]
+        doc_ids = sorted(docs)
+        postings_docs[start:start + len(doc_ids)] = doc_ids
+        postings_tf[start:start + len(doc_ids)] = [docs[doc_id] for doc_id in doc_ids]
+
+    doc_freq = np.diff(term_offsets).astype(np.float32)
+    idf = np.log(1 + (len(records) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    np.save(os.path.join(directory, 'term_offsets.npy'), term_offsets)
+    np.save(os.path.join(directory, 'postings_docs.npy'), postings_docs)
+    np.save(os.path.join(directory, 'postings_tf.npy'), postings_tf)
+    np.save(os.path.join(directory, 'doc_lengths.npy'), doc_lengths)
+    np.save(os.path.join(directory, 'idf.npy'), idf)
+    with open(os.path.join(directory, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False)
+    with open(os.path.join(directory, 'records.jsonl'), 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    logger.info(f"Indexed {len(records)} records, {len(vocab)} terms into {directory}")
+
+
+class LegalIndex:
+    """
+    Read-only BM25 index loaded from a directory written by build_index().
+    The numeric arrays are memory-mapped rather than read into memory.
+    """
+
+    def __init__(self, directory: str, top_k: int = 3, direct_threshold: float = 0.8,
+                 passage_threshold: float = 0.3):
+        self.directory = directory
+        self.top_k = top_k
+        self.direct_threshold = direct_threshold
+        self.passage_threshold = passage_threshold
+
+        load = lambda name: np.load(os.path.join(directory, name), mmap_mode='r')
+        self.term_offsets = load('term_offsets.npy')
+        self.postings_docs = load('postings_docs.npy')
+        self.postings_tf = load('postings_tf.npy')
+        self.doc_lengths = load('doc_lengths.npy')
+        self.idf = load('idf.npy')
+        self.avg_doc_length = float(np.mean(self.doc_lengths)) if len(self.doc_lengths) else 1.0
+
+        with open(os.path.join(directory, 'vocab.json'), encoding='utf-8') as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        with open(os.path.join(directory, 'records.jsonl'), encoding='utf-8') as f:
+            self.records = [json.loads(line) for line in f]
+
+        logger.info(f"Legal index loaded from {directory}: {len(self.records)} records")
+
+    @classmethod
+    def from_env(cls) -> Optional["LegalIndex"]:
+        """Load the index in LEGAL_INDEX_DIR, or None when no index has been built."""
+        directory = os.getenv("LEGAL_INDEX_DIR", os.path.join("data", "legal_index"))
+        if not os.path.exists(os.path.join(directory, 'records.jsonl')):
+            return None
+        return cls(
+            directory,
+            top_k=int(os.getenv("LEGAL_INDEX_TOP_K", "3")),
+            direct_threshold=float(os.getenv("LEGAL_INDEX_DIRECT_THRESHOLD", "0.8")),
+            passage_threshold=float(os.getenv("LEGAL_INDEX_PASSAGE_THRESHOLD", "0.3"))
+        )
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[Dict, float, float]]:
+        """
+        Return up to top_k (record, bm25_score, coverage) tuples, best first.
+        Coverage is the share of the query's IDF weight the record matches;
+        query terms missing from the vocabulary count as unmatched.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.records:
+            return []
+
+        max_idf = float(np.max(self.idf)) if len(self.idf) else 1.0
+        scores = np.zeros(len(self.records), dtype=np.float32)
+        matched_weight = np.zeros(len(self.records), dtype=np.float32)
+        total_weight = 0.0
+
+        for term in terms:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                total_weight += max_idf
+                continue
+            idf = float(self.idf[term_id])
+            total_weight += idf
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            norm = K1 * (1 - B + B * self.doc_lengths[docs] / self.avg_doc_length)
+            scores[docs] += idf * tf * (K1 + 1) / (tf + norm)
+            matched_weight[docs] += idf
+
+        k = min(top_k or self.top_k, len(self.records))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [
+            (self.records[doc_id], float(scores[doc_id]), float(matched_weight[doc_id] / total_weight))
+            for doc_id in best
+            if scores[doc_id] > 0
+        ]
+
+    def retrieve(self, query: str) -> Tuple[Optional[str], List[Dict]]:
+        """
+        Look a question up in the index.
+
+        Returns:
+            Tuple of (direct_answer, passages). direct_answer is set when the
+            best hit is a fine-schedule row matching the question with
+            coverage >= direct_threshold; passages are the top hits with
+            coverage >= passage_threshold, for prompt grounding.
+        """
+        hits = self.search(query)
+        if not hits:
+            return None, []
+
+        record, _, coverage = hits[0]
+        if record['kind'] == 'fine' and coverage >= self.direct_threshold:
+            return format_fine_answer(record), []
+
+        return None, [record for record, _, coverage in hits if coverage >= self.passage_threshold]
+
+
+def format_fine_answer(record: Dict) -> str:
+    """Answer text for a fine-schedule row, in the style the system prompt asks for."""
+    answer = f"الغرامة: {record['amount']} ريال - {record['violation']}"
+    if record.get('notes'):
+        answer += f"\n\n{record['notes']}"
+    if record.get('source'):
+        answer += f"\n\nالمصدر: {record['source']}"
+    return answer
+
+
+def format_passages(passages: List[Dict]) -> str:
+    """Reference block prepended to the user's question."""
+    lines = ["معلومات مرجعية من الأنظمة واللوائح (استخدمها إن كانت ذات صلة):"]
+    for number, passage in enumerate(passages, 1):
+        source = f" ({passage['source']})" if passage.get('source') else ""
+        lines.append(f"[{number}]{source} {passage['text']}")
+    return "\n".join(lines)
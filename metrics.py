@@ -0,0 +1,206 @@
+"""
+Metrics Module for تبيّن Chatbot
+In-process counters, latency histograms and stage timing spans for the chat
+and voice pipelines, rendered in the Prometheus text exposition format by
+GET /metrics. The stats() of the caches, pools and stores are exported as
+gauges through registered collectors.
+
+Metrics are per process: with several gunicorn workers, each scrape sees the
+worker that answered it (the pid label tells them apart).
+"""
+
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "tabyin"
+
+# Latency buckets in seconds, from cache hits up to full voice round trips
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_HELP = {
+    'requests_total': ('counter', 'HTTP requests by endpoint and status'),
+    'request_errors_total': ('counter', 'HTTP requests answered with a 5xx status'),
+    'request_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'stage_seconds': ('histogram', 'Latency of pipeline stages'),
+    'stage_errors_total': ('counter', 'Pipeline stages that raised an exception'),
+    'audio_seconds_total': ('counter', 'Seconds of decoded audio sent to Whisper (live partials excluded)'),
+    'llm_tokens_total': ('counter', 'Gemini tokens by type (prompt, response) and call'),
+    'legal_index_lookups_total': ('counter', 'Legal index lookups by outcome (direct, grounded, none)'),
+}
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Process-wide registry of counters, histograms and stats() collectors."""
+
+    def __init__(self, server_timing: bool = False):
+        self.server_timing = server_timing
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self._collectors: List[Tuple[str, Callable[[], Optional[Dict]]]] = []
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        """Build the registry configured from METRICS_* environment variables."""
+        return cls(server_timing=os.getenv("METRICS_SERVER_TIMING", "0") == "1")
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def value(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if it was never incremented)."""
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Record a stage duration (and add it to the request's Server-Timing, if any)."""
+        self.observe('stage_seconds', seconds, stage=stage)
+        if self.server_timing and has_request_context():
+            g.setdefault('server_timing', []).append((stage, seconds))
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block as one pipeline stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc('stage_errors_total', stage=stage)
+            raise
+        finally:
+            self.observe_stage(stage, time.perf_counter() - started)
+
+    def register_collector(self, component: str, stats_fn: Callable[[], Optional[Dict]]) -> None:
+        """Export the numeric values of stats_fn() as tabyin_<component>_<key> gauges."""
+        self._collectors.append((component, stats_fn))
+
+    def server_timing_header(self, total_seconds: float) -> Optional[str]:
+        """Server-Timing value for the stages recorded in the current request."""
+        if not self.server_timing or not has_request_context():
+            return None
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in g.get('server_timing', [])]
+        entries.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text format (version 0.0.4)."""
+        pid = str(os.getpid())
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, list(h.counts), h.sum, h.count) for key, h in self._histograms.items()),
+                key=lambda item: item[0]
+            )
+
+        lines = []
+        described = set()
+
+        def describe(name):
+            if name not in described and name in _HELP:
+                metric_type, help_text = _HELP[name]
+                lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}_{name} {metric_type}")
+            described.add(name)
+
+        for (name, labels), value in counters:
+            describe(name)
+            lines.append(f"{PREFIX}_{name}{_format_labels(labels, pid=pid)} {_format_value(value)}")
+
+        for (name, labels), counts, total, count in histograms:
+            describe(name)
+            cumulative = 0
+            for bound, bucket_count in zip(LATENCY_BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}_{name}_bucket{_format_labels(labels, pid=pid, le=str(bound))} {cumulative}")
+            lines.append(f"{PREFIX}_{name}_bucket{_format_labels(labels, pid=pid, le='+Inf')} {count}")
+            lines.append(f"{PREFIX}_{name}_sum{_format_labels(labels, pid=pid)} {total:.6f}")
+            lines.append(f"{PREFIX}_{name}_count{_format_labels(labels, pid=pid)} {count}")
+
+        for component, stats_fn in self._collectors:
+            try:
+                stats = stats_fn()
+            except Exception as e:
+                logger.warning(f"Metrics collector '{component}' failed: {e}")
+                continue
+            # Samples of one metric must be contiguous; nested stats interleave them
+            families: Dict[str, List[str]] = {}
+            for name, labels, value in _flatten(stats or {}):
+                metric = f"{PREFIX}_{component}_{name}"
+                families.setdefault(metric, []).append(
+                    f"{metric}{_format_labels(labels, pid=pid)} {_format_value(value)}"
+                )
+            for metric, samples in families.items():
+                lines.append(f"# TYPE {metric} gauge")
+                lines.extend(samples)
+
+        return "\n".join(lines) + "\n"
+
+
+def _flatten(stats: Dict, labels: Labels = ()) -> Iterator[Tuple[str, Labels, float]]:
+    """Yield (name, labels, value) for numeric stats; a dict of dicts becomes one label."""
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            yield key, labels, float(value)
+        elif isinstance(value, (int, float)):
+            yield key, labels, value
+        elif isinstance(value, dict):
+            label = key[:-1] if key.endswith('s') else key
+            for item, item_stats in value.items():
+                if isinstance(item_stats, dict):
+                    yield from _flatten(item_stats, labels + ((label, str(item)),))
+
+
+def _format_labels(labels: Labels, **extra) -> str:
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else f"{value:.6f}"
+
+
+# Shared by app.py, gemini_service.py, voice_service.py and voice_pipeline.py
+metrics = Metrics.from_env()
@@ -0,0 +1,151 @@
+"""
+Scratch Space Module for تبيّن Chatbot
+Per-process scratch directory for temporary voice artifacts, with a
+background janitor that deletes files past an age or total-size limit.
+"""
+
+import os
+import time
+import shutil
+import atexit
+import tempfile
+import threading
+import logging
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DIR_PREFIX = "tabyin-voice-"
+
+
+class ScratchSpace:
+    """
+    Owns a scratch directory named after the current process id. The
+    directory and the janitor thread are (re)created lazily, so a forked
+    worker gets its own directory instead of sharing its parent's.
+    """
+
+    def __init__(self, root: str, max_age_seconds: float, max_bytes: int, sweep_interval: float):
+        self.root = root
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+
+        self._lock = threading.Lock()
+        self._pid = None
+        self._directory = None
+
+        self.files_reclaimed = 0
+        self.bytes_reclaimed = 0
+
+    @classmethod
+    def from_env(cls) -> "ScratchSpace":
+        """Build a scratch space configured from VOICE_SCRATCH_* environment variables."""
+        return cls(
+            root=os.getenv("VOICE_SCRATCH_DIR") or tempfile.gettempdir(),
+            max_age_seconds=float(os.getenv("VOICE_SCRATCH_MAX_AGE", "900")),
+            max_bytes=int(float(os.getenv("VOICE_SCRATCH_MAX_MB", "512")) * 1024 * 1024),
+            sweep_interval=float(os.getenv("VOICE_SCRATCH_SWEEP_INTERVAL", "60"))
+        )
+
+    @property
+    def directory(self) -> str:
+        """This process's scratch directory, created on first use."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._start()
+        return self._directory
+
+    def stats(self) -> Dict[str, float]:
+        files = self._list_files()
+        with self._lock:
+            return {
+                'files': len(files),
+                'bytes_in_flight': sum(size for _, size, _ in files),
+                'files_reclaimed': self.files_reclaimed,
+                'bytes_reclaimed': self.bytes_reclaimed
+            }
+
+    def sweep(self) -> None:
+        """Delete files past max age, then the oldest files until under max bytes."""
+        now = time.time()
+        files = sorted(self._list_files())
+        total = sum(size for _, size, _ in files)
+
+        for mtime, size, path in files:
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            if self._remove(path, size):
+                total -= size
+
+        self._remove_orphaned_directories()
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._directory = tempfile.mkdtemp(prefix=f"{_DIR_PREFIX}{self._pid}-", dir=self.root)
+        atexit.register(shutil.rmtree, self._directory, True)
+
+        threading.Thread(target=self._run_janitor, name="scratch-janitor", daemon=True).start()
+        logger.info(f"Voice scratch directory: {self._directory}")
+
+    def _run_janitor(self) -> None:
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.warning(f"Scratch sweep failed: {e}")
+
+    def _list_files(self) -> List[Tuple[float, int, str]]:
+        files = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            pass
+        return files
+
+    def _remove(self, path: str, size: int) -> bool:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            self.files_reclaimed += 1
+            self.bytes_reclaimed += size
+        return True
+
+    def _remove_orphaned_directories(self) -> None:
+        """Delete scratch directories left behind by processes that no longer exist."""
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.name.startswith(_DIR_PREFIX) or not entry.is_dir():
+                    continue
+                pid = entry.name[len(_DIR_PREFIX):].split('-', 1)[0]
+                if not pid.isdigit() or int(pid) == self._pid or _process_alive(int(pid)):
+                    continue
+                for file_entry in os.scandir(entry.path):
+                    try:
+                        self._remove(file_entry.path, file_entry.stat().st_size)
+                    except OSError:
+                        pass
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name == 'nt':
+        # os.kill(pid, 0) would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
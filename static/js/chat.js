@@ -12,6 +12,7 @@ document.addEventListener('DOMContentLoaded', function () {
     let mediaRecorder = null;
     let audioChunks = [];
     let isRecording = false;
+    let liveTranscription = null;
     let recordingStartTime = null;
     let recordingTimerInterval = null;
     let ttsCache = {}; // Cache TTS responses to avoid duplicate API calls
@@ -546,33 +547,114 @@ document.addEventListener('DOMContentLoaded', function () {
             finalMessage += `\n\nIMPORTANT: Please respond in ${currentLanguage}.`;
         }
 
+        let streamingMessage = null;
+        let responseText = '';
+
         try {
-            const response = await fetch('/chat', {
+            // Stream the answer as Server-Sent Events so the first tokens are
+            // shown as soon as Gemini produces them
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'text/event-stream'
+                },
                 body: JSON.stringify({ message: finalMessage }),
             });
 
-            const data = await response.json();
+            if (!response.ok || !response.body) {
+                const data = await response.json();
+                throw new Error(data.error || 'Chat request failed');
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+
+                for (const rawEvent of events) {
+                    const event = parseSSEEvent(rawEvent);
+                    if (!event) continue;
+
+                    if (event.type === 'done') {
+                        responseText = event.data.response;
+                    } else if (event.type === 'error') {
+                        // Gemini failed mid-answer; the partial text is discarded
+                        const error = new Error('Chat stream failed');
+                        error.userMessage = event.data.error;
+                        throw error;
+                    } else if (event.data.text) {
+                        if (!streamingMessage) {
+                            loadingIndicator.classList.add('d-none');
+                            loadingIndicator.classList.remove('d-flex');
+                            streamingMessage = addStreamingBotMessage(currentLanguage);
+                        }
+                        responseText += event.data.text;
+                        streamingMessage.bubble.innerHTML = formatMarkdown(responseText);
+                        scrollToBottom();
+                    }
+                }
+            }
 
             loadingIndicator.classList.add('d-none');
             loadingIndicator.classList.remove('d-flex');
 
-            if (data.error) {
-                addBotMessage('عذراً، حدث خطأ: ' + data.error, currentLanguage);
-            } else {
-                addBotMessage(data.response, currentLanguage, LEGAL_DISCLAIMER);
-                showServicesButton();
+            // Replace the streaming bubble with the final message (adds the
+            // disclaimer and TTS button); the server has already stored it
+            if (streamingMessage) {
+                streamingMessage.container.remove();
             }
+            addBotMessage(responseText, currentLanguage, LEGAL_DISCLAIMER);
+            showServicesButton();
 
         } catch (error) {
             console.error('Error:', error);
             loadingIndicator.classList.add('d-none');
             loadingIndicator.classList.remove('d-flex');
-            addBotMessage('عذراً، تعذر الاتصال بالخادم.');
+            if (streamingMessage) {
+                streamingMessage.container.remove();
+            }
+            addBotMessage(error.userMessage || 'عذراً، تعذر الاتصال بالخادم.');
         }
     }
 
+    function parseSSEEvent(rawEvent) {
+        let type = 'message';
+        const dataLines = [];
+
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                dataLines.push(line.slice(5).trim());
+            }
+        });
+
+        if (dataLines.length === 0) return null;
+        return { type, data: JSON.parse(dataLines.join('\n')) };
+    }
+
+    function addStreamingBotMessage(language) {
+        const messageDiv = document.createElement('div');
+        messageDiv.className = 'd-flex justify-content-end mb-3';
+
+        const bubble = document.createElement('div');
+        bubble.className = `chat-bubble bot-bubble shadow-sm ${getDirectionClass('', language)}`;
+
+        messageDiv.appendChild(bubble);
+        chatMessages.appendChild(messageDiv);
+        scrollToBottom();
+
+        return { container: messageDiv, bubble };
+    }
+
     function showServicesButton() {
         const btnContainer = document.createElement('div');
         btnContainer.className = 'd-flex justify-content-center mb-3';
@@ -617,6 +699,7 @@ document.addEventListener('DOMContentLoaded', function () {
             mediaRecorder.ondataavailable = (event) => {
                 if (event.data.size > 0) {
                     audioChunks.push(event.data);
+                    sendLiveChunk(liveTranscription, event.data);
                 }
             };
 
@@ -625,6 +708,17 @@ document.addEventListener('DOMContentLoaded', function () {
                 const blobSize = audioBlob.size;
                 audioChunks = [];
 
+                // Live transcription already has the text; the upload is only a fallback
+                const live = liveTranscription;
+                liveTranscription = null;
+                if (live) {
+                    const result = await finishLiveTranscription(live);
+                    if (result) {
+                        handleLiveTranscript(result.text);
+                        return;
+                    }
+                }
+
                 // Validate blob size (minimum 1KB)
                 if (blobSize < 1024) {
                     console.warn('Audio blob too small:', blobSize, 'bytes');
@@ -663,8 +757,15 @@ document.addEventListener('DOMContentLoaded', function () {
         isRecording = true;
         recordingStartTime = Date.now();
 
-        // Start recording without timeslice to ensure valid header
-        mediaRecorder.start();
+        if (window.STREAMING_ASR_ENABLED) {
+            // Send a chunk every 250ms so the server transcribes while the user speaks.
+            // All chunks are still collected for the /voice-to-text fallback.
+            liveTranscription = openLiveTranscription();
+            mediaRecorder.start(250);
+        } else {
+            // Start recording without timeslice to ensure valid header
+            mediaRecorder.start();
+        }
 
         // Update UI
         micButton.classList.add('recording');
@@ -696,6 +797,8 @@ document.addEventListener('DOMContentLoaded', function () {
             // Reset
             isRecording = false;
             audioChunks = [];
+            closeLiveTranscription(liveTranscription);
+            liveTranscription = null;
             micButton.classList.remove('recording');
             recordingIndicator.classList.add('d-none');
             recordingTimer.textContent = '00:00';
@@ -738,87 +841,51 @@ document.addEventListener('DOMContentLoaded', function () {
             // Determine extension based on blob type
             const extension = audioBlob.type.includes('mp4') ? 'mp4' : 'webm';
             formData.append('audio', audioBlob, `recording.${extension}`);
+            // The selected language lets Whisper skip language detection
+            formData.append('language', currentLanguage);
 
             const response = await fetch('/voice-to-text', {
                 method: 'POST',
                 body: formData
             });
 
+            const data = await fetchVoiceResult(response);
+
             loadingIndicator.classList.add('d-none');
             loadingIndicator.classList.remove('d-flex');
 
-            // Check if response is audio (automatic TTS response)
-            const contentType = response.headers.get('content-type');
-
-            if (contentType && contentType.includes('audio')) {
-                // Get transcription and response text from headers
-                // Headers are base64 encoded to handle Arabic/Unicode text
-                const encoding = response.headers.get('X-Encoding');
-                let transcription = response.headers.get('X-Transcription');
-                let responseText = response.headers.get('X-Response-Text');
-                const language = response.headers.get('X-Language');
-
-                // Decode base64 if encoding header is present
-                if (encoding === 'base64') {
-                    try {
-                        transcription = decodeURIComponent(escape(atob(transcription)));
-                        responseText = decodeURIComponent(escape(atob(responseText)));
-                    } catch (e) {
-                        console.error('Failed to decode headers:', e);
-                    }
-                }
-
-                if (transcription) {
-                    // Display user's transcribed message
-                    addUserMessage(transcription);
-
-                    // Get audio blob and play it
-                    const audioBlob = await response.blob();
-                    const audioUrl = URL.createObjectURL(audioBlob);
-
-                    // Display bot's text response
-                    if (responseText) {
-                        addBotMessage(responseText, language, LEGAL_DISCLAIMER);
+            if (data.success && data.transcription) {
+                const transcribedText = data.transcription.trim();
+                if (transcribedText) {
+                    addUserMessage(transcribedText);
 
-                        // Auto-play the TTS response
-                        ttsAudio.src = audioUrl;
-                        await ttsAudio.play();
-
-                        // Show services button after response
+                    if (data.response) {
+                        addBotMessage(data.response, data.language, LEGAL_DISCLAIMER);
                         showServicesButton();
-                    }
-                } else {
-                    throw new Error('Missing transcription in response');
-                }
-            } else {
-                // Fallback: handle JSON response (old format or error)
-                const data = await response.json();
 
-                if (data.success && data.transcription) {
-                    const transcribedText = data.transcription.trim();
-                    if (transcribedText) {
-                        addUserMessage(transcribedText);
-
-                        // If we have response text but no audio
-                        if (data.response) {
-                            addBotMessage(data.response, null, LEGAL_DISCLAIMER);
-                            showServicesButton();
-                        } else {
-                            // Send to Gemini to get response
-                            sendMessageToGemini(transcribedText);
+                        // The spoken answer is generated in the background
+                        if (data.audio_available && data.audio_url) {
+                            playVoiceResponse(data.audio_url);
                         }
                     } else {
-                        const emptyMessages = {
-                            'العربية': 'لم يتم اكتشاف أي كلام. يرجى المحاولة مرة أخرى.',
-                            'English': 'No speech detected. Please try again.',
-                            'हिंदी': 'कोई भाषण नहीं मिला। कृपया पुनः प्रयास करें।',
-                            'Filipino': 'Walang nadetektang pananalita. Pakisubukan muli.'
-                        };
-                        addBotMessage(emptyMessages[currentLanguage] || emptyMessages['العربية']);
+                        // Send to Gemini to get response
+                        sendMessageToGemini(transcribedText);
                     }
                 } else {
-                    throw new Error(data.error || 'Transcription failed');
+                    const emptyMessages = {
+                        'العربية': 'لم يتم اكتشاف أي كلام. يرجى المحاولة مرة أخرى.',
+                        'English': 'No speech detected. Please try again.',
+                        'हिंदी': 'कोई भाषण नहीं मिला। कृपया पुनः प्रयास करें।',
+                        'Filipino': 'Walang nadetektang pananalita. Pakisubukan muli.'
+                    };
+                    addBotMessage(emptyMessages[currentLanguage] || emptyMessages['العربية']);
                 }
+            } else if (data.transcription) {
+                // Transcribed, but the answer failed
+                addUserMessage(data.transcription.trim());
+                addBotMessage(data.error);
+            } else {
+                throw new Error(data.error || 'Transcription failed');
             }
         } catch (error) {
             console.error('Transcription error:', error);
@@ -835,6 +902,145 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    async function fetchVoiceResult(response) {
+        // The upload is answered with 202 and a result_url polled until the answer is ready
+        let data = await response.json();
+        while (response.status === 202 && data.result_url) {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            response = await fetch(data.result_url);
+            const result = await response.json();
+            data = response.status === 202 ? data : result;
+        }
+        return data;
+    }
+
+    // --- Live Transcription (WebSocket) ---
+    function openLiveTranscription() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        const live = {
+            socket: new WebSocket(`${protocol}//${window.location.host}/ws/transcribe?language=${encodeURIComponent(currentLanguage)}`),
+            pending: [],
+            partialBubble: null,
+            onFinal: null
+        };
+
+        live.socket.onopen = () => {
+            live.pending.forEach(chunk => live.socket.send(chunk));
+            live.pending = [];
+        };
+
+        live.socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'partial') {
+                showPartialTranscript(live, message.text);
+            } else if (live.onFinal) {
+                live.onFinal(message.type === 'final' ? message : null);
+            }
+        };
+
+        live.socket.onerror = live.socket.onclose = () => {
+            if (live.onFinal) live.onFinal(null);
+        };
+
+        return live;
+    }
+
+    function sendLiveChunk(live, chunk) {
+        if (!live) return;
+        if (live.socket.readyState === WebSocket.CONNECTING) {
+            live.pending.push(chunk);
+        } else if (live.socket.readyState === WebSocket.OPEN) {
+            live.socket.send(chunk);
+        }
+    }
+
+    function finishLiveTranscription(live) {
+        // Resolves with the final transcript, or null if the upload fallback should be used
+        return new Promise(resolve => {
+            if (live.socket.readyState !== WebSocket.OPEN) {
+                closeLiveTranscription(live);
+                resolve(null);
+                return;
+            }
+
+            const timeout = setTimeout(() => live.onFinal(null), 15000);
+            live.onFinal = (message) => {
+                live.onFinal = null;
+                clearTimeout(timeout);
+                closeLiveTranscription(live);
+                resolve(message);
+            };
+            live.socket.send(JSON.stringify({ type: 'stop' }));
+        });
+    }
+
+    function closeLiveTranscription(live) {
+        if (!live) return;
+        if (live.partialBubble) {
+            live.partialBubble.remove();
+            live.partialBubble = null;
+        }
+        if (live.socket.readyState <= WebSocket.OPEN) {
+            live.socket.close();
+        }
+    }
+
+    function showPartialTranscript(live, text) {
+        if (!text) return;
+        if (!live.partialBubble) {
+            live.partialBubble = document.createElement('div');
+            live.partialBubble.className = 'd-flex justify-content-start mb-3';
+            live.partialBubble.innerHTML = '<div class="chat-bubble user-bubble shadow-sm" style="opacity: 0.6;"></div>';
+            chatMessages.appendChild(live.partialBubble);
+        }
+        const bubble = live.partialBubble.firstElementChild;
+        bubble.className = `chat-bubble user-bubble shadow-sm ${getDirectionClass(text)}`;
+        bubble.textContent = text;
+        scrollToBottom();
+    }
+
+    function handleLiveTranscript(text) {
+        const transcribedText = (text || '').trim();
+        if (transcribedText) {
+            addUserMessage(transcribedText);
+            sendMessageToGemini(transcribedText);
+        } else {
+            const emptyMessages = {
+                'العربية': 'لم يتم اكتشاف أي كلام. يرجى المحاولة مرة أخرى.',
+                'English': 'No speech detected. Please try again.',
+                'हिंदी': 'कोई भाषण नहीं मिला। कृपया पुनः प्रयास करें।',
+                'Filipino': 'Walang nadetektang pananalita. Pakisubukan muli.'
+            };
+            addBotMessage(emptyMessages[currentLanguage] || emptyMessages['العربية']);
+        }
+    }
+
+    async function playVoiceResponse(audioUrl) {
+        try {
+            // The server long-polls and answers 202 until the audio is ready
+            for (let attempt = 0; attempt < 30; attempt++) {
+                const response = await fetch(audioUrl);
+
+                if (response.status === 202) {
+                    const retryAfter = parseInt(response.headers.get('Retry-After') || '1', 10);
+                    await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+                    continue;
+                }
+
+                if (!response.ok) {
+                    throw new Error('Audio request failed');
+                }
+
+                const audioBlob = await response.blob();
+                ttsAudio.src = URL.createObjectURL(audioBlob);
+                await ttsAudio.play();
+                return;
+            }
+        } catch (error) {
+            console.error('Voice response audio error:', error);
+        }
+    }
+
     // --- Text-to-Speech Functions ---
     function addTTSButton(messageDiv, text) {
         // Check if we already have a speaker icon
@@ -878,7 +1084,10 @@ document.addEventListener('DOMContentLoaded', function () {
             const cacheKey = `${currentLanguage}_${text.substring(0, 100)}`;
             let audioUrl = ttsCache[cacheKey];
 
-            if (!audioUrl) {
+            if (!audioUrl && supportsStreamingTTS()) {
+                // Stream sentence chunks so playback starts after the first sentence
+                audioUrl = streamTTS(text, cacheKey, iconElement);
+            } else if (!audioUrl) {
                 // Generate TTS
                 iconElement.classList.add('playing');
                 iconElement.querySelector('i').className = 'fa-solid fa-spinner fa-spin';
@@ -924,6 +1133,59 @@ document.addEventListener('DOMContentLoaded', function () {
         }
     }
 
+    function supportsStreamingTTS() {
+        return 'MediaSource' in window && MediaSource.isTypeSupported('audio/mpeg');
+    }
+
+    function streamTTS(text, cacheKey, iconElement) {
+        const mediaSource = new MediaSource();
+
+        mediaSource.addEventListener('sourceopen', async () => {
+            try {
+                const sourceBuffer = mediaSource.addSourceBuffer('audio/mpeg');
+                const response = await fetch('/text-to-speech/stream', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ text, language: currentLanguage })
+                });
+
+                if (!response.ok || !response.body) {
+                    throw new Error('TTS stream request failed');
+                }
+
+                const reader = response.body.getReader();
+                const chunks = [];
+                while (true) {
+                    const { value, done } = await reader.read();
+                    if (done) break;
+                    chunks.push(value);
+                    await appendToSourceBuffer(sourceBuffer, value);
+                }
+                mediaSource.endOfStream();
+
+                // Cache the complete file for replays
+                ttsCache[cacheKey] = URL.createObjectURL(new Blob(chunks, { type: 'audio/mpeg' }));
+            } catch (error) {
+                console.error('TTS stream error:', error);
+                if (mediaSource.readyState === 'open') {
+                    mediaSource.endOfStream('network');
+                }
+                iconElement.classList.remove('playing');
+                iconElement.querySelector('i').className = 'fa-solid fa-volume-high';
+            }
+        }, { once: true });
+
+        return URL.createObjectURL(mediaSource);
+    }
+
+    function appendToSourceBuffer(sourceBuffer, data) {
+        return new Promise((resolve, reject) => {
+            sourceBuffer.addEventListener('updateend', resolve, { once: true });
+            sourceBuffer.addEventListener('error', reject, { once: true });
+            sourceBuffer.appendBuffer(data);
+        });
+    }
+
     // --- Voice Event Listeners ---
     micButton.addEventListener('mousedown', async (e) => {
         e.preventDefault();
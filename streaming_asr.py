@@ -0,0 +1,238 @@
+"""
+Streaming Speech Recognition Module for تبيّن Chatbot
+Incremental transcription of audio that is still being recorded: encoded
+chunks are decoded by a long-running FFmpeg process, an energy-based voice
+activity detector splits the PCM stream into utterances, and Faster-Whisper
+transcribes each utterance as soon as it ends. Partial transcripts of the
+utterance in progress are produced periodically, at growing intervals so
+that re-decoding the utterance stays linear in its length.
+"""
+
+import os
+import queue
+import subprocess
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+import voice_service
+
+logger = logging.getLogger(__name__)
+
+# (success, transcription, detected_language, error_message)
+TranscribeResult = Tuple[bool, Optional[str], Optional[str], Optional[str]]
+TranscribeFn = Callable[[np.ndarray], TranscribeResult]
+# Like TranscribeFn, but may return None to skip a partial (e.g. no idle worker)
+PartialTranscribeFn = Callable[[np.ndarray], Optional[TranscribeResult]]
+
+FRAME_SAMPLES = voice_service.SAMPLE_RATE * 30 // 1000  # 30 ms VAD frames
+SPEECH_RMS_THRESHOLD = float(os.getenv("STREAMING_ASR_RMS_THRESHOLD", "0.01"))
+END_OF_UTTERANCE_MS = int(os.getenv("STREAMING_ASR_SILENCE_MS", "700"))
+PARTIAL_INTERVAL_MS = int(os.getenv("STREAMING_ASR_PARTIAL_MS", "1000"))
+# A partial re-decodes the whole utterance, so the next one waits until the
+# utterance is this many times longer than at the previous partial
+PARTIAL_GROWTH = 1.5
+MAX_UTTERANCE_SECONDS = 30  # Whisper's context window
+
+
+class StreamingTranscriptionError(Exception):
+    """Raised when an utterance could not be transcribed."""
+
+
+class StreamingTranscriber:
+    """
+    Transcribes one recording session (one WebSocket connection).
+
+    feed() takes encoded audio chunks (e.g. WebM/Opus from MediaRecorder),
+    events() yields ('partial', text) messages while audio arrives, or
+    ('error', message) once an utterance failed, and finish() returns the
+    final transcript once the client stops recording. Utterances are
+    transcribed with transcribe_fn, partials with partial_fn (default:
+    transcribe_fn), which may return None to skip a partial.
+    """
+
+    def __init__(self, transcribe_fn: TranscribeFn, partial_fn: Optional[PartialTranscribeFn] = None):
+        self.transcribe_fn = transcribe_fn
+        self.partial_fn = partial_fn or transcribe_fn
+
+        self._ffmpeg = subprocess.Popen(
+            [
+                voice_service.FFMPEG_BINARY,
+                '-hide_banner',
+                '-loglevel', 'error',
+                # Start decoding from the first chunk instead of probing seconds of input
+                '-probesize', '32k',
+                '-analyzeduration', '0',
+                '-fflags', 'nobuffer',
+                '-i', 'pipe:0',
+                '-f', 'f32le',
+                '-ac', '1',
+                '-ar', str(voice_service.SAMPLE_RATE),
+                '-flush_packets', '1',
+                'pipe:1'
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+        # Whisper calls run one at a time, off the reader thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="streaming-asr")
+        self._events: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self._lock = threading.Lock()
+
+        self._finals = []  # Futures of finished utterances, in order
+        self._utterance: List[np.ndarray] = []
+        self._utterance_samples = 0
+        self._next_partial_samples = self._partial_interval_samples()
+        self._silence_samples = 0
+        self._in_speech = False
+        self._partial_running = False
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._total_samples = 0
+        self.language = None
+
+        self._reader = threading.Thread(target=self._read_pcm, name="streaming-asr-reader", daemon=True)
+        self._reader.start()
+
+    def feed(self, chunk: bytes) -> None:
+        """Pass an encoded audio chunk to the decoder."""
+        self._ffmpeg.stdin.write(chunk)
+        self._ffmpeg.stdin.flush()
+
+    def events(self):
+        """Yield the ('partial', text) events produced since the last call."""
+        while True:
+            try:
+                yield self._events.get_nowait()
+            except queue.Empty:
+                return
+
+    def finish(self, timeout: float = 60) -> Tuple[str, Optional[str]]:
+        """
+        Close the input, transcribe the last utterance and return
+        (full_transcript, detected_language).
+
+        Raises:
+            StreamingTranscriptionError (or the transcription error itself,
+            e.g. TranscriptionQueueFull) if any utterance failed
+        """
+        try:
+            self._ffmpeg.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join(timeout)
+
+        with self._lock:
+            self._end_utterance()
+            finals = list(self._finals)
+
+        texts = [future.result(timeout=timeout) for future in finals]
+        self.close()
+        return " ".join(text for text in texts if text).strip(), self.language
+
+    def close(self) -> None:
+        if self._ffmpeg.poll() is None:
+            self._ffmpeg.kill()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _read_pcm(self) -> None:
+        # 100 ms of float32 samples per read
+        read_size = voice_service.SAMPLE_RATE // 10 * 4
+        while True:
+            data = self._ffmpeg.stdout.read(read_size)
+            if not data:
+                return
+            samples = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+            with self._lock:
+                self._process_samples(samples)
+
+    def _process_samples(self, samples: np.ndarray) -> None:
+        # Same cap as uploaded recordings: audio past the limit is ignored
+        remaining = int(voice_service.MAX_AUDIO_SECONDS * voice_service.SAMPLE_RATE) - self._total_samples
+        samples = samples[:max(0, remaining)]
+        self._total_samples += len(samples)
+
+        samples = np.concatenate([self._pending, samples])
+        usable = len(samples) - len(samples) % FRAME_SAMPLES
+        self._pending = samples[usable:]
+
+        for start in range(0, usable, FRAME_SAMPLES):
+            frame = samples[start:start + FRAME_SAMPLES]
+            is_speech = float(np.sqrt(np.mean(frame * frame))) >= SPEECH_RMS_THRESHOLD
+
+            if is_speech:
+                self._in_speech = True
+                self._silence_samples = 0
+            elif self._in_speech:
+                self._silence_samples += FRAME_SAMPLES
+
+            if not self._in_speech:
+                continue
+
+            self._utterance.append(frame)
+            self._utterance_samples += FRAME_SAMPLES
+
+            silence_ms = self._silence_samples * 1000 // voice_service.SAMPLE_RATE
+            if silence_ms >= END_OF_UTTERANCE_MS or self._utterance_samples >= MAX_UTTERANCE_SECONDS * voice_service.SAMPLE_RATE:
+                self._end_utterance()
+            elif self._utterance_samples >= self._next_partial_samples:
+                self._start_partial()
+
+    def _end_utterance(self) -> None:
+        if self._utterance:
+            audio = np.concatenate(self._utterance)
+            self._finals.append(self._executor.submit(self._transcribe_final, audio))
+        self._utterance = []
+        self._utterance_samples = 0
+        self._next_partial_samples = self._partial_interval_samples()
+        self._silence_samples = 0
+        self._in_speech = False
+
+    @staticmethod
+    def _partial_interval_samples() -> int:
+        return PARTIAL_INTERVAL_MS * voice_service.SAMPLE_RATE // 1000
+
+    def _start_partial(self) -> None:
+        self._next_partial_samples = max(
+            self._utterance_samples + self._partial_interval_samples(),
+            int(self._utterance_samples * PARTIAL_GROWTH)
+        )
+        if self._partial_running:
+            return  # Skip rather than queue behind a slow decode
+        self._partial_running = True
+        audio = np.concatenate(self._utterance)
+        finals = list(self._finals)
+        self._executor.submit(self._transcribe_partial, audio, finals)
+
+    def _transcribe_final(self, audio: np.ndarray) -> str:
+        try:
+            success, text, language, error = self.transcribe_fn(audio)
+            if not success:
+                raise StreamingTranscriptionError(error or 'Transcription failed')
+        except Exception as e:
+            # Dropping the utterance would silently lose words; fail the session
+            logger.warning(f"Streaming utterance transcription failed: {e}")
+            self._events.put(('error', str(e)))
+            raise
+        self.language = self.language or language
+        return text
+
+    def _transcribe_partial(self, audio: np.ndarray, finals) -> None:
+        try:
+            result = self.partial_fn(audio)
+            if result is None:
+                return  # Skipped, e.g. every transcription worker is busy
+            success, text, _, _ = result
+            if success:
+                # Earlier utterances are done: the executor runs jobs in order
+                done = [future.result() for future in finals]
+                self._events.put(('partial', " ".join(t for t in done + [text] if t).strip()))
+        except Exception as e:
+            logger.warning(f"Streaming partial transcription failed: {e}")
+        finally:
+            with self._lock:
+                self._partial_running = False
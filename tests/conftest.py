@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db_app(tmp_path, monkeypatch):
+    """A bare Flask app bound to a fresh SQLite database."""
+    from flask import Flask
+    from database import db, configure_database, init_db
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    app = Flask(__name__)
+    configure_database(app)
+    db.init_app(app)
+    init_db(app)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
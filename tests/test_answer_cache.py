@@ -0,0 +1,78 @@
+import pytest
+
+import answer_cache
+from answer_cache import AnswerCache, normalize_arabic
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(answer_cache.time, 'monotonic', clock)
+    return clock
+
+
+def test_normalize_strips_diacritics_and_tatweel():
+    assert normalize_arabic("مُخَالَفَةُ") == "مخالفه"
+    assert normalize_arabic("غـــرامة") == "غرامه"
+
+
+def test_normalize_folds_letter_variants():
+    assert normalize_arabic("أإآٱ") == "اااا"
+    assert normalize_arabic("على") == "علي"
+    assert normalize_arabic("غرامة") == "غرامه"
+
+
+def test_normalize_punctuation_case_and_whitespace():
+    assert normalize_arabic("  كم الغرامة؟!  ") == "كم الغرامه"
+    assert normalize_arabic("What is\tthe FINE?") == "what is the fine"
+
+
+def test_spelling_variants_share_an_entry():
+    cache = AnswerCache()
+    cache.put("كم غرامة الإشارة الحمراء؟", "300")
+    assert cache.get("كم غرامه الاشارة الحمراء") == "300"
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = AnswerCache(ttl_seconds=60)
+    cache.put("question", "answer")
+    clock.now += 59
+    assert cache.get("question") == "answer"
+    clock.now += 2
+    assert cache.get("question") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = AnswerCache(max_entries=2)
+    cache.put("first", "1")
+    cache.put("second", "2")
+    assert cache.get("first") == "1"  # "second" is now the least recently used
+    cache.put("third", "3")
+    assert cache.get("second") is None
+    assert cache.get("first") == "1"
+    assert cache.get("third") == "3"
+
+
+def test_stats_count_hits_and_misses():
+    cache = AnswerCache()
+    cache.put("question", "answer")
+    cache.get("question")
+    cache.get("other question")
+    stats = cache.stats()
+    assert (stats['exact_hits'], stats['misses']) == (1, 1)
+    assert stats['hit_rate'] == 0.5
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnswerCache(max_entries=0)
+    cache.put("question", "answer")
+    assert cache.get("question") is None
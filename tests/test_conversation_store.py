@@ -0,0 +1,122 @@
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from conversation_store import ConversationStore
+from database import db, User, ChatMessage, Conversation
+
+
+def make_store(app, **options):
+    # The background flusher never fires during a test; tests call flush()
+    options = {'window': 20, 'flush_size': 1000, 'flush_interval': 3600, **options}
+    return ConversationStore(app, **options)
+
+
+def add_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_window_merges_buffer_and_database(db_app):
+    store = make_store(db_app)
+    conversation_id = store.new_conversation()
+    for i in range(3):
+        store.append(conversation_id, 'user', f"q{i}")
+    store.flush()
+    store.append(conversation_id, 'bot', "a2")
+
+    with db_app.app_context():
+        window = store.get_window(conversation_id, 3)
+        assert [m['content'] for m in window] == ["q1", "q2", "a2"]
+        assert store.count_messages(conversation_id) == 4
+
+
+def test_reads_do_not_wait_for_a_flush(db_app):
+    store = make_store(db_app)
+    conversation_id = store.new_conversation()
+    store.append(conversation_id, 'user', "q")
+    store.flush()
+
+    with store._flush_lock, db_app.app_context():
+        assert store.count_messages(conversation_id) == 1
+
+
+def test_read_during_flush_sees_each_message_once(db_app):
+    store = make_store(db_app)
+    conversation_id = store.new_conversation()
+    store.append(conversation_id, 'user', "q")
+
+    counts = []
+
+    def read():
+        with db_app.app_context():
+            counts.append(store.count_messages(conversation_id))
+
+    with db_app.app_context():
+        # Simulate a flush that is under way when the reader starts
+        with store._flush_lock:
+            with store._lock:
+                store._flush_generation += 1
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(0.2)
+            assert reader.is_alive()
+            with store._lock:
+                store._flush_generation -= 1
+        store.flush()
+        reader.join(5)
+    assert counts == [1]
+
+
+def test_rejected_conversation_does_not_block_others(db_app):
+    store = make_store(db_app)
+    user_id = add_user(db_app, "alice")
+    orphan = store.new_conversation(user_id)
+    store.append(orphan, 'user', "lost")
+    with db_app.app_context():
+        db.session.delete(db.session.get(User, user_id))
+        db.session.commit()
+
+    other = store.new_conversation()
+    store.append(other, 'user', "kept")
+    store.flush()
+
+    stats = store.stats()
+    assert stats['buffered_messages'] == 0
+    assert stats['failed_flushes'] == 1
+    assert stats['rejected'] == 2
+    assert stats['messages_written'] == 1
+    with db_app.app_context():
+        assert [m.content for m in ChatMessage.query.all()] == ["kept"]
+        assert db.session.get(Conversation, orphan) is None
+
+    # The next flush is not held back by the rejected rows
+    store.append(other, 'bot', "answer")
+    store.flush()
+    assert store.stats()['failed_flushes'] == 1
+    assert store.stats()['messages_written'] == 2
+
+
+def test_unreachable_database_requeues_within_limit(db_app, monkeypatch):
+    store = make_store(db_app, max_buffered=3)
+    conversation_id = store.new_conversation()
+    for i in range(4):
+        store.append(conversation_id, 'user', f"q{i}")
+    assert store.stats()['dropped'] == 1
+
+    def unreachable(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("unable to open database file"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'execute', unreachable)
+        store.flush()
+    assert store.stats()['buffered_messages'] == 3
+    assert store.stats()['rejected'] == 0
+
+    store.flush()
+    with db_app.app_context():
+        assert [m.content for m in ChatMessage.query.order_by(ChatMessage.id)] == ["q0", "q1", "q2"]
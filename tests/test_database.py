@@ -0,0 +1,53 @@
+from flask import Flask
+from sqlalchemy import text
+
+from database import db, configure_database, User, Conversation, ChatMessage
+
+
+def configured(monkeypatch, url):
+    monkeypatch.setenv("DATABASE_URL", url)
+    app = Flask(__name__)
+    configure_database(app)
+    return app.config
+
+
+def test_heroku_postgres_urls_are_rewritten(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "4")
+    config = configured(monkeypatch, "postgres://u:p@db.example.com/tabyin")
+    assert config['SQLALCHEMY_DATABASE_URI'] == "postgresql://u:p@db.example.com/tabyin"
+    options = config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert options['pool_size'] == 4 and options['pool_pre_ping']
+
+
+def test_sqlite_gets_a_busy_timeout_instead_of_a_pool(monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "2500")
+    config = configured(monkeypatch, "sqlite:///users.db")
+    assert config['SQLALCHEMY_ENGINE_OPTIONS'] == {'connect_args': {'timeout': 2.5}}
+
+
+def test_sqlite_connections_use_wal_and_foreign_keys(db_app):
+    with db_app.app_context():
+        pragma = lambda name: db.session.execute(text(f"PRAGMA {name}")).scalar()
+        assert pragma("journal_mode") == "wal"
+        assert pragma("foreign_keys") == 1
+        assert pragma("synchronous") == 1  # NORMAL
+
+
+def test_deleting_a_user_keeps_history_and_deleting_a_conversation_cascades(db_app):
+    with db_app.app_context():
+        user = User(username="alice", email="alice@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Conversation(id="c" * 32, user_id=user.id))
+        db.session.flush()
+        db.session.add(ChatMessage(conversation_id="c" * 32, role='user', content="q"))
+        db.session.commit()
+
+        db.session.execute(text("DELETE FROM user"))
+        db.session.commit()
+        assert db.session.get(Conversation, "c" * 32).user_id is None
+
+        db.session.execute(text("DELETE FROM conversation"))
+        db.session.commit()
+        assert ChatMessage.query.count() == 0
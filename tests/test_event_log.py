@@ -0,0 +1,74 @@
+from sqlalchemy.exc import OperationalError
+
+from database import db, AnswerRating, ChatEvent, StaffQuestion
+from event_log import EventLog
+
+
+def make_log(app, **options):
+    # The background flusher never fires during a test; tests call flush()
+    options = {'max_events': 100, 'flush_size': 1000, 'flush_interval': 3600, **options}
+    return EventLog(app, **options)
+
+
+def chat_event(log, endpoint='chat'):
+    return log.record(ChatEvent, conversation_id=None, endpoint=endpoint, latency_ms=12.5,
+                      question_chars=10, answer_chars=200)
+
+
+def test_events_are_written_in_one_batch_per_flush(db_app):
+    log = make_log(db_app)
+    chat_event(log)
+    log.record(AnswerRating, user_id=None, conversation_id=None, rating=5)
+    log.record(StaffQuestion, user_id=None, subject="Fines", details="How do I appeal?")
+    log.flush()
+
+    assert log.stats()['flushes'] == 1
+    assert log.stats()['written'] == 3
+    with db_app.app_context():
+        assert ChatEvent.query.count() == AnswerRating.query.count() == StaffQuestion.query.count() == 1
+
+
+def test_full_buffer_drops_new_events(db_app):
+    log = make_log(db_app, max_events=2)
+    assert chat_event(log) and chat_event(log)
+    assert not chat_event(log)
+    assert log.stats()['dropped'] == 1
+    assert log.stats()['buffered_events'] == 2
+    log.flush()
+
+
+def test_rejected_event_does_not_block_the_batch(db_app):
+    log = make_log(db_app)
+    chat_event(log)
+    log.record(AnswerRating, user_id=None, conversation_id=None, rating=None)  # rating is NOT NULL
+    chat_event(log, 'voice')
+    log.flush()
+
+    stats = log.stats()
+    assert (stats['failed_flushes'], stats['rejected'], stats['written']) == (1, 1, 2)
+    assert stats['buffered_events'] == 0
+    with db_app.app_context():
+        assert [e.endpoint for e in ChatEvent.query.order_by(ChatEvent.id)] == ['chat', 'voice']
+
+
+def test_unreachable_database_requeues_within_limit(db_app, monkeypatch):
+    log = make_log(db_app, max_events=3)
+    for _ in range(3):
+        chat_event(log)
+
+    def unreachable(*args, **kwargs):
+        raise OperationalError("INSERT", {}, Exception("unable to open database file"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'execute', unreachable)
+        log.flush()
+        # Recorded while the database is down; no room left after the requeue
+        assert not chat_event(log)
+    assert log.stats()['buffered_events'] == 3
+    assert log.stats()['rejected'] == 0
+    assert log.stats()['dropped'] == 1
+
+    log.flush()
+    assert log.stats()['written'] == 3
+    with db_app.app_context():
+        assert ChatEvent.query.count() == 3
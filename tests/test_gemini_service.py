@@ -0,0 +1,113 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_service
+from gemini_service import _to_contents
+
+
+def test_empty_history():
+    assert _to_contents(None) == []
+    assert _to_contents([]) == []
+
+
+def test_roles_are_mapped_and_alternate():
+    history = [
+        {'role': 'user', 'content': 'q1'},
+        {'role': 'bot', 'content': 'a1'},
+        {'role': 'user', 'content': 'q2'},
+        {'role': 'bot', 'content': 'a2'},
+    ]
+    assert _to_contents(history) == [
+        {'role': 'user', 'parts': ['q1']},
+        {'role': 'model', 'parts': ['a1']},
+        {'role': 'user', 'parts': ['q2']},
+        {'role': 'model', 'parts': ['a2']},
+    ]
+
+
+def test_leading_bot_messages_are_dropped():
+    history = [{'role': 'bot', 'content': 'welcome'}, {'role': 'user', 'content': 'q'}, {'role': 'bot', 'content': 'a'}]
+    assert _to_contents(history) == [{'role': 'user', 'parts': ['q']}, {'role': 'model', 'parts': ['a']}]
+
+
+def test_consecutive_messages_of_one_role_are_merged():
+    history = [
+        {'role': 'user', 'content': 'q1'},
+        {'role': 'user', 'content': 'q1 again'},
+        {'role': 'bot', 'content': 'a1'},
+    ]
+    assert _to_contents(history) == [
+        {'role': 'user', 'parts': ['q1\n\nq1 again']},
+        {'role': 'model', 'parts': ['a1']},
+    ]
+
+
+def test_trailing_user_turn_is_removed():
+    # The new prompt is sent as the next user turn
+    history = [{'role': 'user', 'content': 'q1'}, {'role': 'bot', 'content': 'a1'}, {'role': 'user', 'content': 'q2'}]
+    assert _to_contents(history) == [{'role': 'user', 'parts': ['q1']}, {'role': 'model', 'parts': ['a1']}]
+
+
+def test_history_is_not_modified():
+    history = [{'role': 'user', 'content': 'q1'}, {'role': 'user', 'content': 'q2'}, {'role': 'bot', 'content': 'a'}]
+    _to_contents(history)
+    assert history[0] == {'role': 'user', 'content': 'q1'}
+
+
+class FailingStream:
+    """Streamed Gemini response that breaks after its first chunk."""
+
+    def __iter__(self):
+        yield SimpleNamespace(text="الغرامة ")
+        raise ConnectionError("stream reset")
+
+    async def __aiter__(self):
+        yield SimpleNamespace(text="الغرامة ")
+        raise ConnectionError("stream reset")
+
+
+class FailingModel:
+    def start_chat(self, history=None):
+        return self
+
+    def send_message(self, prompt, stream=False):
+        return FailingStream()
+
+    async def send_message_async(self, prompt, stream=False):
+        return FailingStream()
+
+
+@pytest.fixture
+def failing_gemini(monkeypatch):
+    cached = []
+    monkeypatch.setattr(gemini_service, 'get_model', lambda **kwargs: FailingModel())
+    monkeypatch.setattr(gemini_service, 'legal_index', None)
+    monkeypatch.setattr(gemini_service, 'answer_cache', SimpleNamespace(
+        get=lambda prompt: None,
+        put=lambda prompt, answer: cached.append(answer)
+    ))
+    return cached
+
+
+def test_stream_failure_is_raised_not_yielded(failing_gemini):
+    chunks = []
+    with pytest.raises(gemini_service.GeminiStreamError) as failure:
+        for chunk in gemini_service.ask_gemini_stream("كم الغرامة؟"):
+            chunks.append(chunk)
+    assert chunks == ["الغرامة "]
+    assert failure.value.partial == "الغرامة "
+    assert failing_gemini == []
+
+
+def test_async_stream_failure_is_raised_not_yielded(failing_gemini):
+    async def collect(chunks):
+        async for chunk in gemini_service.ask_gemini_stream_async("كم الغرامة؟"):
+            chunks.append(chunk)
+
+    chunks = []
+    with pytest.raises(gemini_service.GeminiStreamError):
+        asyncio.run(collect(chunks))
+    assert chunks == ["الغرامة "]
+    assert failing_gemini == []
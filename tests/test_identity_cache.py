@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+from database import db, User
+from identity_cache import IdentityCache
+
+
+def add_user(app, username):
+    with app.app_context():
+        user = User(username=username, email=f"{username}@example.com")
+        user.set_password("secret")
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def rename(app, user_id, username):
+    with app.app_context():
+        db.session.get(User, user_id).username = username
+        db.session.commit()
+
+
+def test_repeated_lookups_are_served_from_the_cache(db_app):
+    cache = IdentityCache(max_entries=10, ttl_seconds=60)
+    user_id = add_user(db_app, "alice")
+
+    with db_app.app_context():
+        assert cache.get(user_id).username == "alice"
+        rename(db_app, user_id, "alice2")
+        assert cache.get(user_id).username == "alice"
+        assert cache.get(user_id + 1) is None
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 2, 1)
+
+
+def test_entries_expire_after_the_ttl(db_app, monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr("identity_cache.time.monotonic", lambda: clock.now)
+    cache = IdentityCache(max_entries=10, ttl_seconds=60)
+    user_id = add_user(db_app, "alice")
+
+    with db_app.app_context():
+        cache.get(user_id)
+        rename(db_app, user_id, "alice2")
+        clock.now += 61
+        assert cache.get(user_id).username == "alice2"
+    assert cache.stats()['misses'] == 2
+
+
+def test_least_recently_used_entry_is_evicted(db_app):
+    cache = IdentityCache(max_entries=2, ttl_seconds=60)
+    alice, bob, carol = (add_user(db_app, name) for name in ("alice", "bob", "carol"))
+
+    with db_app.app_context():
+        cache.get(alice)
+        cache.get(bob)
+        cache.get(alice)
+        cache.get(carol)
+        misses = cache.stats()['misses']
+        cache.get(alice)
+        assert cache.stats()['misses'] == misses
+        cache.get(bob)
+        assert cache.stats()['misses'] == misses + 1
+
+
+def test_invalidate_drops_the_entry_and_the_session_snapshot(db_app):
+    db_app.secret_key = "test"
+    cache = IdentityCache(max_entries=10, ttl_seconds=60, session_snapshot_ttl=60)
+    user_id = add_user(db_app, "alice")
+
+    with db_app.test_request_context():
+        assert cache.load_user(str(user_id)).username == "alice"
+        assert cache.load_user(str(user_id)).username == "alice"
+        assert cache.stats()['snapshot_hits'] == 1
+
+        rename(db_app, user_id, "alice2")
+        cache.invalidate(user_id)
+        assert cache.load_user(str(user_id)).username == "alice2"
+        assert cache.stats()['invalidations'] == 1
+
+
+def test_load_user_rejects_malformed_ids(db_app):
+    cache = IdentityCache(max_entries=10, ttl_seconds=60)
+    with db_app.test_request_context():
+        assert cache.load_user("not-a-number") is None
+    assert cache.stats()['misses'] == 0
@@ -0,0 +1,68 @@
+import pytest
+
+from legal_index import LegalIndex, build_index, tokenize
+
+RECORDS = [
+    {'kind': 'fine', 'title': 'استخدام الجوال أثناء القيادة', 'text': 'غرامة استخدام الجوال أثناء القيادة',
+     'violation': 'استخدام الجوال أثناء القيادة', 'amount': 500, 'source': 'جدول المخالفات المرورية'},
+    {'kind': 'fine', 'title': 'قطع الإشارة الحمراء', 'text': 'غرامة قطع الإشارة الحمراء',
+     'violation': 'قطع الإشارة الحمراء', 'amount': 3000},
+    {'kind': 'passage', 'title': 'جواز السفر', 'text': 'يجدد جواز السفر إلكترونياً عبر منصة أبشر',
+     'source': 'نظام وثائق السفر'},
+]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('legal_index')
+    build_index(RECORDS, str(directory))
+    return LegalIndex(str(directory), top_k=3, direct_threshold=0.8, passage_threshold=0.3)
+
+
+def test_tokenize_drops_stopwords_and_prefixes():
+    assert tokenize("كم غرامة الجوال في السيارة؟") == ['غرامه', 'جوال', 'سياره']
+    assert tokenize("والقيادة للمرور") == ['قياده', 'مرور']
+    assert tokenize("الي") == []  # a stopword
+    assert tokenize("الف") == ['الف']  # too short to lose its prefix
+    assert tokenize("What is the fine for a red light") == ['fine', 'red', 'light']
+
+
+def test_tokenize_keeps_numbers_and_drops_single_letters():
+    assert tokenize("مادة 5 ب") == ['ماده', '5']
+
+
+def test_search_ranks_the_matching_record_first(index):
+    hits = index.search("ما غرامة قطع الإشارة الحمراء؟")
+    record, score, coverage = hits[0]
+    assert record['amount'] == 3000
+    assert score > 0
+    assert coverage == pytest.approx(1.0)
+
+
+def test_search_scores_are_descending(index):
+    hits = index.search("غرامة الجوال")
+    scores = [score for _, score, _ in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert hits[0][0]['amount'] == 500
+
+
+def test_unknown_terms_lower_coverage(index):
+    _, _, coverage = index.search("غرامة الجوال للشاحنات")[0]
+    assert 0 < coverage < 1
+
+
+def test_search_without_matches(index):
+    assert index.search("") == []
+    assert index.search("طقس") == []
+
+
+def test_retrieve_answers_fines_directly(index):
+    answer, passages = index.retrieve("كم غرامة قطع الإشارة الحمراء")
+    assert answer.startswith("الغرامة: 3000 ريال")
+    assert passages == []
+
+
+def test_retrieve_grounds_other_questions(index):
+    answer, passages = index.retrieve("كيف أجدد جواز السفر؟")
+    assert answer is None
+    assert [passage['title'] for passage in passages] == ['جواز السفر']
@@ -0,0 +1,65 @@
+from metrics import LATENCY_BUCKETS, Metrics
+
+
+def sample_lines(text):
+    return [line for line in text.splitlines() if line and not line.startswith('#')]
+
+
+def test_counters_render_with_help_labels_and_pid():
+    metrics = Metrics()
+    metrics.inc('requests_total', endpoint='chat', status='200')
+    metrics.inc('requests_total', endpoint='chat', status='200')
+    text = metrics.render()
+    assert '# HELP tabyin_requests_total HTTP requests by endpoint and status' in text
+    assert '# TYPE tabyin_requests_total counter' in text
+    pid = sample_lines(text)[0].split('pid="')[1].split('"')[0]
+    assert f'tabyin_requests_total{{endpoint="chat",status="200",pid="{pid}"}} 2' in text
+
+
+def test_fractional_values_keep_six_decimals():
+    metrics = Metrics()
+    metrics.inc('audio_seconds_total', 2.5)
+    assert sample_lines(metrics.render())[0].endswith(' 2.500000')
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics()
+    for seconds in (0.003, 0.2, 0.2, 100):
+        metrics.observe('stage_seconds', seconds, stage='whisper')
+    lines = sample_lines(metrics.render())
+    buckets = [line for line in lines if line.startswith('tabyin_stage_seconds_bucket')]
+    assert len(buckets) == len(LATENCY_BUCKETS) + 1
+    assert buckets[0].startswith('tabyin_stage_seconds_bucket{stage="whisper",le="0.005",') and buckets[0].endswith(' 1')
+    assert [line for line in buckets if 'le="0.25"' in line][0].endswith(' 3')
+    assert [line for line in buckets if 'le="60.0"' in line][0].endswith(' 3')
+    assert buckets[-1].split('le="')[1].startswith('+Inf') and buckets[-1].endswith(' 4')
+    assert any(line.startswith('tabyin_stage_seconds_sum') and line.endswith(' 100.403000') for line in lines)
+    assert any(line.startswith('tabyin_stage_seconds_count') and line.endswith(' 4') for line in lines)
+
+
+def test_collectors_export_numeric_stats_as_gauges():
+    metrics = Metrics()
+    metrics.register_collector('tts_cache', lambda: {
+        'hits': 3, 'enabled': True, 'directory': '/tmp/cache',
+        'models': {'small': {'loads': 1}, 'tiny': {'loads': 2}}
+    })
+    text = metrics.render()
+    assert '# TYPE tabyin_tts_cache_hits gauge' in text
+    assert 'tabyin_tts_cache_enabled{' in text
+    assert 'directory' not in text
+    loads = [line for line in sample_lines(text) if line.startswith('tabyin_tts_cache_loads')]
+    assert [line.split('{')[1].split(',')[0] for line in loads] == ['model="small"', 'model="tiny"']
+    assert text.count('# TYPE tabyin_tts_cache_loads gauge') == 1
+
+
+def test_failing_collector_is_skipped():
+    metrics = Metrics()
+    metrics.register_collector('broken', lambda: 1 / 0)
+    metrics.inc('requests_total', endpoint='x', status='200')
+    assert 'tabyin_broken' not in metrics.render()
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc('requests_total', endpoint='a"b\\c\nd', status='500')
+    assert 'endpoint="a\\"b\\\\c\\nd"' in metrics.render()
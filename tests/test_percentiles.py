@@ -0,0 +1,20 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from percentiles import percentile
+
+
+def test_nearest_rank_rounds_up():
+    assert percentile([1, 2, 3, 4, 5], 50) == 3
+    assert percentile(list(range(1, 31)), 95) == 29
+    assert percentile(list(range(1, 21)), 95) == 19
+    assert percentile(list(range(1, 101)), 99) == 99
+
+
+def test_edges():
+    assert percentile([], 95) == 0.0
+    assert percentile([7], 50) == 7
+    assert percentile([1, 2, 3], 0) == 1
+    assert percentile([1, 2, 3], 100) == 3
@@ -0,0 +1,102 @@
+import io
+import wave
+import subprocess
+
+import numpy as np
+import pytest
+
+import voice_service
+from streaming_asr import StreamingTranscriber, StreamingTranscriptionError
+
+
+def webm_bytes(*segments):
+    """WebM/Opus, as sent by MediaRecorder, of (kind, seconds) segments: 'tone' or 'silence'."""
+    parts = []
+    for kind, seconds in segments:
+        t = np.arange(int(seconds * voice_service.SAMPLE_RATE)) / voice_service.SAMPLE_RATE
+        parts.append(0.3 * np.sin(2 * np.pi * 440 * t) if kind == 'tone' else np.zeros_like(t))
+    pcm = (np.concatenate(parts) * 32767).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(voice_service.SAMPLE_RATE)
+        f.writeframes(pcm.tobytes())
+    return subprocess.run(
+        [voice_service.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+         '-i', 'pipe:0', '-c:a', 'libopus', '-f', 'webm', 'pipe:1'],
+        input=buffer.getvalue(), stdout=subprocess.PIPE, check=True
+    ).stdout
+
+
+class FakeWhisper:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    def __call__(self, audio):
+        self.calls.append(len(audio) / voice_service.SAMPLE_RATE)
+        if self.fail:
+            return False, None, None, "model crashed"
+        return True, f"utterance{len(self.calls)}", 'ar', None
+
+
+def run(transcriber, audio):
+    transcriber.feed(audio)
+    return transcriber.finish(timeout=10)
+
+
+def test_utterances_are_split_on_silence():
+    whisper = FakeWhisper()
+    transcriber = StreamingTranscriber(whisper, partial_fn=lambda audio: None)
+    text, language = run(transcriber, webm_bytes(('tone', 0.8), ('silence', 1.0), ('tone', 0.6), ('silence', 0.2)))
+
+    assert text == "utterance1 utterance2"
+    assert language == 'ar'
+    assert len(whisper.calls) == 2
+    assert whisper.calls[0] == pytest.approx(0.8 + 0.7, abs=0.1)
+
+
+def test_partials_cover_earlier_utterances():
+    whisper = FakeWhisper()
+    partials = []
+
+    def partial(audio):
+        partials.append(len(audio))
+        return True, "so far", 'ar', None
+
+    transcriber = StreamingTranscriber(whisper, partial_fn=partial)
+    run(transcriber, webm_bytes(('tone', 0.5), ('silence', 1.0), ('tone', 4.0)))
+
+    events = list(transcriber.events())
+    assert events and all(kind == 'partial' for kind, _ in events)
+    assert events[-1] == ('partial', "utterance1 so far")
+
+
+def test_partials_come_at_growing_intervals():
+    partials = []
+
+    def partial(audio):
+        partials.append(len(audio) / voice_service.SAMPLE_RATE)
+        return True, "so far", 'ar', None
+
+    transcriber = StreamingTranscriber(FakeWhisper(), partial_fn=partial)
+    run(transcriber, webm_bytes(('tone', 12.0)))
+
+    # Every second would be 11 re-decodes; 1, 2, 3, 4.5, 6.75 and 10.1 s is at most 6
+    assert 2 <= len(partials) <= 6
+    assert partials[-1] >= 1.5 * partials[-2] - 0.1
+
+
+def test_skipped_partials_send_nothing():
+    transcriber = StreamingTranscriber(FakeWhisper(), partial_fn=lambda audio: None)
+    text, _ = run(transcriber, webm_bytes(('tone', 3.0)))
+    assert text == "utterance1"
+    assert list(transcriber.events()) == []
+
+
+def test_failed_utterance_fails_the_session():
+    transcriber = StreamingTranscriber(FakeWhisper(fail=True))
+    with pytest.raises(StreamingTranscriptionError):
+        run(transcriber, webm_bytes(('tone', 0.5), ('silence', 1.0)))
+    assert ('error', "model crashed") in list(transcriber.events())
@@ -0,0 +1,99 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import pytest
+
+from metrics import metrics
+from transcription_pool import (
+    TranscriptionClient, TranscriptionPool, TranscriptionQueueFull, TranscriptionService
+)
+
+
+class CrashOncePool(TranscriptionPool):
+    """Skips loading Whisper; the first set of worker processes dies on start."""
+
+    def __init__(self, *args, **kwargs):
+        self.executors_created = 0
+        super().__init__(*args, **kwargs)
+
+    def _new_executor(self):
+        self.executors_created += 1
+        crash = self.executors_created == 1
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=os._exit if crash else None,
+            initargs=(1,) if crash else ()
+        )
+
+
+def test_pool_replaces_broken_executor():
+    pool = CrashOncePool(workers=1, max_queue=1)
+    try:
+        with pytest.raises(Exception):
+            pool.transcribe(b"")
+        # Empty audio fails to decode, which proves a live worker answered
+        success, transcription, language, error = pool.transcribe(b"")
+        assert not success and error
+        assert pool.stats()['restarts'] == 1
+        assert pool.stats()['in_flight'] == 0
+    finally:
+        pool.shutdown()
+
+
+class FakePool:
+    timeout = 5
+
+    def __init__(self):
+        self.full = False
+        self.warm_ups = 0
+
+    def submit_measured(self, *args, **kwargs):
+        if self.full:
+            raise TranscriptionQueueFull(7)
+        future = Future()
+        future.set_result(((True, f"heard {args[0]!r}", 'arabic', None), 2.5))
+        return future
+
+    def has_idle_worker(self):
+        return not self.full
+
+    def warm_up(self):
+        self.warm_ups += 1
+
+    def stats(self):
+        return {'queue_depth': 0}
+
+
+@pytest.fixture
+def service(tmp_path):
+    pool = FakePool()
+    service = TranscriptionService(pool, str(tmp_path / "whisper.sock"), authkey=b"secret")
+    threading.Thread(target=service.serve_forever, daemon=True).start()
+    yield service
+    service.close()
+
+
+def test_client_round_trip(service):
+    client = TranscriptionClient(service.address, authkey=b"secret", timeout=5)
+    before = metrics.value('audio_seconds_total')
+
+    assert client.transcribe(b"audio", 'arabic') == (True, "heard b'audio'", 'arabic', None)
+    assert metrics.value('audio_seconds_total') - before == 2.5
+    assert client.has_idle_worker()
+    assert client.stats() == {'queue_depth': 0}
+
+    client.warm_up()
+    client.warm_up()
+    assert service.pool.warm_ups == 1
+
+
+def test_client_propagates_full_queue(service):
+    client = TranscriptionClient(service.address, authkey=b"secret", timeout=5)
+    service.pool.full = True
+    with pytest.raises(TranscriptionQueueFull) as excinfo:
+        client.transcribe(b"audio")
+    assert excinfo.value.retry_after == 7
+    assert not client.has_idle_worker()
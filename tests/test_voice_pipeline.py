@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+import voice_pipeline
+from gemini_service import GeminiStreamError, GEMINI_ERROR_MESSAGE
+from voice_jobs import VoiceJobStore
+
+
+def test_start_voice_request_does_not_wait(monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_text_phase(*args):
+        await release.wait()
+        return False, None, None, None, 'No speech', []
+
+    monkeypatch.setattr(voice_pipeline, '_run_text_phase', slow_text_phase)
+    future = voice_pipeline.start_voice_request(b"audio")
+    assert not future.done()
+
+    voice_pipeline._get_loop().call_soon_threadsafe(release.set)
+    assert future.result(timeout=5) == (False, None, None, None, None, 'No speech')
+
+
+def test_timeout_cancels_the_pipeline(monkeypatch):
+    cancelled = []
+
+    async def stuck_text_phase(*args):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    monkeypatch.setattr(voice_pipeline, '_run_text_phase', stuck_text_phase)
+    monkeypatch.setattr(voice_pipeline, 'VOICE_PIPELINE_TIMEOUT', 0.1)
+    future = voice_pipeline.start_voice_request(b"audio")
+    with pytest.raises(voice_pipeline.VoicePipelineTimeout):
+        future.result(timeout=5)
+    assert cancelled == [True]
+
+
+def test_job_store_round_trip(tmp_path):
+    jobs = VoiceJobStore(str(tmp_path))
+    job_id = jobs.create('conversation')
+    assert VoiceJobStore.is_valid_id(job_id)
+    assert jobs.get(job_id) == {'status': 'pending', 'conversation_id': 'conversation'}
+
+    # Another worker process sees the result through the shared directory
+    other = VoiceJobStore(str(tmp_path))
+    jobs.finish(job_id, 'conversation', {'status': 'done', 'response': 'نعم'})
+    assert other.get(job_id) == {'status': 'done', 'response': 'نعم', 'conversation_id': 'conversation'}
+    assert other.get('0' * 32) is None
+
+
+def test_job_store_expires_old_jobs(tmp_path):
+    jobs = VoiceJobStore(str(tmp_path), retention_seconds=-1)
+    old = jobs.create('conversation')
+    jobs.create('conversation')
+    assert jobs.get(old) is None
+    assert jobs.stats()['expired'] == 1
+
+
+def test_failed_answer_keeps_the_transcription(monkeypatch):
+    async def transcribed(*args):
+        return True, "كم الغرامة؟", 'العربية', None
+
+    async def broken_answer(question, history=None):
+        yield "الغرامة "
+        raise GeminiStreamError("الغرامة ")
+
+    monkeypatch.setattr(voice_pipeline, 'transcribe', transcribed)
+    monkeypatch.setattr(voice_pipeline, 'ask_gemini_stream_async', broken_answer)
+    future = voice_pipeline.start_voice_request(b"audio")
+    assert future.result(timeout=5) == (False, "كم الغرامة؟", 'العربية', None, None, GEMINI_ERROR_MESSAGE)
@@ -0,0 +1,113 @@
+import subprocess
+
+import pytest
+
+import voice_service
+from voice_service import (
+    AudioRejected, _strip_id3_tag, check_audio_upload, join_mp3_chunks, sniff_audio_format,
+    speed_up_audio_bytes, split_sentences
+)
+
+
+def id3_tag(payload: bytes, footer: bool = False) -> bytes:
+    size = len(payload)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b'ID3\x04\x00' + (b'\x10' if footer else b'\x00') + syncsafe + payload + (b'3DI' + b'\x00' * 7 if footer else b'')
+
+
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 12
+
+
+def silent_mp3(seconds: float) -> bytes:
+    return subprocess.run(
+        [voice_service.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+         '-f', 'lavfi', '-i', f'aevalsrc=0:d={seconds}', '-ac', '1', '-ar', '24000',
+         '-f', 'mp3', 'pipe:1'],
+        stdout=subprocess.PIPE, check=True
+    ).stdout
+
+
+def test_sniff_known_containers():
+    assert sniff_audio_format(b'\x1a\x45\xdf\xa3' + b'\x00' * 12) == 'webm'
+    assert sniff_audio_format(b'OggS' + b'\x00' * 12) == 'ogg'
+    assert sniff_audio_format(b'RIFF\x24\x00\x00\x00WAVEfmt ') == 'wav'
+    assert sniff_audio_format(b'\x00\x00\x00\x20ftypM4A ') == 'mp4'
+    assert sniff_audio_format(b'ID3\x04\x00\x00\x00\x00\x00\x00') == 'mp3'
+    assert sniff_audio_format(MP3_FRAME) == 'mp3'
+
+
+def test_sniff_rejects_other_data():
+    assert sniff_audio_format(b'RIFF\x24\x00\x00\x00AVI LIST') is None
+    assert sniff_audio_format(b'%PDF-1.7\n') is None
+    assert sniff_audio_format(b'') is None
+    assert sniff_audio_format(b'\xff') is None
+
+
+def test_check_audio_upload_reads_the_header():
+    info = check_audio_upload(silent_mp3(1.0))
+    assert info['format'] == 'mp3'
+    assert info['codec'] == 'mp3'
+    assert info['duration'] == pytest.approx(1.0, abs=0.1)
+
+
+def test_check_audio_upload_rejects_non_audio():
+    with pytest.raises(AudioRejected) as excinfo:
+        check_audio_upload(b'%PDF-1.7\n' + b'\x00' * 64)
+    assert excinfo.value.status_code == 415
+
+
+def test_check_audio_upload_rejects_long_audio(monkeypatch):
+    monkeypatch.setattr(voice_service, 'MAX_AUDIO_SECONDS', 1)
+    with pytest.raises(AudioRejected) as excinfo:
+        check_audio_upload(silent_mp3(2.0))
+    assert excinfo.value.status_code == 413
+
+
+def test_strip_id3_tag():
+    assert _strip_id3_tag(id3_tag(b'x' * 300) + MP3_FRAME) == MP3_FRAME
+
+
+def test_strip_id3_tag_with_footer():
+    assert _strip_id3_tag(id3_tag(b'x' * 20, footer=True) + MP3_FRAME) == MP3_FRAME
+
+
+def test_strip_id3_tag_leaves_untagged_data():
+    assert _strip_id3_tag(MP3_FRAME) == MP3_FRAME
+    assert _strip_id3_tag(b'ID3') == b'ID3'
+
+
+def test_join_mp3_chunks_keeps_only_the_first_tag():
+    first = id3_tag(b'a' * 10) + MP3_FRAME
+    second = id3_tag(b'b' * 10) + MP3_FRAME
+    assert join_mp3_chunks([first, second]) == first + MP3_FRAME
+
+
+def test_split_sentences_merges_short_sentences():
+    text = "Hi. This sentence is long enough to be spoken on its own. Ok? Bye."
+    assert split_sentences(text, min_chars=20) == [
+        "Hi. This sentence is long enough to be spoken on its own.",
+        "Ok? Bye."
+    ]
+
+
+def test_split_sentences_on_arabic_question_mark():
+    text = "ما هي غرامة قطع الإشارة الحمراء؟ الغرامة 3000 ريال."
+    assert split_sentences(text, min_chars=10) == ["ما هي غرامة قطع الإشارة الحمراء؟", "الغرامة 3000 ريال."]
+
+
+def test_split_sentences_of_short_text_is_one_chunk():
+    assert split_sentences("  Short answer.  ") == ["Short answer."]
+    assert split_sentences("") == []
+
+
+def test_speed_up_audio_bytes_shortens_the_audio():
+    success, audio, error = speed_up_audio_bytes(silent_mp3(2.6), 1.3)
+    assert success and error is None
+    assert sniff_audio_format(audio[:16]) == 'mp3'
+    assert check_audio_upload(audio)['duration'] == pytest.approx(2.0, abs=0.1)
+
+
+def test_speed_up_audio_bytes_reports_bad_input():
+    success, audio, error = speed_up_audio_bytes(b'not audio')
+    assert not success and audio is None
+    assert error.startswith("FFmpeg speed-up failed")
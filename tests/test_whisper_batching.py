@@ -0,0 +1,154 @@
+import inspect
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import transcription_pool
+import voice_service
+import whisper_batching
+from whisper_batching import WhisperBatcher
+
+FAST = {'beam_size': 1, 'best_of': 1, 'condition_on_previous_text': False,
+        'vad_filter': True, 'vad_parameters': {'min_silence_duration_ms': 500}}
+BALANCED = {'beam_size': 5, 'best_of': 5, 'condition_on_previous_text': True,
+            'vad_filter': True, 'vad_parameters': {'min_silence_duration_ms': 1000}}
+VAD_PARAMETERS = {name for profile in voice_service.TRANSCRIPTION_PROFILES.values()
+                  for name in profile['vad_parameters']}
+
+
+class FakeFeatureExtractor:
+    nb_max_frames = 3000
+
+    def __call__(self, audio):
+        return np.zeros((80, len(audio) // 160), dtype=np.float32)
+
+
+class FakeModel:
+    """Just enough of faster_whisper.WhisperModel for the batched path."""
+
+    def __init__(self, avg_logprob=-0.2):
+        self.avg_logprob = avg_logprob
+        self.generate_calls = []
+        self.transcribe_calls = []
+        self.feature_extractor = FakeFeatureExtractor()
+        self.model = SimpleNamespace(
+            is_multilingual=True,
+            encode=lambda storage, to_cpu: storage,
+            detect_language=lambda encoder_output: [[('<|ar|>', 0.9)]] * len(encoder_output),
+            generate=self.generate
+        )
+        self.hf_tokenizer = None
+        self.max_length = 448
+
+    def get_prompt(self, tokenizer, previous_tokens, without_timestamps):
+        assert previous_tokens == [] and without_timestamps
+        return [tokenizer.language]
+
+    def generate(self, encoder_output, prompts, **kwargs):
+        self.generate_calls.append((len(prompts), kwargs))
+        return [SimpleNamespace(sequences_ids=[[1, 2, 3]], scores=[self.avg_logprob * 4 / 3], no_speech_prob=0.1)
+                for _ in prompts]
+
+    def transcribe(self, samples, language=None, **options):
+        self.transcribe_calls.append(options)
+        return [SimpleNamespace(text=" re-decoded")], SimpleNamespace(language=language or 'ar')
+
+
+class FakeTokenizer:
+    def __init__(self, hf_tokenizer, multilingual, task, language):
+        self.language = language
+
+    def decode(self, tokens):
+        return f" {self.language} text"
+
+
+@pytest.fixture
+def vad_calls(monkeypatch):
+    calls = []
+
+    def get_speech_timestamps(audio, vad_options):
+        calls.append(vad_options)
+        return [{'start': 0, 'end': len(audio)}]
+
+    monkeypatch.setattr(whisper_batching, '_faster_whisper_internals', lambda: (
+        FakeTokenizer,
+        lambda features: features,
+        lambda **parameters: parameters,
+        lambda audio, chunks: audio,
+        get_speech_timestamps
+    ))
+    return calls
+
+
+def clip(seconds=2.0):
+    return np.zeros(int(seconds * voice_service.SAMPLE_RATE), dtype=np.float32)
+
+
+def transcribe_together(batcher, requests):
+    results = [None] * len(requests)
+
+    def run(index, language, options):
+        results[index] = batcher.transcribe(clip(), ('base', 'int8', 0), language, options, timeout=5)
+
+    threads = [threading.Thread(target=run, args=(i, *request)) for i, request in enumerate(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_batching_thread_starts_on_first_clip(vad_calls):
+    def batcher_threads():
+        return sum(thread.name == "whisper-batcher" for thread in threading.enumerate())
+
+    before = batcher_threads()
+    batcher = WhisperBatcher(lambda *spec: FakeModel(), max_batch_size=4, max_wait_ms=1)
+    assert batcher_threads() == before
+    batcher.transcribe(clip(), ('base', 'int8', 0), 'ar', FAST, timeout=5)
+    assert batcher_threads() == before + 1
+
+
+def test_clips_are_batched_per_decode_options(vad_calls):
+    model = FakeModel()
+    batcher = WhisperBatcher(lambda *spec: model, max_batch_size=4, max_wait_ms=200)
+    results = transcribe_together(batcher, [('ar', FAST), (None, FAST), ('en', BALANCED)])
+
+    assert results == [("ar text", 'ar'), ("ar text", 'ar'), ("en text", 'en')]
+    assert sorted((size, kwargs['beam_size']) for size, kwargs in model.generate_calls) == [(1, 5), (2, 1)]
+    # Each clip is VAD-trimmed with its profile's parameters
+    assert sorted(options['min_silence_duration_ms'] for options in vad_calls) == [500, 500, 1000]
+    assert batcher.stats()['clips'] == 3
+
+
+def test_low_confidence_clips_are_decoded_unbatched(vad_calls):
+    model = FakeModel(avg_logprob=-1.5)
+    batcher = WhisperBatcher(lambda *spec: model, max_batch_size=4, max_wait_ms=1)
+    text, language = batcher.transcribe(clip(), ('base', 'int8', 0), 'ar', BALANCED, timeout=5)
+
+    assert (text, language) == ("re-decoded", 'ar')
+    assert model.transcribe_calls == [dict(BALANCED, without_timestamps=True)]
+    assert batcher.stats()['fallbacks'] == 1
+
+
+def test_pool_workers_do_not_batch(monkeypatch):
+    monkeypatch.setattr(voice_service, 'whisper_batcher', object())
+    monkeypatch.setattr(voice_service, 'WHISPER_CPU_THREADS', 0)
+    monkeypatch.setattr(voice_service, 'get_whisper_model', lambda: None)
+    transcription_pool._init_worker(2)
+    assert voice_service.whisper_batcher is None
+
+
+def test_pinned_faster_whisper_has_the_batched_path_internals():
+    pytest.importorskip("faster_whisper")
+    from faster_whisper import WhisperModel
+
+    Tokenizer, get_ctranslate2_storage, VadOptions, collect_chunks, get_speech_timestamps = \
+        whisper_batching._faster_whisper_internals()
+    assert 'vad_options' in inspect.signature(get_speech_timestamps).parameters
+    assert set(VAD_PARAMETERS) <= set(VadOptions._fields)
+    assert list(inspect.signature(WhisperModel.get_prompt).parameters)[1:4] == \
+        ['tokenizer', 'previous_tokens', 'without_timestamps']
+    assert set(BALANCED) <= set(inspect.signature(WhisperModel.transcribe).parameters)
@@ -0,0 +1,70 @@
+import pytest
+
+import voice_service
+import whisper_registry
+from whisper_registry import WhisperModelRegistry
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Footprints come from the per-size estimates, not this process's RSS
+    monkeypatch.setattr(whisper_registry, '_current_rss', lambda: None)
+    loads = []
+
+    def loader(model_size, compute_type, cpu_threads):
+        loads.append(model_size)
+        return object()
+
+    registry = WhisperModelRegistry(700 * MB, loader=loader)
+    registry.loads = loads
+    return registry
+
+
+def test_models_are_loaded_once(registry):
+    model = registry.get('base')
+    assert registry.get('base') is model
+    assert registry.get('base', 'float32') is not model
+    assert registry.loads == ['base', 'base']
+
+
+def test_least_recently_used_model_is_evicted(registry):
+    registry.get('small')  # 500 MB
+    registry.get('base')   # 150 MB
+    registry.get('small')
+    registry.get('tiny')   # 80 MB: base is evicted, small was used more recently
+
+    models = registry.stats()['models']
+    assert models['small/int8']['resident']
+    assert models['tiny/int8']['resident']
+    assert not models['base/int8']['resident']
+    assert models['base/int8']['evictions'] == 1
+    assert registry.resident_bytes() == 580 * MB
+
+
+def test_model_larger_than_budget_stays_resident(registry):
+    registry.get('medium')  # 1500 MB
+    assert registry.stats()['models']['medium/int8']['resident']
+    registry.get('tiny')
+    assert not registry.stats()['models']['medium/int8']['resident']
+
+
+def test_usage_stats(registry):
+    registry.get('base')
+    registry.record_use('base', 'int8', 0, audio_seconds=10.0, elapsed_seconds=2.5)
+    registry.record_use('base', 'int8', 0, audio_seconds=10.0, elapsed_seconds=1.5)
+    stats = registry.stats()['models']['base/int8']
+    assert stats['requests'] == 2
+    assert stats['real_time_factor'] == 0.2
+
+
+def test_short_clips_are_routed_to_the_short_clip_model(monkeypatch):
+    monkeypatch.setattr(voice_service, 'WHISPER_MODEL_SIZE', 'small')
+    monkeypatch.setattr(voice_service, 'WHISPER_SHORT_CLIP_MODEL_SIZE', 'base')
+    monkeypatch.setattr(voice_service, 'WHISPER_SHORT_CLIP_SECONDS', 6)
+
+    assert voice_service.whisper_model_spec('balanced', 3.0)[0] == 'base'
+    assert voice_service.whisper_model_spec('balanced', 20.0)[0] == 'small'
+    # The accurate profile never trades accuracy for speed
+    assert voice_service.whisper_model_spec('accurate', 3.0)[0] == voice_service.TRANSCRIPTION_PROFILES['accurate']['model_size']
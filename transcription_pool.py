@@ -0,0 +1,412 @@
+"""
+Transcription Pool Module for تبيّن Chatbot
+Runs Faster-Whisper in a fixed set of worker processes, each holding its own
+model, so voice traffic is sized independently from the web workers.
+
+With several web worker processes on a host the pool runs once, as its own
+service process (python transcription_pool.py, started by gunicorn.conf.py),
+and every web worker talks to it through a TranscriptionClient; the queue
+limit and the number of Whisper processes are then per host, not per worker.
+"""
+
+import os
+import sys
+import math
+import time
+import atexit
+import tempfile
+import threading
+import logging
+import multiprocessing
+from multiprocessing.connection import Client, Listener
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Union
+
+import voice_service
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when the pool's bounded queue has no free slot."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Transcription queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _init_worker(cpu_threads: int) -> None:
+    """Load the Whisper model once when a worker process starts."""
+    voice_service.WHISPER_CPU_THREADS = cpu_threads
+    # A worker runs one job at a time, so there is never a second clip to batch with
+    voice_service.whisper_batcher = None
+    voice_service.get_whisper_model()
+
+
+def _warm_up_worker() -> None:
+    voice_service.warm_up()
+
+
+def _run_transcription(*args, **kwargs):
+    # A worker's own metrics are never scraped; hand its audio seconds to the parent
+    before = metrics.value('audio_seconds_total')
+    result = voice_service.transcribe_audio(*args, **kwargs)
+    return result, metrics.value('audio_seconds_total') - before
+
+
+class TranscriptionPool:
+    """
+    Bounded pool of transcription worker processes.
+
+    At most workers + max_queue jobs are accepted at once; further submissions
+    raise TranscriptionQueueFull with a Retry-After estimate based on the
+    average job duration.
+    """
+
+    def __init__(self, workers: int, max_queue: int, cpu_threads: int = 0, timeout: float = 120):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cpu_threads = cpu_threads
+        self.timeout = timeout
+
+        self._executor = self._new_executor()
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._avg_seconds = 5.0
+
+        atexit.register(self.shutdown)
+        logger.info(f"Transcription pool started: {workers} workers, queue={max_queue}, cpu_threads={cpu_threads or 'auto'}")
+
+    @classmethod
+    def from_env(cls) -> Optional["TranscriptionPool"]:
+        """Create a pool from WHISPER_POOL_* settings, or None when the pool is disabled."""
+        workers = int(os.getenv("WHISPER_POOL_WORKERS", "0"))
+        if workers <= 0:
+            return None
+        return cls(
+            workers=workers,
+            max_queue=int(os.getenv("WHISPER_POOL_QUEUE", str(workers * 2))),
+            cpu_threads=int(os.getenv("WHISPER_CPU_THREADS", "0")),
+            timeout=float(os.getenv("WHISPER_POOL_TIMEOUT", "120"))
+        )
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn keeps CTranslate2 thread pools out of forked children
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.cpu_threads,)
+        )
+
+    def _submit_to_executor(self, fn, *args, **kwargs) -> Future:
+        """
+        Submit to the process pool, replacing it first if it is broken: once a
+        worker process dies (e.g. killed for running out of memory), every
+        later submit to the same executor raises BrokenProcessPool.
+        """
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            with self._lock:
+                if self._executor is executor:
+                    logger.error("Transcription worker died, restarting the pool")
+                    self._executor = self._new_executor()
+                    self.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+            return self._executor.submit(fn, *args, **kwargs)
+
+    def submit(self, *args, **kwargs) -> Future:
+        """
+        Queue a voice_service.transcribe_audio call on a worker process. The
+        returned future resolves to transcribe_audio's result.
+        """
+        return _count_audio_seconds(self.submit_measured(*args, **kwargs))
+
+    def submit_measured(self, *args, **kwargs) -> Future:
+        """
+        Like submit, but the future resolves to (result, audio_seconds) and
+        audio_seconds_total is left for the caller to count.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise TranscriptionQueueFull(self.retry_after())
+
+        started = time.monotonic()
+        with self._lock:
+            self.pending += 1
+
+        def on_done(future: Future) -> None:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.pending -= 1
+                if future.cancelled() or future.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                    self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+            self._slots.release()
+
+        try:
+            future = self._submit_to_executor(_run_transcription, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(on_done)
+        return future
+
+    def has_idle_worker(self) -> bool:
+        """Whether a job submitted now would start without waiting in the queue."""
+        with self._lock:
+            return self.pending < self.workers
+
+    def transcribe(self, *args, **kwargs):
+        """Blocking helper: submit a job and wait for its result."""
+        return self.submit(*args, **kwargs).result(timeout=self.timeout)
+
+    def warm_up(self) -> None:
+        """Start every worker process and run a dummy inference on each."""
+        futures = [self._submit_to_executor(_warm_up_worker) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def retry_after(self) -> int:
+        with self._lock:
+            waiting = max(0, self.pending - self.workers) + 1
+            return max(1, math.ceil(waiting / self.workers * self._avg_seconds))
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'in_flight': self.pending,
+                'queue_depth': max(0, self.pending - self.workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+                'avg_seconds': round(self._avg_seconds, 3)
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _count_audio_seconds(measured: Future) -> Future:
+    """Chain a submit_measured future: count its audio seconds here, resolve to the result."""
+    result_future = Future()
+
+    def on_done(future: Future) -> None:
+        try:
+            result, audio_seconds = future.result()
+        except BaseException as e:
+            result_future.set_exception(e)
+            return
+        metrics.inc('audio_seconds_total', audio_seconds)
+        result_future.set_result(result)
+
+    measured.add_done_callback(on_done)
+    return result_future
+
+
+DEFAULT_SERVICE_ADDRESS = os.path.join(tempfile.gettempdir(), "tabyin-whisper.sock")
+
+
+def _parse_address(address: str) -> Union[str, tuple]:
+    """"host:port" for TCP, anything else is a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+def _authkey() -> Optional[bytes]:
+    key = os.getenv("WHISPER_POOL_AUTHKEY")
+    return key.encode() if key else None
+
+
+class TranscriptionService:
+    """
+    Serves one TranscriptionPool to the web workers of a host over a local
+    socket. Each connection carries one request at a time: a (method, args,
+    kwargs) tuple answered with ('ok', value), ('full', retry_after) or
+    ('error', message).
+    """
+
+    def __init__(self, pool: TranscriptionPool, address: str, authkey: Optional[bytes] = None):
+        self.pool = pool
+        self.address = _parse_address(address)
+        self.authkey = authkey
+        self._warm_up_lock = threading.Lock()
+        self._warmed_up = False
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Left behind by a service that did not shut down cleanly
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=authkey)
+
+    def serve_forever(self) -> None:
+        logger.info(f"Transcription service listening on {self.address}")
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                break  # Listener closed
+            except Exception as e:
+                logger.warning(f"Transcription service rejected a connection: {e}")
+                continue
+            threading.Thread(target=self._serve_connection, args=(connection,),
+                             name="transcription-service", daemon=True).start()
+
+    def warm_up(self) -> None:
+        # Every web worker asks on start; the shared pool is warmed once
+        with self._warm_up_lock:
+            if not self._warmed_up:
+                self.pool.warm_up()
+                self._warmed_up = True
+
+    def close(self) -> None:
+        self._listener.close()
+
+    def _serve_connection(self, connection) -> None:
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ('ok', self._call(method, args, kwargs))
+                except TranscriptionQueueFull as e:
+                    reply = ('full', e.retry_after)
+                except Exception as e:
+                    logger.error(f"Transcription service {method} failed: {e}")
+                    reply = ('error', f"{type(e).__name__}: {e}")
+                try:
+                    connection.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def _call(self, method: str, args: tuple, kwargs: dict):
+        if method == 'transcribe':
+            return self.pool.submit_measured(*args, **kwargs).result(timeout=self.pool.timeout)
+        if method == 'has_idle_worker':
+            return self.pool.has_idle_worker()
+        if method == 'stats':
+            return self.pool.stats()
+        if method == 'warm_up':
+            return self.warm_up()
+        raise ValueError(f"Unknown method {method!r}")
+
+
+class TranscriptionClient:
+    """
+    TranscriptionPool interface for a web worker, backed by the host's
+    TranscriptionService. Connections are opened on demand and reused; a
+    service that is still starting is waited for up to connect_timeout
+    seconds.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None,
+                 timeout: float = 120, connect_timeout: float = 30, max_in_flight: int = 16):
+        self.address = _parse_address(address)
+        self.authkey = authkey
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self._idle = []
+        self._lock = threading.Lock()
+        # Each in-flight job waits for its reply on one of these threads
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="transcription-client")
+
+    @classmethod
+    def from_env(cls) -> Optional["TranscriptionClient"]:
+        """Create a client from WHISPER_POOL_ADDRESS, or None when it is not set."""
+        address = os.getenv("WHISPER_POOL_ADDRESS")
+        if not address:
+            return None
+        return cls(address, _authkey(), timeout=float(os.getenv("WHISPER_POOL_TIMEOUT", "120")))
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.address, authkey=self.authkey)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise ConnectionError(f"Transcription service at {self.address} is not reachable")
+                time.sleep(0.2)
+
+    def _call(self, method: str, *args, **kwargs):
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            connection.send((method, args, kwargs))
+            status, value = connection.recv()
+        except BaseException:
+            connection.close()
+            raise
+        with self._lock:
+            self._idle.append(connection)
+
+        if status == 'full':
+            raise TranscriptionQueueFull(value)
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def submit(self, *args, **kwargs) -> Future:
+        """Queue a transcribe_audio call on the shared pool (see TranscriptionPool.submit)."""
+        return _count_audio_seconds(self._executor.submit(self._call, 'transcribe', *args, **kwargs))
+
+    def has_idle_worker(self) -> bool:
+        return self._call('has_idle_worker')
+
+    def transcribe(self, *args, **kwargs):
+        """Blocking helper: submit a job and wait for its result."""
+        return self.submit(*args, **kwargs).result(timeout=self.timeout)
+
+    def warm_up(self) -> None:
+        self._call('warm_up')
+
+    def stats(self) -> Dict[str, float]:
+        return self._call('stats')
+
+
+def pool_from_env() -> Optional[Union[TranscriptionPool, TranscriptionClient]]:
+    """
+    Return this process's transcription backend: a client of the host's
+    transcription service when WHISPER_POOL_ADDRESS is set, an in-process
+    pool when only WHISPER_POOL_WORKERS is (single-process servers), or None
+    to transcribe in the web worker itself.
+    """
+    return TranscriptionClient.from_env() or TranscriptionPool.from_env()
+
+
+def main() -> None:
+    """Run the host's transcription service (WHISPER_POOL_* settings)."""
+    logging.basicConfig(level=logging.INFO)
+    pool = TranscriptionPool.from_env()
+    if pool is None:
+        sys.exit("WHISPER_POOL_WORKERS must be > 0 to run the transcription service")
+    service = TranscriptionService(pool, os.getenv("WHISPER_POOL_ADDRESS", DEFAULT_SERVICE_ADDRESS), _authkey())
+    if os.getenv("WHISPER_PRELOAD", "0") == "1":
+        threading.Thread(target=service.warm_up, name="whisper-warm-up", daemon=True).start()
+    service.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+TTS Cache Module for تبيّن Chatbot
+Content-addressed on-disk cache of final (sped-up) TTS MP3 files with
+size-bounded LRU eviction. The cache directory can be shared by several
+worker processes.
+"""
+
+import os
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """
+    Stores generated speech as <key>.mp3 files, where key is a hash of the
+    cleaned text, language code and speed factor. Access time is tracked
+    through the file mtime, and the least recently used files are deleted
+    once the directory grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "TTSCache":
+        """Build a cache configured from TTS_CACHE_* environment variables."""
+        directory = os.getenv("TTS_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "tabyin-tts-cache")
+        max_mb = float(os.getenv("TTS_CACHE_MAX_MB", "256"))
+        return cls(directory, int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def make_key(cleaned_text: str, lang_code: str, speed_factor: float) -> str:
+        payload = f"{lang_code}\x00{speed_factor:.3f}\x00{cleaned_text}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file path for key, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put_bytes(self, key: str, data: bytes) -> str:
+        """Write data to the cache atomically and return its cached path."""
+        path = self.path_for(key)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as temp_file:
+            temp_file.write(data)
+        os.replace(temp_path, path)
+        self._evict(keep=path)
+        return path
+
+    def exists(self, key: str) -> bool:
+        """True if audio for key is cached (does not count as a lookup)."""
+        return os.path.exists(self.path_for(key))
+
+    def mark_pending(self, key: str) -> None:
+        """Record that audio for key is being generated, visible to every process."""
+        with open(self._pending_path(key), 'w'):
+            pass
+
+    def clear_pending(self, key: str) -> None:
+        try:
+            os.remove(self._pending_path(key))
+        except FileNotFoundError:
+            pass
+
+    def is_pending(self, key: str, max_age_seconds: float = 300) -> bool:
+        """True if some process is generating audio for key (stale markers are ignored)."""
+        try:
+            return time.time() - os.path.getmtime(self._pending_path(key)) < max_age_seconds
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def _pending_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pending")
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.mp3'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Evicted by another process
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        logger.info(f"TTS cache trimmed to {total / (1024 * 1024):.1f} MB")
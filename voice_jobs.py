@@ -0,0 +1,98 @@
+"""
+Voice Jobs Module for تبيّن Chatbot
+State of /voice-to-text requests that are still running or recently
+finished. POST /voice-to-text answers right away with a job id; the client
+polls GET /voice-to-text/<job_id>, which may reach any worker process, so
+jobs are stored as small JSON files in a directory they all share.
+"""
+
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class VoiceJobStore:
+    """
+    One <job_id>.json file per job: {'status': 'pending'} while the pipeline
+    runs, then the finished state written by finish(). Files older than
+    retention_seconds are removed when new jobs are created.
+    """
+
+    def __init__(self, directory: str, retention_seconds: float = 300):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.created = 0
+        self.finished = 0
+        self.expired = 0
+
+    @classmethod
+    def from_env(cls) -> "VoiceJobStore":
+        """Build a store configured from VOICE_JOB_* environment variables."""
+        directory = os.getenv("VOICE_JOB_DIR") or os.path.join(tempfile.gettempdir(), "tabyin-voice-jobs")
+        return cls(directory, float(os.getenv("VOICE_JOB_RETENTION", "300")))
+
+    @staticmethod
+    def is_valid_id(job_id: str) -> bool:
+        return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
+
+    def create(self, conversation_id: str) -> str:
+        """Record a new pending job of conversation_id and return its id."""
+        self._expire()
+        job_id = uuid.uuid4().hex
+        self._write(job_id, {'status': 'pending', 'conversation_id': conversation_id})
+        with self._lock:
+            self.created += 1
+        return job_id
+
+    def finish(self, job_id: str, conversation_id: str, state: Dict) -> None:
+        """Replace the pending state with state ('status' is 'done' or 'failed')."""
+        self._write(job_id, {**state, 'conversation_id': conversation_id})
+        with self._lock:
+            self.finished += 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job's current state, or None for an unknown or expired job."""
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'created': self.created, 'finished': self.finished, 'expired': self.expired}
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job_id: str, state: Dict) -> None:
+        # Atomic replace: a poll never reads a half-written file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as temp_file:
+            json.dump(state, temp_file, ensure_ascii=False)
+        os.replace(temp_path, self._path(job_id))
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        expired = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        expired += 1
+                except FileNotFoundError:
+                    continue  # Removed by another process
+        if expired:
+            with self._lock:
+                self.expired += expired
@@ -0,0 +1,245 @@
+"""
+Voice Pipeline Module for تبيّن Chatbot
+Runs the /voice-to-text chain (decode + transcribe -> Gemini -> TTS) as an
+asyncio pipeline on a dedicated event loop. CPU stages run in executors,
+network calls are awaited, and TTS for each finished sentence starts while
+Gemini is still generating the rest of the answer. Callers get a future
+right away, never blocking a web worker on the pipeline; it resolves as soon
+as the answer text is complete, and audio follows in the background.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import voice_service
+from gemini_service import ask_gemini_stream_async, GeminiStreamError, GEMINI_ERROR_MESSAGE
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+VOICE_PIPELINE_TIMEOUT = float(os.getenv("VOICE_PIPELINE_TIMEOUT", "180"))
+
+
+class VoicePipelineTimeout(Exception):
+    """Raised when the text phase of a voice request takes longer than VOICE_PIPELINE_TIMEOUT."""
+
+# Event loop shared by all voice requests in this process
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's pipeline event loop, starting it on first use (and after fork)."""
+    global _loop, _loop_pid
+    if _loop_pid != os.getpid():
+        with _loop_lock:
+            if _loop_pid != os.getpid():
+                _loop = asyncio.new_event_loop()
+                threading.Thread(target=_loop.run_forever, name="voice-pipeline", daemon=True).start()
+                _loop_pid = os.getpid()
+    return _loop
+
+
+def start_voice_request(
+    audio: bytes,
+    transcription_pool=None,
+    language: Optional[str] = None,
+    profile: Optional[str] = None,
+    history: Optional[List[Dict[str, str]]] = None
+) -> concurrent.futures.Future:
+    """
+    Start the voice pipeline and return at once. The returned future
+    resolves after the text phase (transcription and Gemini answer); speech
+    synthesis, already started for the first sentences, continues in the
+    background and lands in the TTS cache under the returned audio id.
+    
+    Args:
+        audio: Uploaded audio bytes
+        transcription_pool: Optional TranscriptionPool to run Whisper on
+        language: Optional language hint for Whisper
+        profile: Whisper decoding profile (see voice_service.TRANSCRIPTION_PROFILES)
+        history: Earlier conversation turns to send to Gemini
+    
+    Returns:
+        Future of (success, transcription, detected_language, response_text,
+        audio_id, error_message); a failed result still carries the
+        transcription when only the Gemini answer failed. It raises
+        TranscriptionQueueFull from the pool, and VoicePipelineTimeout once
+        the text phase has run for VOICE_PIPELINE_TIMEOUT seconds (the
+        pipeline is cancelled then).
+    """
+    loop = _get_loop()
+    return asyncio.run_coroutine_threadsafe(_run_voice_request(audio, transcription_pool, language, profile, history), loop)
+
+
+async def _run_voice_request(audio: bytes, transcription_pool=None, language=None, profile=None, history=None):
+    try:
+        success, transcription, detected_language, response_text, error, tts_tasks = await asyncio.wait_for(
+            _run_text_phase(audio, transcription_pool, language, profile, history), VOICE_PIPELINE_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        raise VoicePipelineTimeout(f"Voice request took longer than {VOICE_PIPELINE_TIMEOUT:.0f}s") from None
+    if not success:
+        return False, transcription, detected_language, None, None, error
+
+    audio_id = voice_service.speech_cache_key(response_text, detected_language, speed_up=True, speed_factor=1.3)
+    if not voice_service.tts_cache.exists(audio_id):
+        voice_service.tts_cache.mark_pending(audio_id)
+        job = asyncio.run_coroutine_threadsafe(_finish_audio(audio_id, tts_tasks), asyncio.get_running_loop())
+        _register_audio_job(audio_id, job)
+
+    return True, transcription, detected_language, response_text, audio_id, None
+
+
+def wait_for_audio(audio_id: str, timeout: float) -> str:
+    """
+    Wait up to timeout seconds for the audio of a voice request.
+    
+    Returns:
+        'ready', 'pending', 'failed' or 'unknown'
+    """
+    tts_cache = voice_service.tts_cache
+    if tts_cache.exists(audio_id):
+        return 'ready'
+
+    with _audio_jobs_lock:
+        entry = _audio_jobs.get(audio_id)
+
+    if entry is not None:
+        job = entry[0]
+        try:
+            job.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            return 'pending'
+        except Exception:
+            return 'failed'
+        return 'ready'
+
+    # Possibly being generated by another worker process sharing the cache
+    deadline = time.monotonic() + timeout
+    while tts_cache.is_pending(audio_id):
+        if time.monotonic() >= deadline:
+            return 'pending'
+        time.sleep(0.25)
+    return 'ready' if tts_cache.exists(audio_id) else 'unknown'
+
+
+# Background audio jobs of this process: audio_id -> (future, started_at)
+_audio_jobs = {}
+_audio_jobs_lock = threading.Lock()
+_AUDIO_JOB_RETENTION = 300
+
+
+def _register_audio_job(audio_id: str, job: concurrent.futures.Future) -> None:
+    now = time.monotonic()
+    with _audio_jobs_lock:
+        # Finished jobs are kept for a while so clients can still see failures
+        expired = [key for key, (old_job, started) in _audio_jobs.items()
+                   if old_job.done() and now - started > _AUDIO_JOB_RETENTION]
+        for key in expired:
+            del _audio_jobs[key]
+        _audio_jobs[audio_id] = (job, now)
+
+
+async def _run_text_phase(audio: bytes, transcription_pool=None, language=None, profile=None, history=None):
+    with metrics.span('transcribe'):
+        success, transcription, detected_language, error = await transcribe(audio, transcription_pool, language, profile)
+    if not success:
+        return False, None, None, None, error or 'Transcription failed', []
+
+    try:
+        response_text, tts_tasks = await answer_with_speech(transcription, detected_language, history)
+    except GeminiStreamError:
+        return False, transcription, detected_language, None, GEMINI_ERROR_MESSAGE, []
+    return True, transcription, detected_language, response_text, None, tts_tasks
+
+
+async def _finish_audio(audio_id: str, tts_tasks: List[asyncio.Future]) -> None:
+    """Join the synthesized chunks and store the result in the TTS cache."""
+    started = time.perf_counter()
+    try:
+        audio_chunks = await asyncio.gather(*tts_tasks)
+        if not audio_chunks or any(chunk is None for chunk in audio_chunks):
+            raise RuntimeError("TTS generation failed")
+        audio_data = voice_service.join_mp3_chunks(audio_chunks)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, voice_service.tts_cache.put_bytes, audio_id, audio_data)
+        # From the end of the text phase until the full answer audio is stored
+        metrics.observe_stage('voice_audio_ready', time.perf_counter() - started)
+    except Exception:
+        metrics.inc('stage_errors_total', stage='voice_audio_ready')
+        raise
+    finally:
+        voice_service.tts_cache.clear_pending(audio_id)
+
+
+async def transcribe(audio: bytes, transcription_pool=None, language=None, profile=None):
+    """Decode and transcribe on the worker pool, or on the loop's executor."""
+    if transcription_pool:
+        return await asyncio.wrap_future(transcription_pool.submit(audio, language, profile))
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, voice_service.transcribe_audio, audio, language, profile)
+
+
+async def answer_with_speech(question: str, language: str, history=None) -> Tuple[str, List[asyncio.Future]]:
+    """
+    Stream the Gemini answer and start synthesizing each completed group of
+    sentences as soon as it arrives.
+    
+    Returns:
+        Tuple of (full_response_text, tts_futures); each future resolves to
+        MP3 bytes for its part of the answer, or None if TTS failed
+    
+    Raises:
+        GeminiStreamError: if the answer could not be generated
+    """
+    loop = asyncio.get_running_loop()
+    parts = []
+    pending_text = ''
+    tts_tasks = []
+
+    def start_tts(text: str) -> None:
+        tts_tasks.append(loop.run_in_executor(voice_service.tts_executor, _synthesize, text, language))
+
+    try:
+        async for chunk in ask_gemini_stream_async(question, history):
+            parts.append(chunk)
+            pending_text += chunk
+            ready_text, pending_text = _take_complete_sentences(pending_text)
+            if ready_text:
+                start_tts(ready_text)
+    except GeminiStreamError:
+        # Speech for the start of a failed answer is never played
+        for task in tts_tasks:
+            task.cancel()
+        raise
+
+    if pending_text.strip():
+        start_tts(pending_text)
+
+    return ''.join(parts), tts_tasks
+
+
+def _take_complete_sentences(text: str, min_chars: int = 40) -> Tuple[str, str]:
+    """Split off the completed sentences at the start of text once they are long enough."""
+    boundaries = list(voice_service.SENTENCE_BOUNDARY.finditer(text))
+    if not boundaries:
+        return '', text
+    cut = boundaries[-1].end()
+    if len(text[:cut].strip()) < min_chars:
+        return '', text
+    return text[:cut].strip(), text[cut:]
+
+
+def _synthesize(text: str, language: str) -> Optional[bytes]:
+    success, audio_data, error = voice_service.synthesize_speech(text, language, speed_up=True, speed_factor=1.3)
+    if not success:
+        logger.warning(f"TTS failed for pipeline chunk: {error}")
+        return None
+    return audio_data
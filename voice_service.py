@@ -4,14 +4,24 @@ Provides local Speech-to-Text (Faster-Whisper) and Text-to-Speech (Coqui TTS)
 All processing runs offline without external API calls.
 """
 
+import io
 import os
+import re
+import time
 import tempfile
-from pathlib import Path
-from typing import Tuple, Optional
+from typing import Iterator, List, Tuple, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import subprocess
+import numpy as np
 import imageio_ffmpeg
 
+from metrics import metrics
+from scratch_space import ScratchSpace
+from tts_cache import TTSCache
+from whisper_registry import WhisperModelRegistry
+from whisper_batching import BATCH_MAX_SECONDS, WhisperBatcher
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -20,367 +30,651 @@ logger = logging.getLogger(__name__)
 FFMPEG_BINARY = imageio_ffmpeg.get_ffmpeg_exe()
 logger.info(f"Using FFmpeg binary at: {FFMPEG_BINARY}")
 
-# Configure pydub to use the bundled FFmpeg
-try:
-    from pydub import AudioSegment
-    AudioSegment.converter = FFMPEG_BINARY
-    # pydub also needs ffprobe, but imageio-ffmpeg only provides ffmpeg. 
-    # Often ffmpeg is enough for basic operations, or we might need to rely on system path for ffprobe.
-    # However, for simple conversion/export, ffmpeg binary is the critical one.
-except ImportError:
-    logger.warning("pydub not installed, some audio features may fail")
+# Whisper expects 16 kHz mono input
+SAMPLE_RATE = 16000
 
-# Lazy loading - models will be initialized on first use
-_whisper_model = None
+# Uploaded bytes, a file path, or already-decoded samples
+AudioSource = Union[bytes, str, np.ndarray]
 
+# Per-process directory for temporary voice files, swept by a janitor thread
+scratch = ScratchSpace.from_env()
 
-def get_whisper_model():
-    """Initialize and return Faster-Whisper model (lazy loading)."""
-    global _whisper_model
-    if _whisper_model is None:
-        try:
-            from faster_whisper import WhisperModel
-            logger.info("Loading Faster-Whisper model...")
-            
-            # Use 'small' model for better accuracy than 'base', while still being reasonably fast on CPU
-            # 'medium' would be even better but might be too slow without GPU
-            _whisper_model = WhisperModel(
-                "small",
-                device="cpu",
-                compute_type="int8"  # Use int8 for faster CPU inference
-            )
-            logger.info("Faster-Whisper model loaded successfully")
-        except Exception as e:
-            logger.error(f"Failed to load Whisper model: {e}")
-            raise
-    return _whisper_model
-
-
-def transcribe_audio(audio_file_path: str) -> Tuple[bool, Optional[str], Optional[str], Optional[str]]:
+# On-disk cache of final TTS audio, shared by all worker processes
+tts_cache = TTSCache.from_env()
+
+# Lazy loading - models are loaded on first use and evicted (LRU) once the
+# resident models exceed WHISPER_MODELS_MAX_MB
+whisper_models = WhisperModelRegistry.from_env()
+
+# Whisper model settings (CTranslate2 picks a thread count itself when 0)
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "small")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")  # int8 for faster CPU inference
+WHISPER_CPU_THREADS = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+
+# Clips shorter than this go to WHISPER_SHORT_CLIP_MODEL_SIZE (0 disables routing),
+# so short "yes/no" answers do not pay for the larger model
+WHISPER_SHORT_CLIP_SECONDS = float(os.getenv("WHISPER_SHORT_CLIP_SECONDS", "6"))
+WHISPER_SHORT_CLIP_MODEL_SIZE = os.getenv("WHISPER_SHORT_CLIP_MODEL_SIZE", "base")
+
+# Optional micro-batching of concurrent short clips (WHISPER_BATCH_SIZE > 1);
+# transcription pool workers take one clip at a time and switch it off
+whisper_batcher = WhisperBatcher.from_env(whisper_models.get)
+
+# Decoding profiles selectable per request. Greedy decoding (beam_size=1)
+# and skipping timestamp tokens are the big CPU savings; 'balanced' keeps
+# the original small-model beam search.
+TRANSCRIPTION_PROFILES = {
+    'fast': {
+        'model_size': os.getenv("WHISPER_FAST_MODEL_SIZE", "base"),
+        'beam_size': 1,
+        'best_of': 1,
+        'without_timestamps': True,
+        'condition_on_previous_text': False,
+        'vad_parameters': {'min_silence_duration_ms': 500},
+        'compute_type': None,  # None = WHISPER_COMPUTE_TYPE
+        'cpu_threads': None,  # None = WHISPER_CPU_THREADS
+        'route_short_clips': True
+    },
+    'balanced': {
+        'model_size': None,  # None = WHISPER_MODEL_SIZE
+        'beam_size': 5,
+        'best_of': 5,
+        'without_timestamps': True,
+        'condition_on_previous_text': True,
+        'vad_parameters': {'min_silence_duration_ms': 1000},
+        'compute_type': None,
+        'cpu_threads': None,
+        'route_short_clips': True
+    },
+    'accurate': {
+        'model_size': os.getenv("WHISPER_ACCURATE_MODEL_SIZE", "medium"),
+        'beam_size': 5,
+        'best_of': 5,
+        'without_timestamps': False,
+        'condition_on_previous_text': True,
+        'vad_parameters': {'min_silence_duration_ms': 2000},
+        'compute_type': None,
+        'cpu_threads': None,
+        'route_short_clips': False
+    }
+}
+DEFAULT_TRANSCRIPTION_PROFILE = os.getenv("WHISPER_PROFILE", "balanced")
+
+# Frontend language names to Whisper language codes (used as a hint)
+WHISPER_LANGUAGE_CODES = {
+    'العربية': 'ar',
+    'English': 'en',
+    'हिंदी': 'hi',
+    'Filipino': 'tl'
+}
+
+# Map Whisper language codes to our frontend language names
+WHISPER_LANGUAGE_NAMES = {
+    'ar': 'العربية',
+    'en': 'English',
+    'hi': 'हिंदी',
+    'tl': 'Filipino',
+    'fil': 'Filipino'
+}
+
+
+def resolve_transcription_profile(profile: Optional[str] = None) -> str:
+    """Return a valid profile name, falling back to DEFAULT_TRANSCRIPTION_PROFILE."""
+    if profile in TRANSCRIPTION_PROFILES:
+        return profile
+    if DEFAULT_TRANSCRIPTION_PROFILE in TRANSCRIPTION_PROFILES:
+        return DEFAULT_TRANSCRIPTION_PROFILE
+    return 'balanced'
+
+
+def resolve_language_hint(language: Optional[str]) -> Optional[str]:
+    """Map a frontend language name or Whisper code to a Whisper code, or None to auto-detect."""
+    if not language:
+        return None
+    if language in WHISPER_LANGUAGE_CODES:
+        return WHISPER_LANGUAGE_CODES[language]
+    if language in WHISPER_LANGUAGE_NAMES:
+        return 'tl' if language == 'fil' else language
+    return None
+
+
+def whisper_model_spec(profile: Optional[str] = None, duration: Optional[float] = None) -> Tuple[str, str, int]:
+    """
+    Pick the (model_size, compute_type, cpu_threads) for a profile, routing
+    clips shorter than WHISPER_SHORT_CLIP_SECONDS to the short-clip model.
+    """
+    settings = TRANSCRIPTION_PROFILES[resolve_transcription_profile(profile)]
+    model_size = settings['model_size'] or WHISPER_MODEL_SIZE
+    if (settings['route_short_clips'] and duration is not None
+            and duration < WHISPER_SHORT_CLIP_SECONDS):
+        model_size = WHISPER_SHORT_CLIP_MODEL_SIZE
+    compute_type = settings['compute_type'] or WHISPER_COMPUTE_TYPE
+    cpu_threads = settings['cpu_threads'] if settings['cpu_threads'] is not None else WHISPER_CPU_THREADS
+    return model_size, compute_type, cpu_threads
+
+
+def get_whisper_model(profile: Optional[str] = None, duration: Optional[float] = None):
+    """Return the Faster-Whisper model for a profile and clip duration (lazy loading)."""
+    try:
+        return whisper_models.get(*whisper_model_spec(profile, duration))
+    except Exception as e:
+        logger.error(f"Failed to load Whisper model: {e}")
+        raise
+
+
+def warm_up(profile: Optional[str] = None) -> None:
     """
-    Transcribe audio file to text using Faster-Whisper.
+    Load the Whisper model and run one dummy inference on a second of
+    silence, so model loading and first-run kernel setup happen before real
+    traffic arrives.
+    """
+    # The long-clip model and, when routing is on, the short-clip model
+    specs = {whisper_model_spec(profile), whisper_model_spec(profile, duration=0)}
+    for spec in specs:
+        model = whisper_models.get(*spec)
+        segments, _ = model.transcribe(
+            np.zeros(SAMPLE_RATE, dtype=np.float32),
+            beam_size=1,
+            language='ar'
+        )
+        list(segments)  # Segments are generated lazily
+    logger.info(f"Faster-Whisper models warmed up: {', '.join(spec[0] for spec in specs)}")
+
+
+def transcribe_audio(
+    audio: AudioSource,
+    language: Optional[str] = None,
+    profile: Optional[str] = None,
+    count_audio: bool = True
+) -> Tuple[bool, Optional[str], Optional[str], Optional[str]]:
+    """
+    Transcribe audio to text using Faster-Whisper.
     
     Args:
-        audio_file_path: Path to audio file (WAV, MP3, WebM, etc.)
+        audio: Uploaded audio bytes, path to an audio file (WAV, MP3, WebM, etc.)
+               or 16 kHz mono float32 samples
+        language: Optional language hint (frontend name or Whisper code);
+                  skips language detection when given
+        profile: Decoding profile name from TRANSCRIPTION_PROFILES
+        count_audio: Add the decoded duration to audio_seconds_total (off for
+                     re-transcriptions such as live partials)
     
     Returns:
         Tuple of (success, transcription, detected_language, error_message)
     """
-    converted_path = None
     try:
-        model = get_whisper_model()
-        
-        # Check if file needs conversion to WAV
-        file_ext = Path(audio_file_path).suffix.lower()
-        transcription_file = audio_file_path
+        profile = resolve_transcription_profile(profile)
+        settings = TRANSCRIPTION_PROFILES[profile]
         
-        # Convert non-WAV files to WAV format with optimal parameters for Whisper
-        if file_ext != '.wav':
-            logger.info(f"Converting {file_ext} file to WAV (mono, 16000 Hz) for optimal Whisper processing...")
-            
-            # Create temporary WAV file path
-            temp_file = tempfile.NamedTemporaryFile(
-                delete=False,
-                suffix='.wav',
-                dir=tempfile.gettempdir()
-            )
-            converted_path = temp_file.name
-            temp_file.close()
-            
-            # Convert using FFmpeg
-            success, error = convert_to_wav(audio_file_path, converted_path)
-            if success:
-                transcription_file = converted_path
-                logger.info(f"Conversion successful: {transcription_file}")
-            else:
-                # Log warning but attempt transcription with original file
-                logger.warning(f"Conversion failed: {error}. Attempting transcription with original file.")
-                # Clean up failed conversion file if it exists
-                if os.path.exists(converted_path):
-                    cleanup_audio_file(converted_path)
-                converted_path = None
+        # Decode straight to PCM in memory - no intermediate WAV file
+        if isinstance(audio, np.ndarray):
+            samples = audio
         else:
-            logger.info("File is already in WAV format, skipping conversion.")
-        
-        # Transcribe with automatic language detection
-        logger.info(f"Transcribing audio file: {transcription_file}")
-        segments, info = model.transcribe(
-            transcription_file,
-            beam_size=5,
-            vad_filter=True,  # Voice Activity Detection filter
-            language=None  # Auto-detect language
-        )
+            with metrics.span('audio_decode'):
+                success, samples, error = decode_audio(audio)
+            if not success:
+                return False, None, None, error
+        
+        duration = len(samples) / SAMPLE_RATE
+        if count_audio:
+            metrics.inc('audio_seconds_total', duration)
+        model_spec = whisper_model_spec(profile, duration)
+        language_code = resolve_language_hint(language)
+        logger.info(f"Transcribing {duration:.1f}s of audio with '{model_spec[0]}' "
+                    f"(profile={profile}, language={language_code or 'auto'})")
+        started = time.monotonic()
+        
+        decode_options = {
+            'beam_size': settings['beam_size'],
+            'best_of': settings['best_of'],
+            'without_timestamps': settings['without_timestamps'],
+            'condition_on_previous_text': settings['condition_on_previous_text'],
+            'vad_filter': True,  # Voice Activity Detection filter
+            'vad_parameters': settings['vad_parameters']
+        }
         
-        # Combine all segments into full transcription
-        transcription = " ".join([segment.text for segment in segments]).strip()
-        detected_language = info.language
+        if (whisper_batcher and duration <= BATCH_MAX_SECONDS and settings['without_timestamps']
+                and whisper_batcher.available()):
+            # Single-window clip: share an encoder/decoder call with concurrent requests
+            with metrics.span('whisper_batched'):
+                transcription, detected_language = whisper_batcher.transcribe(
+                    samples, model_spec, language_code, decode_options
+                )
+        else:
+            with metrics.span('whisper'):
+                model = whisper_models.get(*model_spec)
+                segments, info = model.transcribe(
+                    samples,
+                    language=language_code,  # None = auto-detect
+                    **decode_options
+                )
+                
+                # Combine all segments into full transcription (segments decode lazily)
+                transcription = " ".join([segment.text for segment in segments]).strip()
+                detected_language = info.language
+        whisper_models.record_use(*model_spec, duration, time.monotonic() - started)
         
         logger.info(f"Transcription complete. Detected language: {detected_language}")
         logger.info(f"Transcription: {transcription[:100]}...")
         
-        # Map Whisper language codes to our frontend language names
-        language_map = {
-            'ar': 'العربية',
-            'en': 'English',
-            'hi': 'हिंदी',
-            'tl': 'Filipino',
-            'fil': 'Filipino'
-        }
-        
-        frontend_language = language_map.get(detected_language, 'العربية')
+        frontend_language = WHISPER_LANGUAGE_NAMES.get(detected_language, 'العربية')
         
         return True, transcription, frontend_language, None
         
     except Exception as e:
         logger.error(f"Transcription error: {e}")
         return False, None, None, str(e)
-    finally:
-        # Clean up converted file if it was created
-        if converted_path:
-            cleanup_audio_file(converted_path)
 
 
-def generate_speech(text: str, language: str = 'العربية', speed_up: bool = False, speed_factor: float = 1.3) -> Tuple[bool, Optional[str], Optional[str]]:
+class AudioRejected(Exception):
+    """Raised when an upload fails validation; status_code is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status_code: int = 415):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Longest audio that is decoded and transcribed; longer uploads are rejected
+# when the header gives their duration, and truncated otherwise
+MAX_AUDIO_SECONDS = float(os.getenv("MAX_AUDIO_SECONDS", "120"))
+
+# Codecs browsers and phones record with
+ALLOWED_AUDIO_CODECS = {
+    'opus', 'vorbis', 'aac', 'mp3', 'flac', 'amr_nb', 'amr_wb',
+    'pcm_s16le', 'pcm_s24le', 'pcm_s32le', 'pcm_f32le', 'pcm_u8', 'pcm_mulaw', 'pcm_alaw'
+}
+
+_PROBE_DURATION = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+_PROBE_BITRATE = re.compile(r'bitrate: (\d+) kb/s')
+_PROBE_AUDIO_STREAM = re.compile(r'Stream #\S+: Audio: (\w+)')
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """Identify the container from its magic bytes, or None if it is not a known audio format."""
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        return 'webm'
+    if header.startswith(b'OggS'):
+        return 'ogg'
+    if header.startswith(b'RIFF') and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    if header.startswith(b'ID3') or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+
+def check_audio_upload(data: bytes) -> dict:
     """
-    Generate speech audio from text using gTTS (Google Text-to-Speech).
-    
-    Args:
-        text: Text to convert to speech
-        language: Language name ('العربية', 'English', 'हिंदी', 'Filipino')
-        speed_up: Whether to speed up the audio (default: True)
-        speed_factor: Speed multiplier (default: 1.3x)
+    Validate an upload before any decoding work: sniff the magic bytes, then
+    let FFmpeg read only the container header to find the codec and duration.
+    MediaRecorder WebM has no duration in its header; such clips are capped
+    at MAX_AUDIO_SECONDS while decoding instead.
     
     Returns:
-        Tuple of (success, audio_file_path, error_message)
+        Dict with 'format', 'codec' and 'duration' (None if unknown)
+    
+    Raises:
+        AudioRejected: with status 415 for non-audio/unsupported codecs and
+        413 for audio longer than MAX_AUDIO_SECONDS
     """
+    container = sniff_audio_format(data[:16])
+    if container is None:
+        raise AudioRejected("Unsupported or non-audio file")
+    
     try:
-        from gtts import gTTS
-        import re
-        
-        # Map language names to gTTS language codes
-        language_code_map = {
-            'العربية': 'ar',
-            'English': 'en',
-            'हिंदी': 'hi',
-            'Filipino': 'tl'  # Tagalog/Filipino
-        }
-        
-        lang_code = language_code_map.get(language, 'ar')
-        
-        # Clean text for TTS: remove emojis, asterisks, and special symbols
-        # Keep Arabic letters, English letters, numbers, and basic punctuation
-        def clean_text_for_tts(text):
-            # Remove emojis and symbols using regex
-            # This regex keeps Arabic, English, numbers, whitespace, and basic punctuation
-            # It removes most emojis and special characters
-            cleaned = re.sub(r'[^\w\s\u0600-\u06FF\.,\?\!]', '', text)
-            # Remove extra whitespace
-            cleaned = re.sub(r'\s+', ' ', cleaned).strip()
-            return cleaned
-            
-        cleaned_text = clean_text_for_tts(text)
-        logger.info(f"Original text: {text[:50]}...")
-        logger.info(f"Cleaned text for TTS: {cleaned_text[:50]}...")
-        
-        if not cleaned_text:
-            logger.warning("Text became empty after cleaning, using original")
-            cleaned_text = text
-        
-        # Create temporary file for generated audio
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix='.mp3',  # gTTS generates MP3 files
-            dir=tempfile.gettempdir()
+        # No output file: FFmpeg prints the input header and exits
+        result = subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-probesize', '64k', '-i', 'pipe:0'],
+            input=data,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            timeout=5
         )
-        output_path = temp_file.name
-        temp_file.close()
-        
-        logger.info(f"Generating speech for language: {language} ({lang_code})")
-        
-        # Generate speech using gTTS with cleaned text
-        tts = gTTS(text=cleaned_text, lang=lang_code, slow=False)
-        tts.save(output_path)
-        
-        logger.info(f"Speech generated successfully: {output_path}")
-        
-        # Apply speed-up if requested
-        if speed_up and speed_factor != 1.0:
-            success, sped_up_path, error = speed_up_audio(output_path, speed_factor)
-            if success:
-                # Clean up original file and use sped-up version
-                cleanup_audio_file(output_path)
-                output_path = sped_up_path
-                logger.info(f"Audio sped up by {speed_factor}x: {output_path}")
-            else:
-                logger.warning(f"Failed to speed up audio, using original: {error}")
-        
-        return True, output_path, None
-        
-    except Exception as e:
-        logger.error(f"TTS generation error: {e}")
-        return False, None, str(e)
+    except subprocess.TimeoutExpired:
+        raise AudioRejected("Could not read the audio header")
+    header_info = result.stderr.decode('utf-8', errors='replace')
+    
+    stream = _PROBE_AUDIO_STREAM.search(header_info)
+    if not stream:
+        raise AudioRejected("No audio stream found")
+    codec = stream.group(1)
+    if codec not in ALLOWED_AUDIO_CODECS:
+        raise AudioRejected(f"Unsupported audio codec: {codec}")
+    
+    duration = None
+    match = _PROBE_DURATION.search(header_info)
+    if match:
+        hours, minutes, seconds = match.groups()
+        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    else:
+        # Constant-bitrate streams (WAV, MP3) over a pipe only report a bitrate
+        bitrate = _PROBE_BITRATE.search(header_info)
+        if bitrate and int(bitrate.group(1)) > 0:
+            duration = len(data) * 8 / (int(bitrate.group(1)) * 1000)
+    
+    if duration is not None and duration > MAX_AUDIO_SECONDS:
+        raise AudioRejected(
+            f"Audio is {duration:.0f}s long, the limit is {MAX_AUDIO_SECONDS:.0f}s",
+            status_code=413
+        )
+    
+    return {'format': container, 'codec': codec, 'duration': duration}
 
 
-def speed_up_audio(input_path: str, speed_factor: float = 1.3) -> Tuple[bool, Optional[str], Optional[str]]:
+def decode_audio(audio: Union[bytes, str]) -> Tuple[bool, Optional[np.ndarray], Optional[str]]:
     """
-    Speed up audio file using FFmpeg 'atempo' filter.
+    Decode audio to 16 kHz mono float32 PCM with a single FFmpeg process.
+    
+    Bytes are streamed to FFmpeg's stdin and the samples are read back from
+    its stdout, so nothing is written to disk. Decoding stops after
+    MAX_AUDIO_SECONDS. Containers that cannot be
+    demuxed from a pipe (e.g. MP4 with the index at the end) fall back to a
+    temporary copy of the upload.
     
     Args:
-        input_path: Path to input audio file
-        speed_factor: Speed multiplier (e.g., 1.3 for 30% faster)
+        audio: Encoded audio bytes or a path to an audio file
     
     Returns:
-        Tuple of (success, output_file_path, error_message)
+        Tuple of (success, samples, error_message)
     """
+    source = 'pipe:0' if isinstance(audio, bytes) else audio
+    success, samples, error = _run_ffmpeg_decode(source, audio if isinstance(audio, bytes) else None)
+    
+    if not success and isinstance(audio, bytes):
+        logger.warning(f"Decoding from pipe failed ({error}), retrying from a temporary file")
+        temp_file = tempfile.NamedTemporaryFile(delete=False, dir=scratch.directory)
+        try:
+            temp_file.write(audio)
+            temp_file.close()
+            success, samples, error = _run_ffmpeg_decode(temp_file.name, None)
+        finally:
+            cleanup_audio_file(temp_file.name)
+    
+    return success, samples, error
+
+
+def _run_ffmpeg_decode(source: str, stdin_data: Optional[bytes]) -> Tuple[bool, Optional[np.ndarray], Optional[str]]:
+    command = [
+        FFMPEG_BINARY,
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-i', source,
+        '-t', str(MAX_AUDIO_SECONDS),  # Never decode more than we will transcribe
+        '-f', 'f32le',  # Raw 32-bit float samples
+        '-ac', '1',  # Audio channels: 1 (mono)
+        '-ar', str(SAMPLE_RATE),  # Audio sample rate: 16000 Hz
+        'pipe:1'
+    ]
+    
     try:
-        logger.info(f"Speeding up audio by {speed_factor}x: {input_path}")
-        
-        # Create output file
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix='.mp3',
-            dir=tempfile.gettempdir()
-        )
-        output_path = temp_file.name
-        temp_file.close()
-        
-        # FFmpeg command for speed up
-        # -filter:a "atempo=1.3" -vn (no video)
-        command = [
-            FFMPEG_BINARY,
-            '-y',
-            '-i', input_path,
-            '-filter:a', f'atempo={speed_factor}',
-            '-vn',
-            output_path
-        ]
-        
-        # Run FFmpeg command
         result = subprocess.run(
             command,
+            input=stdin_data,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            check=True,
-            text=True
+            check=True
         )
-        
-        logger.info(f"Audio sped up successfully: {output_path}")
-        return True, output_path, None
-        
     except subprocess.CalledProcessError as e:
-        error_msg = f"FFmpeg speed-up failed: {e.stderr}"
+        error_msg = f"FFmpeg decoding failed: {e.stderr.decode('utf-8', errors='replace').strip()}"
         logger.error(error_msg)
         return False, None, error_msg
-    except Exception as e:
-        logger.error(f"Audio speed-up error: {e}")
-        return False, None, str(e)
+    except FileNotFoundError:
+        error_msg = "FFmpeg not found. Please install FFmpeg from https://ffmpeg.org/download.html"
+        logger.error(error_msg)
+        return False, None, error_msg
+    
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    if samples.size == 0:
+        return False, None, "No audio samples could be decoded"
+    return True, samples, None
 
 
-def cleanup_audio_file(file_path: str) -> None:
+# Map language names to gTTS language codes
+TTS_LANGUAGE_CODES = {
+    'العربية': 'ar',
+    'English': 'en',
+    'हिंदी': 'hi',
+    'Filipino': 'tl'  # Tagalog/Filipino
+}
+
+
+def clean_text_for_tts(text: str) -> str:
     """
-    Clean up temporary audio file.
+    Clean text for TTS: remove emojis, asterisks, and special symbols.
+    Keeps Arabic letters, English letters, numbers, and basic punctuation.
+    Falls back to the original text if nothing is left after cleaning.
+    """
+    # This regex keeps Arabic, English, numbers, whitespace, and basic punctuation
+    # It removes most emojis and special characters
+    cleaned = re.sub(r'[^\w\s\u0600-\u06FF\.,\?\!]', '', text)
+    # Remove extra whitespace
+    cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+    
+    if not cleaned:
+        logger.warning("Text became empty after cleaning, using original")
+        return text
+    return cleaned
+
+
+def speech_cache_key(text: str, language: str = 'العربية', speed_up: bool = False, speed_factor: float = 1.3) -> str:
+    """Return the TTS cache key (also used as the HTTP ETag) for a speech request."""
+    lang_code = TTS_LANGUAGE_CODES.get(language, 'ar')
+    effective_speed = speed_factor if speed_up else 1.0
+    return tts_cache.make_key(clean_text_for_tts(text), lang_code, effective_speed)
+
+
+def synthesize_speech(text: str, language: str = 'العربية', speed_up: bool = False, speed_factor: float = 1.3) -> Tuple[bool, Optional[bytes], Optional[str]]:
+    """
+    Generate speech audio in memory using gTTS (Google Text-to-Speech).
+    
+    gTTS writes into a memory buffer, which is piped through a single FFmpeg
+    process for the speed-up, so no temporary files are created. Results are
+    stored in (and served from) the on-disk TTS cache.
     
     Args:
-        file_path: Path to file to delete
+        text: Text to convert to speech
+        language: Language name ('العربية', 'English', 'हिंदी', 'Filipino')
+        speed_up: Whether to speed up the audio
+        speed_factor: Speed multiplier (default: 1.3x)
+    
+    Returns:
+        Tuple of (success, mp3_bytes, error_message)
     """
     try:
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
-            logger.info(f"Cleaned up audio file: {file_path}")
+        lang_code = TTS_LANGUAGE_CODES.get(language, 'ar')
+        cleaned_text = clean_text_for_tts(text)
+        effective_speed = speed_factor if speed_up else 1.0
+        cache_key = tts_cache.make_key(cleaned_text, lang_code, effective_speed)
+        
+        cached_path = tts_cache.get(cache_key)
+        if cached_path:
+            try:
+                with open(cached_path, 'rb') as cached_file:
+                    return True, cached_file.read(), None
+            except FileNotFoundError:
+                pass  # Evicted between lookup and read - regenerate
+        
+        audio_data, cacheable = _render_speech(cleaned_text, lang_code, effective_speed)
+        if cacheable:
+            tts_cache.put_bytes(cache_key, audio_data)
+        return True, audio_data, None
+        
     except Exception as e:
-        logger.warning(f"Failed to cleanup file {file_path}: {e}")
+        logger.error(f"TTS generation error: {e}")
+        return False, None, str(e)
+
+
+def _render_speech(cleaned_text: str, lang_code: str, speed_factor: float) -> Tuple[bytes, bool]:
+    """
+    Run gTTS into memory and apply the speed-up.
+    
+    Returns:
+        Tuple of (mp3_bytes, cacheable); audio whose speed-up failed is
+        returned at normal speed and must not be cached under the sped-up key
+    """
+    from gtts import gTTS
+    
+    logger.info(f"Cleaned text for TTS: {cleaned_text[:50]}...")
+    logger.info(f"Generating speech for language: {lang_code}")
+    
+    # Generate speech using gTTS with cleaned text, straight into memory
+    buffer = io.BytesIO()
+    with metrics.span('gtts'):
+        tts = gTTS(text=cleaned_text, lang=lang_code, slow=False)
+        tts.write_to_fp(buffer)
+    audio_data = buffer.getvalue()
+    
+    # Skip FFmpeg entirely when the speed-up would be a no-op
+    if speed_factor == 1.0:
+        return audio_data, True
+    
+    with metrics.span('tts_speedup'):
+        success, sped_up_data, error = speed_up_audio_bytes(audio_data, speed_factor)
+    if not success:
+        logger.warning(f"Failed to speed up audio, using original: {error}")
+        return audio_data, False
+    
+    logger.info(f"Audio sped up by {speed_factor}x ({len(sped_up_data)} bytes)")
+    return sped_up_data, True
 
 
-def convert_to_wav(input_path: str, output_path: str) -> Tuple[bool, Optional[str]]:
+def speed_up_audio_bytes(audio_data: bytes, speed_factor: float = 1.3) -> Tuple[bool, Optional[bytes], Optional[str]]:
     """
-    Convert audio file to WAV format using FFmpeg with specific parameters.
-    The output WAV will be mono (1 channel) with 16000 Hz sample rate.
+    Speed up MP3 data with one FFmpeg 'atempo' pass over stdin/stdout.
     
     Args:
-        input_path: Path to input audio file (WebM, MP3, etc.)
-        output_path: Path where the WAV file should be saved
+        audio_data: Input MP3 bytes
+        speed_factor: Speed multiplier (e.g., 1.3 for 30% faster)
     
     Returns:
-        Tuple of (success, error_message)
+        Tuple of (success, mp3_bytes, error_message)
     """
+    command = [
+        FFMPEG_BINARY,
+        '-hide_banner',
+        '-loglevel', 'error',
+        '-f', 'mp3',
+        '-i', 'pipe:0',
+        '-filter:a', f'atempo={speed_factor}',
+        '-vn',
+        '-f', 'mp3',
+        'pipe:1'
+    ]
+    
     try:
-        logger.info(f"Converting audio to WAV: {input_path} -> {output_path}")
-        
-        # FFmpeg command: -y (overwrite), -i (input), -ac 1 (mono), -ar 16000 (sample rate)
-        command = [
-            FFMPEG_BINARY,
-            '-y',  # Overwrite output file without asking
-            '-i', input_path,  # Input file
-            '-ac', '1',  # Audio channels: 1 (mono)
-            '-ar', '16000',  # Audio sample rate: 16000 Hz
-            output_path  # Output file
-        ]
-        
-        # Run FFmpeg command
         result = subprocess.run(
             command,
+            input=audio_data,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            check=True,
-            text=True
+            check=True
         )
-        
-        logger.info(f"Successfully converted to WAV: {output_path}")
-        return True, None
-        
+        return True, result.stdout, None
     except subprocess.CalledProcessError as e:
-        error_msg = f"FFmpeg conversion failed: {e.stderr}"
-        logger.error(error_msg)
-        return False, error_msg
-    except FileNotFoundError:
-        error_msg = "FFmpeg not found. Please install FFmpeg from https://ffmpeg.org/download.html"
+        error_msg = f"FFmpeg speed-up failed: {e.stderr.decode('utf-8', errors='replace').strip()}"
         logger.error(error_msg)
-        return False, error_msg
+        return False, None, error_msg
     except Exception as e:
-        error_msg = f"Audio conversion error: {str(e)}"
-        logger.error(error_msg)
-        return False, error_msg
+        logger.error(f"Audio speed-up error: {e}")
+        return False, None, str(e)
+
+
+# Sentence-end punctuation (Latin and Arabic) followed by whitespace
+SENTENCE_BOUNDARY = re.compile(r'(?<=[\.\!\?\u061F])\s+')
+
+# Thread pool for chunked TTS (gTTS and FFmpeg mostly wait on I/O)
+TTS_STREAM_WORKERS = int(os.getenv("TTS_STREAM_WORKERS", "4"))
+tts_executor = ThreadPoolExecutor(max_workers=TTS_STREAM_WORKERS, thread_name_prefix="tts-chunk")
+
 
+def split_sentences(text: str, min_chars: int = 40) -> List[str]:
+    """
+    Split text at sentence boundaries for chunked TTS. Short sentences are
+    merged with the following one so each chunk is worth a gTTS round trip.
+    """
+    chunks = []
+    current = ''
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        current = f"{current} {sentence}".strip()
+        if len(current) >= min_chars:
+            chunks.append(current)
+            current = ''
+    if current:
+        chunks.append(current)
+    return chunks
 
 
-def convert_audio_format(input_path: str, output_format: str = 'wav') -> Optional[str]:
+def stream_speech(text: str, language: str = 'العربية', speed_up: bool = False, speed_factor: float = 1.3) -> Iterator[bytes]:
     """
-    Convert audio file to specified format using pydub.
+    Generate speech sentence by sentence and yield MP3 bytes in order.
+    
+    All sentences are synthesized (and sped up) concurrently on a thread
+    pool, so the first chunk is ready after roughly one sentence worth of
+    work while later chunks are still being generated. Each chunk goes
+    through synthesize_speech and therefore through the TTS cache.
     
     Args:
-        input_path: Path to input audio file
-        output_format: Desired output format ('wav', 'mp3')
+        text: Text to convert to speech
+        language: Language name ('العربية', 'English', 'हिंदी', 'Filipino')
+        speed_up: Whether to speed up the audio
+        speed_factor: Speed multiplier
     
-    Returns:
-        Path to converted file or None on error
+    Yields:
+        MP3 data for each sentence chunk
     """
+    sentences = split_sentences(clean_text_for_tts(text))
+    logger.info(f"Streaming speech in {len(sentences)} chunks")
+    
+    futures = [
+        tts_executor.submit(_synthesize_chunk, sentence, language, speed_up, speed_factor)
+        for sentence in sentences
+    ]
     try:
-        from pydub import AudioSegment
-        
-        logger.info(f"Converting audio from {Path(input_path).suffix} to {output_format}...")
-        
-        # Load audio file
-        audio = AudioSegment.from_file(input_path)
-        
-        # Create output file
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=f'.{output_format}',
-            dir=tempfile.gettempdir()
-        )
-        output_path = temp_file.name
-        temp_file.close()
-        
-        # Export in desired format
-        audio.export(output_path, format=output_format)
-        
-        logger.info(f"Converted audio: {input_path} -> {output_path}")
-        return output_path
-        
-    except FileNotFoundError as e:
-        logger.error(f"FFmpeg not found. Audio conversion requires FFmpeg to be installed: {e}")
-        logger.error("Please install FFmpeg from https://ffmpeg.org/download.html")
+        for index, future in enumerate(futures):
+            data = future.result()
+            if data:
+                # Only the first chunk keeps its ID3 tag so the stream stays one valid MP3
+                yield data if index == 0 else _strip_id3_tag(data)
+    finally:
+        # Client went away - don't synthesize chunks nobody will receive
+        for future in futures:
+            future.cancel()
+
+
+def _synthesize_chunk(sentence: str, language: str, speed_up: bool, speed_factor: float) -> Optional[bytes]:
+    success, audio_data, error = synthesize_speech(sentence, language, speed_up=speed_up, speed_factor=speed_factor)
+    if not success:
+        logger.warning(f"Skipping TTS chunk after error: {error}")
         return None
+    return audio_data
+
+
+def join_mp3_chunks(chunks: List[bytes]) -> bytes:
+    """Concatenate MP3 chunks into one stream, keeping only the first ID3 tag."""
+    return b''.join(chunk if index == 0 else _strip_id3_tag(chunk) for index, chunk in enumerate(chunks))
+
+
+def _strip_id3_tag(data: bytes) -> bytes:
+    """Remove a leading ID3v2 tag from MP3 data."""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return data
+    # Tag size is a 28-bit "syncsafe" integer (7 bits per byte)
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return data[10 + size + footer:]
+
+
+def cleanup_audio_file(file_path: str) -> None:
+    """
+    Clean up temporary audio file.
+    
+    Args:
+        file_path: Path to file to delete
+    """
+    try:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info(f"Cleaned up audio file: {file_path}")
     except Exception as e:
-        logger.error(f"Audio conversion error: {e}")
-        return None
+        logger.warning(f"Failed to cleanup file {file_path}: {e}")
@@ -0,0 +1,257 @@
+"""
+Whisper Batching Module for تبيّن Chatbot
+Micro-batches concurrent short clips into single encoder/decoder calls on
+the underlying CTranslate2 Whisper model, so bursts of short voice messages
+use the CPU's vector units instead of running one clip at a time.
+
+The batched path calls faster-whisper internals (VAD chunking, the
+CTranslate2 storage helper and WhisperModel.get_prompt) as of the version
+pinned in requirements.txt; when they are missing, batching turns itself off.
+"""
+
+import os
+import zlib
+import queue
+import time
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Whisper's context window; longer clips are not batched
+BATCH_MAX_SECONDS = 30
+_SAMPLE_RATE = 16000
+# WhisperModel.transcribe defaults: a decode past these thresholds is retried
+# at higher temperatures (sampling best_of candidates); silence is dropped
+_NO_SPEECH_THRESHOLD = 0.6
+_LOG_PROB_THRESHOLD = -1.0
+_COMPRESSION_RATIO_THRESHOLD = 2.4
+
+
+def _faster_whisper_internals():
+    """The faster-whisper internals the batched path relies on."""
+    from faster_whisper.tokenizer import Tokenizer
+    from faster_whisper.transcribe import get_ctranslate2_storage
+    from faster_whisper.vad import VadOptions, collect_chunks, get_speech_timestamps
+    return Tokenizer, get_ctranslate2_storage, VadOptions, collect_chunks, get_speech_timestamps
+
+
+def _options_key(options: Dict[str, Any]) -> Tuple:
+    """Hashable form of a decode options dict (vad_parameters is itself a dict)."""
+    return tuple(sorted(
+        (name, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+        for name, value in options.items()
+    ))
+
+
+class _BatchItem:
+    __slots__ = ('samples', 'model_spec', 'language', 'options', 'future')
+
+    def __init__(self, samples, model_spec, language, options):
+        self.samples = samples
+        self.model_spec = model_spec
+        self.language = language
+        self.options = options
+        self.future: Future = Future()
+
+
+class WhisperBatcher:
+    """
+    Collects clips for up to max_wait_ms (or until max_batch_size clips are
+    waiting), then transcribes each group of clips that share a model and
+    decode options with one batched encode and one batched generate call.
+
+    Decode options are the WhisperModel.transcribe keyword arguments the
+    unbatched path uses. Clips are VAD-trimmed with the same vad_parameters,
+    padded to 30 seconds and decoded without timestamps at temperature 0;
+    language detection, when no hint is given, is batched too. A clip whose
+    decode would make WhisperModel.transcribe fall back to sampling (which
+    is where best_of applies) is re-run through WhisperModel.transcribe with
+    the same options. condition_on_previous_text has no effect on a single
+    30-second window, so both paths decode the same prompt.
+
+    The batching thread starts on the first clip, so only a process that
+    transcribes in-process (and owns the model) runs one.
+    """
+
+    def __init__(self, get_model: Callable, max_batch_size: int = 8, max_wait_ms: float = 20):
+        self.get_model = get_model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "queue.Queue[_BatchItem]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._available = None
+        self.batches = 0
+        self.clips = 0
+        self.fallbacks = 0
+        self.max_batch_seen = 0
+        logger.info(f"Whisper batching enabled: max_batch_size={max_batch_size}, max_wait={max_wait_ms}ms")
+
+    @classmethod
+    def from_env(cls, get_model: Callable) -> Optional["WhisperBatcher"]:
+        """Create a batcher from WHISPER_BATCH_* settings, or None when batching is disabled."""
+        max_batch_size = int(os.getenv("WHISPER_BATCH_SIZE", "1"))
+        if max_batch_size <= 1:
+            return None
+        return cls(
+            get_model,
+            max_batch_size=max_batch_size,
+            max_wait_ms=float(os.getenv("WHISPER_BATCH_WAIT_MS", "20"))
+        )
+
+    def available(self) -> bool:
+        """Whether the installed faster-whisper has the internals the batched path needs."""
+        if self._available is None:
+            try:
+                _faster_whisper_internals()
+                self._available = True
+            except ImportError as e:
+                logger.warning(f"Whisper batching disabled, faster-whisper internals not found: {e}")
+                self._available = False
+        return self._available
+
+    def transcribe(self, samples: np.ndarray, model_spec: Tuple, language: Optional[str] = None,
+                   options: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Tuple[str, str]:
+        """
+        Transcribe one clip of at most BATCH_MAX_SECONDS as part of a batch.
+
+        Args:
+            options: WhisperModel.transcribe keyword arguments (beam_size,
+                     best_of, condition_on_previous_text, vad_parameters, ...)
+
+        Returns:
+            Tuple of (transcription, whisper_language_code)
+        """
+        self._ensure_thread()
+        item = _BatchItem(samples, model_spec, language, dict(options or {}, without_timestamps=True))
+        self._queue.put(item)
+        return item.future.result(timeout=timeout)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                'batches': self.batches,
+                'clips': self.clips,
+                'avg_batch_size': round(self.clips / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch_seen,
+                'fallbacks': self.fallbacks
+            }
+
+    def _ensure_thread(self) -> None:
+        # (Re)start the batching thread in each process; threads do not survive fork
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name="whisper-batcher", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups: Dict[Tuple, List[_BatchItem]] = {}
+            for item in batch:
+                groups.setdefault((item.model_spec, _options_key(item.options)), []).append(item)
+
+            for (model_spec, _), items in groups.items():
+                try:
+                    results = self._transcribe_batch(self.get_model(*model_spec), items)
+                except Exception as e:
+                    for item in items:
+                        item.future.set_exception(e)
+                    continue
+                for item, result in zip(items, results):
+                    item.future.set_result(result)
+
+                with self._lock:
+                    self.batches += 1
+                    self.clips += len(items)
+                    self.max_batch_seen = max(self.max_batch_seen, len(items))
+
+    def _transcribe_batch(self, model, items: List[_BatchItem]) -> List[Tuple[str, str]]:
+        Tokenizer, get_ctranslate2_storage, VadOptions, collect_chunks, get_speech_timestamps = \
+            _faster_whisper_internals()
+        options = items[0].options  # Shared by the whole group
+
+        extractor = model.feature_extractor
+        features = []
+        for item in items:
+            audio = item.samples
+            if options.get('vad_filter'):
+                vad_options = VadOptions(**(options.get('vad_parameters') or {}))
+                audio = collect_chunks(audio, get_speech_timestamps(audio, vad_options))
+            mel = extractor(audio)[:, :extractor.nb_max_frames]
+            if mel.shape[-1] < extractor.nb_max_frames:
+                mel = np.pad(mel, ((0, 0), (0, extractor.nb_max_frames - mel.shape[-1])))
+            features.append(mel)
+
+        encoder_output = model.model.encode(
+            get_ctranslate2_storage(np.stack(features).astype(np.float32)),
+            to_cpu=False
+        )
+
+        languages = [item.language for item in items]
+        if any(language is None for language in languages):
+            if model.model.is_multilingual:
+                detected = model.model.detect_language(encoder_output)
+                languages = [language or detected[i][0][0][2:-2] for i, language in enumerate(languages)]
+            else:
+                languages = [language or 'en' for language in languages]
+
+        tokenizers = [
+            Tokenizer(model.hf_tokenizer, model.model.is_multilingual, task='transcribe', language=language)
+            for language in languages
+        ]
+        prompts = [model.get_prompt(tokenizer, [], without_timestamps=True) for tokenizer in tokenizers]
+
+        results = model.model.generate(
+            encoder_output,
+            prompts,
+            beam_size=options.get('beam_size', 5),
+            max_length=model.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1]
+        )
+
+        transcripts = []
+        for item, result, tokenizer, language in zip(items, results, tokenizers, languages):
+            tokens = result.sequences_ids[0]
+            avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+            text = tokenizer.decode(tokens).strip()
+            if result.no_speech_prob > _NO_SPEECH_THRESHOLD and avg_logprob < _LOG_PROB_THRESHOLD:
+                transcripts.append(('', language))
+            elif avg_logprob < _LOG_PROB_THRESHOLD or _compression_ratio(text) > _COMPRESSION_RATIO_THRESHOLD:
+                transcripts.append(self._transcribe_unbatched(model, item))
+            else:
+                transcripts.append((text, language))
+        return transcripts
+
+    def _transcribe_unbatched(self, model, item: _BatchItem) -> Tuple[str, str]:
+        with self._lock:
+            self.fallbacks += 1
+        segments, info = model.transcribe(item.samples, language=item.language, **item.options)
+        return " ".join(segment.text for segment in segments).strip(), info.language
+
+
+def _compression_ratio(text: str) -> float:
+    data = text.encode('utf-8')
+    return len(data) / len(zlib.compress(data)) if data else 0.0
@@ -0,0 +1,182 @@
+"""
+Whisper Model Registry Module for تبيّن Chatbot
+Keeps several Faster-Whisper models (sizes / compute types) resident in one
+process, evicting the least recently used ones to stay within a memory
+budget, and records per-model usage statistics.
+"""
+
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (model_size, compute_type, cpu_threads)
+ModelKey = Tuple[str, str, int]
+
+# Approximate resident size of CTranslate2 int8 models, used when the RSS
+# growth of a load cannot be measured (float32 models are ~4x larger)
+_ESTIMATED_MB = {
+    'tiny': 80,
+    'base': 150,
+    'small': 500,
+    'medium': 1500,
+    'large-v2': 3100,
+    'large-v3': 3100
+}
+
+
+def _load_whisper_model(model_size: str, compute_type: str, cpu_threads: int):
+    from faster_whisper import WhisperModel
+    return WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type=compute_type,
+        cpu_threads=cpu_threads
+    )
+
+
+def _current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes (Linux only)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _estimate_bytes(model_size: str, compute_type: str) -> int:
+    megabytes = _ESTIMATED_MB.get(model_size, _ESTIMATED_MB['small'])
+    if 'float32' in compute_type:
+        megabytes *= 4
+    elif 'float16' in compute_type:
+        megabytes *= 2
+    return megabytes * 1024 * 1024
+
+
+class WhisperModelRegistry:
+    """
+    LRU registry of loaded Whisper models bounded by max_bytes of RSS.
+
+    The footprint of each model is the RSS growth measured while loading it
+    (falling back to a per-size estimate). Before a new model is loaded, the
+    least recently used models are dropped until it fits; the most recently
+    requested model is always kept, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_bytes: int, loader: Callable = _load_whisper_model):
+        self.max_bytes = max_bytes
+        self.loader = loader
+
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        self._models: "OrderedDict[ModelKey, object]" = OrderedDict()
+        self._footprints: Dict[ModelKey, int] = {}
+        self._stats: Dict[ModelKey, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "WhisperModelRegistry":
+        """Build a registry bounded by WHISPER_MODELS_MAX_MB."""
+        max_mb = float(os.getenv("WHISPER_MODELS_MAX_MB", "2048"))
+        return cls(int(max_mb * 1024 * 1024))
+
+    def get(self, model_size: str, compute_type: str = "int8", cpu_threads: int = 0):
+        """Return the model, loading it (and evicting others) if needed."""
+        key = (model_size, compute_type, cpu_threads)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Loads of the same model wait for each other; other models stay usable
+        with load_lock:
+            with self._lock:
+                model = self._models.get(key)
+                if model is not None:
+                    self._models.move_to_end(key)
+                    return model
+                self._make_room(_estimate_bytes(model_size, compute_type))
+
+            logger.info(f"Loading Faster-Whisper model '{model_size}' ({compute_type})...")
+            rss_before = _current_rss()
+            started = time.monotonic()
+            model = self.loader(model_size, compute_type, cpu_threads)
+            load_seconds = time.monotonic() - started
+            rss_after = _current_rss()
+
+            if rss_before is not None and rss_after is not None and rss_after > rss_before:
+                footprint = rss_after - rss_before
+            else:
+                footprint = _estimate_bytes(model_size, compute_type)
+            logger.info(f"Faster-Whisper model '{model_size}' loaded in {load_seconds:.1f}s "
+                        f"({footprint / (1024 * 1024):.0f} MB)")
+
+            with self._lock:
+                self._models[key] = model
+                self._footprints[key] = footprint
+                stats = self._model_stats(key)
+                stats['loads'] += 1
+                stats['load_seconds'] += load_seconds
+                self._make_room(0)
+            return model
+
+    def record_use(self, model_size: str, compute_type: str, cpu_threads: int,
+                   audio_seconds: float, elapsed_seconds: float) -> None:
+        """Account one transcription against a model's usage stats."""
+        with self._lock:
+            stats = self._model_stats((model_size, compute_type, cpu_threads))
+            stats['requests'] += 1
+            stats['audio_seconds'] += audio_seconds
+            stats['inference_seconds'] += elapsed_seconds
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(self._footprints[key] for key in self._models)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            models = {}
+            for key, stats in self._stats.items():
+                model_size, compute_type, cpu_threads = key
+                name = f"{model_size}/{compute_type}" + (f"/{cpu_threads}t" if cpu_threads else "")
+                models[name] = dict(
+                    stats,
+                    load_seconds=round(stats['load_seconds'], 3),
+                    audio_seconds=round(stats['audio_seconds'], 3),
+                    inference_seconds=round(stats['inference_seconds'], 3),
+                    resident=key in self._models,
+                    footprint_mb=round(self._footprints.get(key, 0) / (1024 * 1024), 1),
+                    real_time_factor=round(stats['inference_seconds'] / stats['audio_seconds'], 3)
+                    if stats['audio_seconds'] else 0.0
+                )
+            return {
+                'budget_mb': round(self.max_bytes / (1024 * 1024), 1),
+                'resident_mb': round(sum(self._footprints[key] for key in self._models) / (1024 * 1024), 1),
+                'models': models
+            }
+
+    def _model_stats(self, key: ModelKey) -> Dict[str, float]:
+        return self._stats.setdefault(key, {
+            'loads': 0,
+            'evictions': 0,
+            'load_seconds': 0.0,
+            'requests': 0,
+            'audio_seconds': 0.0,
+            'inference_seconds': 0.0
+        })
+
+    def _make_room(self, incoming_bytes: int) -> None:
+        """Evict least recently used models until incoming_bytes fits (lock held)."""
+        resident = sum(self._footprints[key] for key in self._models)
+        while self._models and resident + incoming_bytes > self.max_bytes:
+            if incoming_bytes == 0 and len(self._models) == 1:
+                break  # Never evict the model that was just loaded
+            key, _ = self._models.popitem(last=False)
+            resident -= self._footprints[key]
+            self._model_stats(key)['evictions'] += 1
+            logger.info(f"Evicted Faster-Whisper model '{key[0]}' ({key[1]}) to stay within the memory budget")